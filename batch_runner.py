@@ -0,0 +1,259 @@
+import io
+import os
+import ast
+import json
+import time
+import argparse
+import threading
+import tokenize
+import traceback
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Set
+from rich import print
+from langchain_core.messages import AIMessage
+
+# === Configuration ===
+# Concurrent sessions; each task runs in its own thread_id
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+# Keys tried, in order, for a task's id and text
+ID_KEYS = ("id", "task_id", "request_id")
+TEXT_KEYS = ("task", "question", "prompt", "body")
+# Name of the tool message carrying a CodeRunnerOutput
+CODE_TOOL_NAME = "code_generate_tool"
+
+
+def load_tasks(path: str) -> List[Dict[str, Any]]:
+    """
+    Read tasks from a JSONL file.
+
+    Each line needs a text under one of TEXT_KEYS (a "title" is prepended to
+    "body"); the id comes from ID_KEYS and defaults to the line number.
+    Ids must be unique, since each one names the task's thread and result.
+
+    Raises:
+        ValueError: If two tasks have the same id
+    """
+    tasks = []
+    seen: Dict[str, int] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            task_id = next((str(record[k]) for k in ID_KEYS if record.get(k) is not None), f"line{number}")
+            text = next((record[k] for k in TEXT_KEYS if record.get(k)), None)
+            if text is None:
+                print(f"[yellow]⚠️ Skipping line {number}: no task text[/yellow]")
+                continue
+            if record.get("title") and "task" not in record and "question" not in record:
+                text = f"{record['title']}\n\n{text}"
+            if task_id in seen:
+                raise ValueError(f"{path}:{number}: duplicate task id {task_id!r} (first on line {seen[task_id]})")
+            seen[task_id] = number
+            tasks.append({"id": task_id, "text": text})
+    return tasks
+
+
+def load_finished(path: str, retry_failed: bool) -> Set[str]:
+    """Ids already recorded in a results file (only successful ones with retry_failed)."""
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line of a run that crashed while writing
+                continue
+            if not retry_failed or result.get("status") == "ok":
+                finished.add(result["id"])
+    return finished
+
+
+def _top_level_fields(text: str) -> Dict[str, Any]:
+    """
+    First token of every top-level `name=value` in a pydantic repr.
+
+    The text is tokenized as Python, so strings (the script, stdout, stderr)
+    are single tokens and whatever they contain cannot be mistaken for a field.
+    """
+    fields: Dict[str, Any] = {}
+    try:
+        tokens = [t for t in tokenize.generate_tokens(io.StringIO(text).readline)
+                  if t.type not in (tokenize.NEWLINE, tokenize.NL, tokenize.ENDMARKER)]
+    except (tokenize.TokenError, SyntaxError):
+        return fields
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token.type == tokenize.OP and token.string in "([{":
+            depth += 1
+        elif token.type == tokenize.OP and token.string in ")]}":
+            depth -= 1
+        elif (depth == 0 and token.type == tokenize.NAME and i + 2 < len(tokens)
+              and tokens[i + 1].string == "=" and token.string not in fields):
+            try:
+                fields[token.string] = ast.literal_eval(tokens[i + 2].string)
+            except (ValueError, SyntaxError):
+                fields[token.string] = tokens[i + 2].string
+    return fields
+
+
+def code_runs(history: List[Any]) -> List[Dict[str, Any]]:
+    """Success and termination reason of every code_generate call in a message history."""
+    runs = []
+    for msg in history:
+        if getattr(msg, "type", "") != "tool" or getattr(msg, "name", "") != CODE_TOOL_NAME:
+            continue
+        fields = _top_level_fields(str(msg.content))
+        if isinstance(fields.get("success"), bool):
+            runs.append({"success": fields["success"], "terminated_reason": fields.get("terminated_reason")})
+    return runs
+
+
+def run_task(app: Any, task: Dict[str, Any], batch_name: str, recursion_limit: int) -> Dict[str, Any]:
+    """
+    Run one task through the supervisor graph and summarize the outcome.
+
+    A thread interrupted by a crash (the checkpointer still has pending
+    nodes for it) is resumed instead of started over; a thread that had
+    already finished is only read back.
+    """
+    thread_id = f"{batch_name}:{task['id']}"
+    config = {"configurable": {"thread_id": thread_id}, "recursion_limit": recursion_limit}
+    result: Dict[str, Any] = {"id": task["id"], "thread_id": thread_id, "started_at": datetime.now().isoformat()}
+    history = []
+    start = time.time()
+    try:
+        snapshot = app.get_state(config)
+        resumed = bool(snapshot.next)
+        if snapshot.values.get("messages") and not resumed:
+            history = list(snapshot.values["messages"])
+            result["resumed"] = "finished"
+        else:
+            inputs = None if resumed else {"messages": [{"role": "user", "content": task["text"]}]}
+            steps = 0
+            for step in app.stream(inputs, config=config):
+                steps += 1
+                for agent_output in step.values():
+                    if isinstance(agent_output, dict):
+                        history.extend(agent_output.get("messages", []))
+            result["steps"] = steps
+            if resumed:
+                result["resumed"] = "interrupted"
+        answers = [msg.content for msg in history if isinstance(msg, AIMessage) and msg.content]
+        result["answer"] = answers[-1] if answers else ""
+        result["agents"] = sorted({msg.name for msg in history if getattr(msg, "type", "") == "tool" and msg.name})
+        result["code_runs"] = code_runs(history)
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["latency_s"] = round(time.time() - start, 3)
+    return result
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+
+def summarize(results: List[Dict[str, Any]], wall_time: float, concurrency: int) -> Dict[str, Any]:
+    """Throughput and latency percentiles of the tasks run in this invocation."""
+    latencies = sorted(r["latency_s"] for r in results)
+    summary: Dict[str, Any] = {
+        "tasks": len(results),
+        "ok": sum(r["status"] == "ok" for r in results),
+        "errors": sum(r["status"] != "ok" for r in results),
+        "concurrency": concurrency,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_per_min": round(60.0 * len(results) / wall_time, 3) if wall_time > 0 else 0.0,
+    }
+    if latencies:
+        summary.update({
+            "latency_mean_s": round(sum(latencies) / len(latencies), 3),
+            "latency_p50_s": _percentile(latencies, 50),
+            "latency_p95_s": _percentile(latencies, 95),
+            "latency_p99_s": _percentile(latencies, 99),
+            "latency_max_s": latencies[-1],
+        })
+    return summary
+
+
+def run_batch(tasks_path: str, output_path: str, concurrency: int = BATCH_CONCURRENCY, batch_name: Optional[str] = None,
+              retry_failed: bool = False, recursion_limit: int = 50, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run every task of a JSONL file that is not yet in the results file.
+
+    Results are appended to `output_path` as each task finishes, so a crashed
+    or interrupted batch continues where it stopped when started again with
+    the same output file; the summary goes to `<output_path>.summary.json`.
+
+    Args:
+        tasks_path (str): JSONL task file
+        output_path (str): JSONL results file, created or appended to
+        concurrency (int): Tasks running at once
+        batch_name (Optional[str]): Prefix of the thread ids (defaults to the results file name)
+        retry_failed (bool): Run tasks again whose recorded result is an error
+        recursion_limit (int): LangGraph step limit per task
+        limit (Optional[int]): Run at most this many pending tasks
+
+    Returns:
+        Dict[str, Any]: Aggregate summary of this invocation
+    """
+    from supversior import app
+    from tools.qgis_workers import qgis_pool
+
+    batch_name = batch_name or os.path.splitext(os.path.basename(output_path))[0]
+    tasks = load_tasks(tasks_path)
+    finished = load_finished(output_path, retry_failed)
+    pending = [task for task in tasks if task["id"] not in finished]
+    if limit is not None:
+        pending = pending[:limit]
+    print(f"[bold cyan]🚀 {len(tasks)} tasks, {len(tasks) - len(pending)} already done, running {len(pending)} "
+          f"with {concurrency} concurrent sessions[/bold cyan]")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    qgis_pool.start()
+    lock = threading.Lock()
+    results: List[Dict[str, Any]] = []
+    start = time.time()
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(run_task, app, task, batch_name, recursion_limit): task for task in pending}
+        for future in as_completed(futures):
+            result = future.result()
+            with lock:
+                out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+                results.append(result)
+            color = "green" if result["status"] == "ok" else "red"
+            print(f"[{color}]{'✅' if color == 'green' else '❌'} {result['id']} ({result['latency_s']:.1f}s) "
+                  f"[{len(results)}/{len(pending)}][/{color}]")
+
+    summary = summarize(results, time.time() - start, concurrency)
+    with open(f"{output_path}.summary.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of tasks through the multi-agent workflow.")
+    parser.add_argument("tasks", help="JSONL file with one task per line")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="Results file; existing results are skipped (resume)")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY, help="Tasks running at once")
+    parser.add_argument("--name", help="Prefix of the thread ids (default: results file name)")
+    parser.add_argument("--retry-failed", action="store_true", help="Run tasks again that ended with an error")
+    parser.add_argument("--recursion-limit", type=int, default=50, help="LangGraph step limit per task")
+    parser.add_argument("--limit", type=int, default=None, help="Run at most this many pending tasks")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.tasks, args.output, args.concurrency, args.name, args.retry_failed,
+                        args.recursion_limit, args.limit)
+    print("[bold green]📊 Summary[/bold green]")
+    for key, value in summary.items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.store.base import BaseStore
+from langgraph.store.memory import InMemoryStore
+from langgraph.store.sqlite import SqliteStore
+
+# === Configuration ===
+# "memory" keeps threads in RAM and loses them on restart; "sqlite" keeps them in CHECKPOINT_PATH
+CHECKPOINT_BACKEND = os.environ.get("CHECKPOINT_BACKEND", "memory").lower()
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", r"/home/kaiyuan/lu2025-17-15/Kaiyuan/sp_group/cache/checkpoints.sqlite")
+# Checkpoints kept per thread and namespace; older ones and their writes are deleted (0 keeps all)
+CHECKPOINT_KEEP = int(os.environ.get("CHECKPOINT_KEEP", "10"))
+# Threads not written for this many days are deleted on compaction (0 keeps them)
+CHECKPOINT_THREAD_TTL_DAYS = float(os.environ.get("CHECKPOINT_THREAD_TTL_DAYS", "30"))
+# Seconds between compactions of the SQLite file
+CHECKPOINT_COMPACT_INTERVAL = float(os.environ.get("CHECKPOINT_COMPACT_INTERVAL", "3600"))
+# Threads the memory backend keeps; the least recently used are dropped beyond this
+CHECKPOINT_MAX_THREADS = int(os.environ.get("CHECKPOINT_MAX_THREADS", "64"))
+# SQLite page cache per connection in KiB, so reading old threads does not grow the process
+SQLITE_CACHE_KIB = 65536
+
+
+class BoundedInMemorySaver(InMemorySaver):
+    """
+    InMemorySaver that keeps at most `max_threads` threads.
+
+    Every put() or read of a thread marks it as recently used; beyond the
+    limit the least recently used threads are deleted with all their
+    checkpoints, writes and channel blobs.
+    """
+
+    def __init__(self, max_threads: int = CHECKPOINT_MAX_THREADS, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.evicted = 0
+        self._lru_lock = threading.Lock()
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+
+    def _touch(self, thread_id: str, add: bool) -> None:
+        with self._lru_lock:
+            if thread_id in self._recent:
+                self._recent.move_to_end(thread_id)
+            elif add:
+                self._recent[thread_id] = None
+            cold: List[str] = []
+            while self.max_threads > 0 and len(self._recent) > self.max_threads:
+                cold.append(self._recent.popitem(last=False)[0])
+            self.evicted += len(cold)
+        for thread_id in cold:
+            super().delete_thread(thread_id)
+
+    def get_tuple(self, config):
+        result = super().get_tuple(config)
+        if result is not None:
+            self._touch(config["configurable"]["thread_id"], add=False)
+        return result
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config["configurable"]["thread_id"], add=True)
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lru_lock:
+            self._recent.pop(thread_id, None)
+        super().delete_thread(thread_id)
+
+
+class CompactingSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver with bounded retention.
+
+    After each put() only the newest `keep` checkpoints of that thread and
+    namespace are kept, with their pending writes; the latest checkpoint
+    holds the full channel values, so resuming and get_state() are not
+    affected, only the history gets shorter. Every `compact_interval`
+    seconds threads idle for `thread_ttl_days` are deleted, retention is
+    applied to all threads and free pages are returned to the file system.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, keep: int = CHECKPOINT_KEEP,
+                 thread_ttl_days: float = CHECKPOINT_THREAD_TTL_DAYS,
+                 compact_interval: float = CHECKPOINT_COMPACT_INTERVAL, **kwargs: Any):
+        super().__init__(conn, **kwargs)
+        self.keep = keep
+        self.thread_ttl = thread_ttl_days * 24 * 3600
+        self.compact_interval = compact_interval
+        self._last_compact = time.monotonic()
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        # Only takes effect on a new file; lets compaction free pages without a full VACUUM
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        super().setup()
+        self.conn.executescript(
+            f"""
+            PRAGMA cache_size=-{SQLITE_CACHE_KIB};
+            CREATE TABLE IF NOT EXISTS thread_activity (
+                thread_id TEXT PRIMARY KEY,
+                last_used REAL NOT NULL
+            );
+            """
+        )
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self.cursor() as cur:
+            cur.execute("INSERT OR REPLACE INTO thread_activity (thread_id, last_used) VALUES (?, ?)",
+                        (thread_id, time.time()))
+            if self.keep > 0:
+                cur.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT ?)",
+                    (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep),
+                )
+                if cur.rowcount:
+                    cur.execute(
+                        "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND NOT EXISTS ("
+                        "SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id "
+                        "AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)",
+                        (thread_id, checkpoint_ns),
+                    )
+        if self.compact_interval > 0 and time.monotonic() - self._last_compact >= self.compact_interval:
+            self.compact()
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Delete idle threads, apply retention everywhere and shrink the file.
+
+        Returns:
+            Dict[str, int]: Counts of deleted threads and checkpoints
+        """
+        self._last_compact = time.monotonic()
+        stats = {"threads": 0, "checkpoints": 0}
+        if self.thread_ttl > 0:
+            with self.cursor() as cur:
+                cutoff = time.time() - self.thread_ttl
+                idle = [row[0] for row in cur.execute(
+                    "SELECT thread_id FROM thread_activity WHERE last_used < ?", (cutoff,)
+                ).fetchall()]
+            for thread_id in idle:
+                self.delete_thread(thread_id)
+            stats["threads"] = len(idle)
+        with self.cursor() as cur:
+            if self.keep > 0:
+                # Also covers threads written before retention was turned on
+                cur.execute(
+                    "DELETE FROM checkpoints WHERE rowid IN (SELECT rowid FROM ("
+                    "SELECT rowid, ROW_NUMBER() OVER (PARTITION BY thread_id, checkpoint_ns "
+                    "ORDER BY checkpoint_id DESC) AS position FROM checkpoints) WHERE position > ?)",
+                    (self.keep,),
+                )
+                stats["checkpoints"] = cur.rowcount
+                cur.execute(
+                    "DELETE FROM writes WHERE NOT EXISTS (SELECT 1 FROM checkpoints c "
+                    "WHERE c.thread_id = writes.thread_id AND c.checkpoint_ns = writes.checkpoint_ns "
+                    "AND c.checkpoint_id = writes.checkpoint_id)"
+                )
+        with self.cursor() as cur:
+            cur.execute("PRAGMA incremental_vacuum").fetchall()
+            cur.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return stats
+
+
+def _connect(path: str, **kwargs: Any) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return sqlite3.connect(path, check_same_thread=False, timeout=30, **kwargs)
+
+
+def create_checkpointer(backend: str = CHECKPOINT_BACKEND, path: str = CHECKPOINT_PATH) -> BaseCheckpointSaver:
+    """
+    Checkpointer for the supervisor graph.
+
+    Args:
+        backend (str): "memory" (bounded number of threads) or "sqlite" (durable, bounded retention)
+        path (str): SQLite file of the sqlite backend
+
+    Returns:
+        BaseCheckpointSaver: Checkpointer to compile the graph with
+    """
+    if backend == "sqlite":
+        return CompactingSqliteSaver(_connect(path))
+    if backend == "memory":
+        return BoundedInMemorySaver()
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND: {backend!r} (expected 'memory' or 'sqlite')")
+
+
+def create_store(backend: str = CHECKPOINT_BACKEND, path: str = CHECKPOINT_PATH) -> BaseStore:
+    """
+    Long-term store for the supervisor graph, in the same SQLite file as the checkpoints.
+
+    With the sqlite backend, items expire after CHECKPOINT_THREAD_TTL_DAYS
+    (unless written with their own ttl) and are swept in the background.
+    """
+    if backend == "sqlite":
+        ttl = None
+        if CHECKPOINT_THREAD_TTL_DAYS > 0:
+            ttl = {
+                "default_ttl": CHECKPOINT_THREAD_TTL_DAYS * 24 * 60,
+                "sweep_interval_minutes": max(1, int(CHECKPOINT_COMPACT_INTERVAL // 60)),
+            }
+        store = SqliteStore(_connect(path, isolation_level=None), ttl=ttl)
+        store.start_ttl_sweeper()
+        return store
+    if backend == "memory":
+        return InMemoryStore()
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND: {backend!r} (expected 'memory' or 'sqlite')")
@@ -0,0 +1,185 @@
+import os
+import threading
+from typing import Dict, Any, Optional, Tuple
+import httpx
+from langchain_openai import ChatOpenAI
+from config.model_config import get_model_config, resolver
+from config.llm_router import SLOT_EXTENSION, LeastOutstandingRouter, RoutingTransport
+from config.llm_hedging import HEDGE_ENABLED, LatencyTracker
+
+# === Configuration ===
+# Maximum simultaneous requests per LLM server; further calls wait for a free slot
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+# Seconds a call may wait for a free slot before failing
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", "300"))
+# Per-call timeouts in seconds (read timeout applies between streamed chunks)
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "300"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+# Keep-alive pool shared by every client
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "64"))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "60"))
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that frees its concurrency slot once it is closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class ConcurrencyLimitedTransport(httpx.BaseTransport):
+    """
+    HTTP transport that allows at most `max_concurrency` in-flight requests
+    per server (scheme, host, port).
+
+    A slot is held until the response body is closed, so streamed
+    completions count for their whole duration. A SLOT_EXTENSION callback
+    on the request is called once the slot is acquired.
+    """
+
+    # RoutingTransport starts the hedge deadline from the SLOT_EXTENSION callback
+    signals_slot = True
+
+    def __init__(self, transport: httpx.BaseTransport, max_concurrency: int, queue_timeout: float):
+        self._transport = transport
+        self._max_concurrency = max_concurrency
+        self._queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._slots: Dict[Tuple[bytes, bytes, Optional[int]], threading.BoundedSemaphore] = {}
+
+    def _slot(self, url: httpx.URL) -> threading.BoundedSemaphore:
+        key = (url.raw_scheme, url.raw_host, url.port)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = threading.BoundedSemaphore(self._max_concurrency)
+        return slot
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        slot = self._slot(request.url)
+        if not slot.acquire(timeout=self._queue_timeout):
+            raise httpx.PoolTimeout(f"No free LLM slot for {request.url.host} after {self._queue_timeout}s", request=request)
+        on_slot = request.extensions.get(SLOT_EXTENSION)
+
+        released = threading.Event()
+
+        def release() -> None:
+            if not released.is_set():
+                released.set()
+                slot.release()
+
+        try:
+            if on_slot is not None:
+                on_slot()
+            response = self._transport.handle_request(request)
+        except BaseException:
+            release()
+            raise
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+# Spreads requests for the vLLM endpoints over every configured node
+router = LeastOutstandingRouter(resolver)
+# First-token latencies and hedge counters; None unless LLM_HEDGE=1
+hedge_tracker: Optional[LatencyTracker] = LatencyTracker() if HEDGE_ENABLED else None
+
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+_models: Dict[Tuple, ChatOpenAI] = {}
+_models_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """The process-wide keep-alive HTTP client used by every chat model."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                transport = httpx.HTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+                    ),
+                    retries=0,
+                )
+                # Route vLLM requests to the least busy node first, then apply that node's concurrency limit
+                _http_client = httpx.Client(
+                    transport=RoutingTransport(
+                        ConcurrencyLimitedTransport(transport, LLM_MAX_CONCURRENCY, LLM_QUEUE_TIMEOUT),
+                        router,
+                        hedging=hedge_tracker,
+                    ),
+                    timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                )
+    return _http_client
+
+
+def get_chat_model(
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    model_name: Optional[str] = None,
+    streaming: bool = True,
+    **kwargs: Any,
+) -> ChatOpenAI:
+    """
+    Get a chat model that shares the process-wide connection pool and
+    concurrency limit.
+
+    Models are created on first request and reused for identical settings.
+    Arguments left as None come from get_model_config() (the vLLM server).
+
+    Args:
+        base_url (Optional[str]): OpenAI-compatible endpoint
+        api_key (Optional[str]): API key for the endpoint
+        model_name (Optional[str]): Served model name
+        streaming (bool): Stream responses
+        **kwargs: Extra ChatOpenAI settings (e.g. temperature)
+
+    Returns:
+        ChatOpenAI: Shared chat model instance
+    """
+    if base_url is None or api_key is None or model_name is None:
+        config = get_model_config()
+        base_url = base_url or config["base_url"]
+        api_key = api_key or config["api_key"]
+        model_name = model_name or config["model_name"]
+
+    key = (base_url, api_key, model_name, streaming, repr(sorted(kwargs.items())))
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                model = ChatOpenAI(
+                    base_url=base_url,
+                    api_key=api_key,
+                    model_name=model_name,
+                    streaming=streaming,
+                    http_client=get_http_client(),
+                    timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                    max_retries=LLM_MAX_RETRIES,
+                    **kwargs,
+                )
+                _models[key] = model
+    return model
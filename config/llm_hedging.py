@@ -0,0 +1,320 @@
+import os
+import time
+import queue
+import random
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# === Configuration ===
+# Hedging is opt-in: LLM_HEDGE=1 turns it on for requests to the vLLM nodes
+HEDGE_ENABLED = os.environ.get("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+# A duplicate is sent once the first token is later than this percentile of recent requests
+HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))
+# No hedging until this many latencies have been observed
+HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Lower bound on the deadline in seconds, so fast periods do not trigger a hedge on every request
+HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY", "0.5"))
+# Number of recent latencies the percentile is computed over
+HEDGE_WINDOW = 200
+# Duplicates sent per request at most
+HEDGE_MAX_EXTRA = 1
+
+
+class LatencyTracker:
+    """
+    Recent first-token latencies, per kind of request.
+
+    deadline() is the HEDGE_PERCENTILE of the last HEDGE_WINDOW samples
+    (at least HEDGE_MIN_DELAY), or None while there are too few samples.
+    """
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, min_samples: int = HEDGE_MIN_SAMPLES,
+                 min_delay: float = HEDGE_MIN_DELAY, window: int = HEDGE_WINDOW):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.window = window
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        self._samples: Dict[Hashable, Deque[float]] = {}
+
+    def record(self, key: Hashable, latency: float) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        rank = min(len(samples) - 1, int(len(samples) * self.percentile / 100.0))
+        return max(self.min_delay, samples[rank])
+
+    def count_hedge(self) -> None:
+        """Count a duplicate that was sent."""
+        with self._lock:
+            self.hedged += 1
+
+    def count_hedge_win(self) -> None:
+        """Count a call that was won by a duplicate."""
+        with self._lock:
+            self.hedge_wins += 1
+
+
+class Attempt:
+    """
+    One try of a hedged call; cancel() runs the registered cleanups (e.g. closing the response).
+
+    start() marks the moment the attempt is really sent, after any wait for a
+    client-side slot; the hedge deadline is counted from there.
+    """
+
+    def __init__(self, index: int, on_start: Optional[Callable[[], None]] = None):
+        self.index = index
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._started = False
+        self._on_start = on_start
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        if self._on_start is not None:
+            self._on_start()
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Register a cleanup; it runs immediately if the attempt was already cancelled."""
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        _quietly(callback)
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            _quietly(callback)
+
+
+# Queued by Attempt.start() to start the deadline clock
+_STARTED = object()
+
+
+def _quietly(callback: Callable[[], None]) -> None:
+    try:
+        callback()
+    except Exception:
+        pass
+
+
+def hedged_call(
+    run: Callable[[Attempt], T],
+    deadline: Optional[float],
+    discard: Optional[Callable[[T], None]] = None,
+    max_extra: int = HEDGE_MAX_EXTRA,
+    tracker: Optional[LatencyTracker] = None,
+) -> T:
+    """
+    Run `run` and, if it has not returned within `deadline` seconds of
+    calling attempt.start(), run it again in parallel; the first successful
+    result wins. An attempt that never calls start() (e.g. still queued for a
+    connection slot) is never hedged.
+
+    Losing attempts are cancelled (their on_cancel cleanups run) and results
+    they still produce are passed to `discard`. A failed attempt starts the
+    next duplicate right away; the error is raised only if every attempt fails.
+
+    Args:
+        run (Callable[[Attempt], T]): One attempt; calls attempt.start() when sent and returns once the first token is available
+        deadline (Optional[float]): Seconds before a duplicate is sent; None disables hedging
+        discard (Optional[Callable[[T], None]]): Releases the result of a losing attempt
+        max_extra (int): Duplicates sent at most
+        tracker (Optional[LatencyTracker]): Receives hedge counters
+
+    Returns:
+        T: Result of the first attempt that succeeded
+    """
+    if deadline is None or max_extra <= 0:
+        return run(Attempt(0))
+
+    results: "queue.Queue" = queue.Queue()
+    attempts: List[Attempt] = []
+    lock = threading.Lock()
+    winner: List[Attempt] = []
+
+    def worker(attempt: Attempt) -> None:
+        try:
+            result = run(attempt)
+        except BaseException as e:
+            results.put((attempt, None, e))
+            return
+        with lock:
+            if not winner and not attempt.cancelled:
+                results.put((attempt, result, None))
+                return
+        if discard is not None:
+            _quietly(lambda: discard(result))
+
+    def launch() -> None:
+        index = len(attempts)
+        attempt = Attempt(index, on_start=lambda: results.put((attempts[index], _STARTED, None)))
+        attempts.append(attempt)
+        threading.Thread(target=worker, args=(attempt,), name=f"llm-hedge-{attempt.index}", daemon=True).start()
+
+    launch()
+    pending = 1
+    # When the newest attempt was sent; None while it is still waiting to start
+    sent_at: Optional[float] = None
+    error: Optional[BaseException] = None
+    while pending:
+        wait = None
+        if sent_at is not None and len(attempts) <= max_extra:
+            wait = max(0.0, sent_at + deadline - time.monotonic())
+        try:
+            attempt, result, exc = results.get(timeout=wait)
+        except queue.Empty:
+            launch()
+            pending += 1
+            sent_at = None
+            if tracker is not None:
+                tracker.count_hedge()
+            continue
+        if result is _STARTED:
+            if attempt is attempts[-1]:
+                sent_at = time.monotonic()
+            continue
+        pending -= 1
+        if exc is not None:
+            error = error or exc
+            if len(attempts) <= max_extra:
+                launch()
+                pending += 1
+                sent_at = None
+            continue
+        with lock:
+            winner.append(attempt)
+            # Results that arrived meanwhile lost; later ones are discarded by their workers
+            leftovers = []
+            while not results.empty():
+                leftovers.append(results.get_nowait())
+        if discard is not None:
+            for _, other_result, other_exc in leftovers:
+                if other_exc is None and other_result is not _STARTED:
+                    _quietly(lambda: discard(other_result))
+        for other in attempts:
+            if other is not attempt:
+                other.cancel()
+        if attempt.index > 0 and tracker is not None:
+            tracker.count_hedge_win()
+        return result
+    raise error
+
+
+# === Local benchmark ===
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99)}
+
+
+def _simulated_latency(rng: random.Random, scale: float, stall_rate: float) -> float:
+    # Mostly log-normal service times with occasional stalls (preempted or queued behind long prompts)
+    latency = rng.lognormvariate(0.0, 0.3) * scale
+    if rng.random() < stall_rate:
+        latency *= rng.uniform(5.0, 15.0)
+    return latency
+
+
+def benchmark(requests: int = 400, concurrency: int = 8, scale: float = 0.02, stall_rate: float = 0.05,
+              percentile: float = HEDGE_PERCENTILE, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """
+    Compare plain and hedged calls against simulated endpoints.
+
+    Each attempt sleeps for a latency drawn independently (as if it went to
+    another node) and stops early when cancelled. The hedged run learns its
+    deadline online, exactly as the transport does.
+
+    Returns:
+        Dict[str, Dict[str, float]]: {"plain": {...}, "hedged": {...}} with p50/p95/p99 in seconds
+    """
+    report: Dict[str, Dict[str, float]] = {}
+    for mode in ("plain", "hedged"):
+        rng = random.Random(seed)
+        rng_lock = threading.Lock()
+        tracker = LatencyTracker(percentile=percentile, min_samples=HEDGE_MIN_SAMPLES, min_delay=0.0)
+        work = [0]
+
+        def run(attempt: Attempt) -> float:
+            attempt.start()
+            with rng_lock:
+                latency = _simulated_latency(rng, scale, stall_rate)
+            stop = threading.Event()
+            attempt.on_cancel(stop.set)
+            started = time.monotonic()
+            stop.wait(latency)
+            with rng_lock:
+                work[0] += time.monotonic() - started
+            if not stop.is_set():
+                tracker.record("bench", latency)
+            return latency
+
+        def call(_: int) -> float:
+            started = time.monotonic()
+            deadline = tracker.deadline("bench") if mode == "hedged" else None
+            hedged_call(run, deadline, tracker=tracker)
+            return time.monotonic() - started
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = list(pool.map(call, range(requests)))
+        stats = _percentiles(latencies)
+        stats["hedged"] = tracker.hedged
+        stats["hedge_wins"] = tracker.hedge_wins
+        stats["work_s"] = work[0]
+        report[mode] = stats
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark hedged LLM calls against simulated endpoints.")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scale", type=float, default=0.02, help="median latency in seconds")
+    parser.add_argument("--stall-rate", type=float, default=0.05, help="share of requests that stall 5-15x")
+    parser.add_argument("--percentile", type=float, default=HEDGE_PERCENTILE)
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.requests, args.concurrency, args.scale, args.stall_rate, args.percentile)
+    plain = report["plain"]
+    print(f"{'':8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hedged':>7} {'won':>5} {'work s':>7}")
+    for mode, stats in report.items():
+        print(
+            f"{mode:8} {stats['p50'] * 1000:8.1f} {stats['p95'] * 1000:8.1f} {stats['p99'] * 1000:8.1f} "
+            f"{stats['hedged']:7d} {stats['hedge_wins']:5d} {stats['work_s']:7.2f}"
+        )
+    hedged = report["hedged"]
+    print("reduction: " + ", ".join(f"{p} {100 * (1 - hedged[p] / plain[p]):.0f}%" for p in ("p50", "p95", "p99")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+import httpx
+from config.llm_hedging import Attempt, LatencyTracker, hedged_call
+
+# === Configuration ===
+# Seconds a node is skipped after a connection error or 5xx (the health check can re-admit it sooner)
+ROUTER_EJECT_SECONDS = float(os.environ.get("LLM_ROUTER_EJECT_SECONDS", "30"))
+# Nodes tried for one request before the connection error is raised
+ROUTER_MAX_ATTEMPTS = int(os.environ.get("LLM_ROUTER_MAX_ATTEMPTS", "3"))
+# Weight of the newest sample in the moving latency averages
+LATENCY_EWMA_ALPHA = 0.2
+# Seconds of completed requests used for the throughput figures
+THROUGHPUT_WINDOW = 60.0
+# Status codes that mean the node itself is unavailable, not that the request was bad
+UNAVAILABLE_STATUS = {502, 503, 504}
+# Request extension holding a callback that a queueing transport calls once the request has a slot
+SLOT_EXTENSION = "llm_slot_acquired"
+
+
+def origin(url: Any) -> str:
+    """Canonical scheme://host:port of a URL or endpoint string."""
+    url = httpx.URL(str(url))
+    port = url.port or (443 if url.scheme == "https" else 80)
+    host = f"[{url.host}]" if ":" in url.host else url.host
+    return f"{url.scheme}://{host}:{port}"
+
+
+class NodeStats:
+    """Load and latency figures of one node."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.first_byte_ewma: Optional[float] = None
+        self.duration_ewma: Optional[float] = None
+        # (finished_at, bytes received)
+        self.completed: Deque[Tuple[float, int]] = deque()
+
+    def record(self, first_byte: float, duration: float, nbytes: int, now: float) -> None:
+        self.first_byte_ewma = _ewma(self.first_byte_ewma, first_byte)
+        self.duration_ewma = _ewma(self.duration_ewma, duration)
+        self.completed.append((now, nbytes))
+        self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        while self.completed and now - self.completed[0][0] > THROUGHPUT_WINDOW:
+            self.completed.popleft()
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        self._trim(now)
+        window = THROUGHPUT_WINDOW
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "ejected": self.ejected_until > now,
+            "first_byte_s": round(self.first_byte_ewma, 3) if self.first_byte_ewma is not None else None,
+            "duration_s": round(self.duration_ewma, 3) if self.duration_ewma is not None else None,
+            "requests_per_min": round(len(self.completed) * 60.0 / window, 1),
+            "kb_per_s": round(sum(n for _, n in self.completed) / 1024.0 / window, 2),
+        }
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    return sample if current is None else (1 - LATENCY_EWMA_ALPHA) * current + LATENCY_EWMA_ALPHA * sample
+
+
+class LeastOutstandingRouter:
+    """
+    Picks the node with the fewest in-flight requests.
+
+    Nodes come from `resolver` (anything with endpoints(), is_healthy() and
+    report_failure(), e.g. config.model_config.resolver). A node is skipped
+    while the resolver reports it unhealthy or for ROUTER_EJECT_SECONDS after
+    it refused a connection or answered 502/503/504. Ties go to the node with
+    the lower first-byte latency. If every node is out, all of them are tried
+    anyway rather than failing outright.
+    """
+
+    def __init__(self, resolver: Any, eject_seconds: float = ROUTER_EJECT_SECONDS):
+        self.resolver = resolver
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+        self._stats: Dict[str, NodeStats] = {}
+        # Every origin that has been part of the pool, so requests built for a
+        # node that has since left are still routed
+        self._known: Set[str] = set()
+
+    def nodes(self, timeout: Optional[float] = None) -> List[str]:
+        nodes = self.resolver.endpoints() if timeout is None else self.resolver.endpoints(timeout=timeout)
+        with self._lock:
+            self._known.update(origin(node) for node in nodes)
+        return nodes
+
+    def routes(self, url: Any) -> bool:
+        """True if requests to this URL's origin should be load balanced."""
+        try:
+            # Never wait for discovery here: requests to other hosts must not block
+            self.nodes(timeout=0)
+        except RuntimeError:
+            return False
+        return origin(url) in self._known
+
+    def _node_stats(self, node: str) -> NodeStats:
+        stats = self._stats.get(node)
+        if stats is None:
+            stats = self._stats[node] = NodeStats()
+        return stats
+
+    def _in_rotation(self, node: str, now: float) -> bool:
+        return self.resolver.is_healthy(node) and self._node_stats(node).ejected_until <= now
+
+    def available(self) -> List[str]:
+        """Nodes currently healthy and not ejected."""
+        nodes = self.nodes()
+        now = time.monotonic()
+        with self._lock:
+            return [node for node in nodes if self._in_rotation(node, now)]
+
+    def acquire(self, exclude: Set[str] = frozenset()) -> Optional[str]:
+        """
+        Reserve a node for one request.
+
+        Returns:
+            Optional[str]: Node endpoint, or None if every node is in `exclude`
+        """
+        nodes = [node for node in self.nodes() if node not in exclude]
+        if not nodes:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            available = [node for node in nodes if self._in_rotation(node, now)] or nodes
+
+            def load(node: str) -> Tuple[int, float, int]:
+                stats = self._node_stats(node)
+                return stats.in_flight, stats.first_byte_ewma or 0.0, stats.requests
+
+            node = min(available, key=load)
+            stats = self._node_stats(node)
+            stats.in_flight += 1
+            stats.requests += 1
+            return node
+
+    def release(self, node: str, first_byte: Optional[float] = None, duration: Optional[float] = None, nbytes: int = 0) -> None:
+        """Return a node reserved by acquire(); timings are recorded for successful requests."""
+        with self._lock:
+            stats = self._node_stats(node)
+            stats.in_flight = max(0, stats.in_flight - 1)
+            if first_byte is not None and duration is not None:
+                stats.record(first_byte, duration, nbytes, time.monotonic())
+
+    def eject(self, node: str) -> None:
+        """Take a failing node out of rotation and ask the resolver to re-check it."""
+        with self._lock:
+            stats = self._node_stats(node)
+            stats.failures += 1
+            stats.ejections += 1
+            stats.ejected_until = time.monotonic() + self.eject_seconds
+        print(f"[llm_router] Ejected {node} for {self.eject_seconds:.0f}s")
+        self.resolver.report_failure(node)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-node snapshot: in-flight, totals, moving latencies and recent throughput."""
+        now = time.monotonic()
+        with self._lock:
+            return {node: stats.snapshot(now) for node, stats in self._stats.items()}
+
+
+class _TrackedStream(httpx.SyncByteStream):
+    """Response body that reports its size and duration to the router when closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, done):
+        self._stream = stream
+        self._done = done
+        self._nbytes = 0
+        self._finished = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._nbytes += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._finished:
+                self._finished = True
+                self._done(self._nbytes)
+
+
+class _PrefetchedStream(httpx.SyncByteStream):
+    """Response body whose first chunk was already read (to time the first token)."""
+
+    def __init__(self, first: bytes, rest: Iterator[bytes], stream: httpx.SyncByteStream):
+        self._first = first
+        self._rest = rest
+        self._stream = stream
+
+    def __iter__(self):
+        if self._first:
+            yield self._first
+        yield from self._rest
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class RoutingTransport(httpx.BaseTransport):
+    """
+    HTTP transport that sends requests for any pool node to the least busy one.
+
+    The request's scheme/host/port are replaced by the chosen node; the path
+    (/v1/chat/completions, ...) is kept. A node counts as busy until the
+    response body is closed, so streamed completions count for their whole
+    duration. Requests to other hosts pass through unchanged.
+
+    With a `hedging` tracker, a POST whose first body chunk (the first token
+    of a streamed completion) is later than the tracker's deadline is sent
+    again to another node; the first to answer is returned and the other
+    response is closed, which makes vLLM abort that generation. The deadline
+    counts from when the wrapped transport calls the SLOT_EXTENSION callback
+    (ConcurrencyLimitedTransport does once it has a slot), so time spent
+    queueing is not mistaken for a slow node. Requests are not hedged while
+    fewer than two nodes are in rotation.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, router: LeastOutstandingRouter,
+                 max_attempts: int = ROUTER_MAX_ATTEMPTS, hedging: Optional[LatencyTracker] = None):
+        self._transport = transport
+        self._router = router
+        self._max_attempts = max_attempts
+        self._hedging = hedging
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not self._router.routes(request.url):
+            return self._transport.handle_request(request)
+        if self._hedging is not None and request.method == "POST":
+            return self._send_hedged(request)
+        return self._send(request, set(), threading.Lock())
+
+    def _send(self, request: httpx.Request, tried: Set[str], tried_lock: threading.Lock,
+              on_start: Optional[Callable[[], None]] = None) -> httpx.Response:
+        signals_slot = getattr(self._transport, "signals_slot", False)
+        while True:
+            # Hedged attempts share `tried`; picking and recording a node is one step
+            with tried_lock:
+                node = self._router.acquire(exclude=tried)
+                if node is not None:
+                    tried.add(node)
+                last_attempt = len(tried) >= self._max_attempts
+            if node is None:
+                raise httpx.ConnectError(f"No reachable LLM node for {request.url}", request=request)
+            extensions = None
+            if on_start is not None:
+                if signals_slot:
+                    extensions = {**request.extensions, SLOT_EXTENSION: on_start}
+                else:
+                    on_start()
+            started = time.monotonic()
+            try:
+                response = self._transport.handle_request(_retarget(request, node, extensions))
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                self._router.release(node)
+                self._router.eject(node)
+                if last_attempt:
+                    raise
+                continue
+            except BaseException:
+                self._router.release(node)
+                raise
+
+            if response.status_code in UNAVAILABLE_STATUS:
+                self._router.eject(node)
+                if not last_attempt:
+                    response.close()
+                    self._router.release(node)
+                    continue
+
+            first_byte = time.monotonic() - started
+
+            def done(nbytes: int, node: str = node, started: float = started, first_byte: float = first_byte) -> None:
+                self._router.release(node, first_byte, time.monotonic() - started, nbytes)
+
+            return httpx.Response(
+                status_code=response.status_code,
+                headers=response.headers,
+                stream=_TrackedStream(response.stream, done),
+                extensions=response.extensions,
+            )
+
+    def _send_hedged(self, request: httpx.Request) -> httpx.Response:
+        tracker = self._hedging
+        key = (request.url.path, _is_streaming(request))
+        # Shared by both attempts so the duplicate goes to a different node
+        tried: Set[str] = set()
+        tried_lock = threading.Lock()
+        # A duplicate needs a second node; with one it would fail at once
+        deadline = tracker.deadline(key) if len(self._router.available()) >= 2 else None
+
+        def run(attempt: Attempt) -> Tuple[httpx.Response, bytes, Iterator[bytes]]:
+            sent = [time.monotonic()]
+
+            def on_start() -> None:
+                sent[0] = time.monotonic()
+                attempt.start()
+
+            response = self._send(request, tried, tried_lock, on_start)
+            attempt.on_cancel(response.stream.close)
+            chunks = iter(response.stream)
+            first = b""
+            for first in chunks:
+                if first:
+                    break
+            if not attempt.cancelled:
+                tracker.record(key, time.monotonic() - sent[0])
+            return response, first, chunks
+
+        response, first, rest = hedged_call(
+            run,
+            deadline,
+            discard=lambda result: result[0].stream.close(),
+            tracker=tracker,
+        )
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_PrefetchedStream(first, rest, response.stream),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+def _is_streaming(request: httpx.Request) -> bool:
+    try:
+        return bool(json.loads(request.content).get("stream"))
+    except Exception:
+        return False
+
+
+def _retarget(request: httpx.Request, node: str, extensions: Optional[Dict[str, Any]] = None) -> httpx.Request:
+    target = httpx.URL(node)
+    url = request.url.copy_with(scheme=target.scheme, host=target.host, port=target.port)
+    if url == request.url and extensions is None:
+        return request
+    headers = request.headers.copy()
+    headers["Host"] = url.netloc.decode("ascii")
+    return httpx.Request(request.method, url, headers=headers, stream=request.stream,
+                         extensions=request.extensions if extensions is None else extensions)
@@ -1,55 +1,221 @@
 import os
 import time
-from typing import Dict, Any, Optional
+import ipaddress
+import threading
+import urllib.parse
+import urllib.request
+from typing import Dict, Any, List, Optional
+
+# === Configuration ===
+# File written by the vLLM job with the node IP (or a full http:// URL)
+VLLM_IP_FILE = os.environ.get("VLLM_IP_FILE", "/home/kaiyuan/lu2025-17-15/Kaiyuan/qwen_ip.txt")
+VLLM_PORT = 8000
+# How long the first LLM call waits for the endpoint to be discovered
+RESOLVE_TIMEOUT = float(os.environ.get("VLLM_RESOLVE_TIMEOUT", "30"))
+# Seconds between checks of the IP file and between endpoint health checks
+WATCH_INTERVAL = float(os.environ.get("VLLM_WATCH_INTERVAL", "3"))
+HEALTH_INTERVAL = float(os.environ.get("VLLM_HEALTH_INTERVAL", "15"))
+HEALTH_TIMEOUT = float(os.environ.get("VLLM_HEALTH_TIMEOUT", "3"))
+
+# Global variable to store VLLM IP (set it to skip discovery)
+VLLM_IP: Optional[str] = os.environ.get("VLLM_IP") or None
+# Comma-separated list of vLLM nodes (IPs or URLs); takes precedence over VLLM_IP and the IP file
+VLLM_ENDPOINTS: List[str] = [e for e in os.environ.get("VLLM_ENDPOINTS", "").split(",") if e.strip()]
+
+
+def normalize_endpoint(value: str) -> str:
+    """Turn a bare IP/host (optionally with :port) from qwen_ip.txt into the server URL."""
+    value = value.strip().rstrip("/")
+    if value.startswith("http"):
+        return value
+    try:
+        address = ipaddress.ip_address(value.strip("[]"))
+    except ValueError:
+        address = None
+    if address is not None and address.version == 6:
+        # A bare IPv6 address has colons of its own; only the bracketed form can carry a port
+        value = f"[{address}]"
+    try:
+        port = urllib.parse.urlsplit(f"//{value}").port
+    except ValueError:
+        port = None
+    return f"http://{value}" if port else f"http://{value}:{VLLM_PORT}"
+
+
+def parse_endpoints(text: str) -> List[str]:
+    """Endpoints from the IP file: one node per line (or comma-separated); '#' starts a comment."""
+    endpoints = []
+    for line in text.splitlines():
+        for value in line.split("#", 1)[0].split(","):
+            if value.strip():
+                endpoint = normalize_endpoint(value)
+                if endpoint not in endpoints:
+                    endpoints.append(endpoint)
+    return endpoints
+
+
+def check_health(endpoint: str, timeout: float = HEALTH_TIMEOUT) -> bool:
+    """True if the OpenAI-compatible server answers GET /v1/models."""
+    try:
+        with urllib.request.urlopen(f"{endpoint}/v1/models", timeout=timeout) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+class EndpointResolver:
+    """
+    Resolves the vLLM endpoints in the background.
+
+    Nothing happens at import. The first call to get() or endpoints() starts a
+    daemon thread that watches the IP file and health-checks every node. The
+    list is re-read whenever the file changes, so calls follow the vLLM nodes
+    when they move. Healthy nodes are checked every HEALTH_INTERVAL seconds,
+    failed ones every WATCH_INTERVAL so they rejoin quickly. Only the first
+    lookup can block, and only until an endpoint is known.
+    """
+
+    def __init__(self, ip_file: str, static: Optional[List[str]] = None):
+        self.ip_file = ip_file
+        self._static = [normalize_endpoint(e) for e in static] if static else None
+        self._endpoints: List[str] = list(self._static or [])
+        self._health: Dict[str, bool] = {}
+        self._checked: Dict[str, float] = {}
+        self._file_stamp = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vllm-endpoint-resolver", daemon=True)
+                self._thread.start()
+
+    def _read_endpoints(self) -> Optional[List[str]]:
+        if self._static:
+            return self._static
+        try:
+            st = os.stat(self.ip_file)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._file_stamp and self._endpoints:
+            return self._endpoints
+        with open(self.ip_file, "r") as f:
+            endpoints = parse_endpoints(f.read())
+        if not endpoints:
+            return None
+        self._file_stamp = stamp
+        return endpoints
+
+    def _publish(self, endpoints: List[str], health: Dict[str, bool]) -> None:
+        with self._changed:
+            if endpoints != self._endpoints:
+                print(f"[model_config] vLLM endpoints: {', '.join(endpoints)}")
+            for endpoint, healthy in health.items():
+                if endpoint in endpoints and healthy != self._health.get(endpoint):
+                    print(f"[model_config] {endpoint} {'is healthy' if healthy else 'is not answering'}")
+            self._endpoints = endpoints
+            self._health = {e: health.get(e, self._health.get(e, False)) for e in endpoints}
+            self._changed.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                endpoints = self._read_endpoints()
+                if endpoints:
+                    now = time.monotonic()
+                    due = [
+                        e for e in endpoints
+                        if not self._health.get(e)
+                        or now - self._checked.get(e, 0.0) >= HEALTH_INTERVAL
+                    ]
+                    health = {}
+                    for endpoint in due:
+                        health[endpoint] = check_health(endpoint)
+                        self._checked[endpoint] = now
+                    self._publish(endpoints, health)
+            except Exception as e:
+                print(f"[model_config] Endpoint discovery error: {e}")
+            self._wake.wait(WATCH_INTERVAL)
+            self._wake.clear()
+
+    def endpoints(self, timeout: float = RESOLVE_TIMEOUT) -> List[str]:
+        """
+        All configured endpoints, waiting up to `timeout` seconds if none has
+        been discovered yet.
+        """
+        self.start()
+        if self._endpoints:
+            return list(self._endpoints)
+
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while not self._endpoints:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError("Failed to locate Qwen server IP.")
+                self._changed.wait(remaining)
+            return list(self._endpoints)
+
+    def get(self, timeout: float = RESOLVE_TIMEOUT) -> str:
+        """The primary endpoint (first in the list); stable while the list is unchanged."""
+        return self.endpoints(timeout)[0]
+
+    def is_healthy(self, endpoint: str) -> bool:
+        """Last health-check result; nodes not checked yet count as healthy."""
+        return self._health.get(endpoint, True)
+
+    def report_failure(self, endpoint: Optional[str] = None) -> None:
+        """Called when a request to an endpoint failed; marks it down and triggers an immediate re-check."""
+        with self._lock:
+            for e in ([endpoint] if endpoint else self._endpoints):
+                if e in self._health:
+                    self._health[e] = False
+        self._wake.set()
+
+    @property
+    def healthy(self) -> bool:
+        return any(self._health.get(e, False) for e in self._endpoints)
+
+
+resolver = EndpointResolver(VLLM_IP_FILE, static=VLLM_ENDPOINTS or ([VLLM_IP] if VLLM_IP else None))
 
-# Global variable to store VLLM IP
-VLLM_IP: Optional[str] = None
 
 def get_vllm_ip() -> str:
     """
-    Get the VLLM server IP address from either global variable or qwen_ip.txt file.
-    Waits for the file to be available if necessary.
-    
+    Get the primary VLLM server address from VLLM_ENDPOINTS, VLLM_IP or qwen_ip.txt.
+
+    Discovery runs in the background; this only waits (up to RESOLVE_TIMEOUT)
+    until the endpoint is known for the first time. With several nodes,
+    requests to this address are spread over all of them by the router in
+    config/llm_router.py.
+
     Returns:
         str: The VLLM server IP address with port
     """
-    global VLLM_IP
-    
-    if VLLM_IP:
-        return VLLM_IP
-        
-    ip_file = os.path.expanduser("/home/kaiyuan/lu2025-17-15/Kaiyuan/qwen_ip.txt")
-    wait_time = 30
-    
-    while not os.path.exists(ip_file) and wait_time > 0:
-        print("Waiting for qwen_ip.txt to be available...")
-        time.sleep(3)
-        wait_time -= 3
-        
-    if os.path.exists(ip_file):
-        with open(ip_file, "r") as f:
-            node_ip = f.read().strip()
-            if not node_ip.startswith("http"):
-                node_ip = f"http://{node_ip}:8000"
-            VLLM_IP = node_ip
-            return VLLM_IP
-    else:
-        raise RuntimeError("Failed to locate Qwen server IP.")
-
-# Local model configuration (OpenAI API compatible format)
+    return resolver.get()
+
+
+# Local model configuration (OpenAI API compatible format); base_url is filled in on first use
 LLM_MODEL: Dict[str, Any] = {
-    "base_url": f"{get_vllm_ip()}/v1",  # Local model service endpoint
-    "api_key": "not-needed",            # Not needed for local deployment
+    "base_url": None,           # Local model service endpoint
+    "api_key": "not-needed",    # Not needed for local deployment
     "model_name": "Qwen72B"     # Model name
 }
 
+
 def get_model_config() -> Dict[str, Any]:
     """
     Get the model configuration in OpenAI compatible format.
-    
+
     Returns:
         Dict[str, Any]: Model configuration dictionary
     """
     # Update base_url with current VLLM IP in case it changed
     LLM_MODEL["base_url"] = f"{get_vllm_ip()}/v1"
-    return LLM_MODEL 
\ No newline at end of file
+    return dict(LLM_MODEL)
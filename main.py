@@ -1,9 +1,12 @@
 import os
 import json
+import re
 import time
+import uuid
 from datetime import datetime
 from rich import print
 from supversior import app  
+from tools.qgis_workers import qgis_pool
 import traceback 
 from langchain_core.messages import BaseMessage
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
@@ -11,8 +14,9 @@ RUN_DIR = r"/home/kaiyuan/lu2025-17-15/Kaiyuan/sp_group/runs"
 os.makedirs(RUN_DIR, exist_ok=True)
 
 def get_next_run_id():
-    existing = [f for f in os.listdir(RUN_DIR) if f.startswith("run_") and f.endswith(".json")]
-    return len(existing) + 1
+    # save_run writes one run_NNN_<timestamp> directory per session
+    ids = [int(m.group(1)) for f in os.listdir(RUN_DIR) if (m := re.match(r"run_(\d+)_", f))]
+    return max(ids, default=0) + 1
 
 def serialize(obj):
     """Convert LangChain message or tool object to plain dict if needed."""
@@ -50,6 +54,8 @@ def save_run(run_id, result, history):
 def main():
     print("[bold cyan]🚀 GIS Multi-Agent System Ready. Type your task below.")
     print("Type [yellow]'reset'[/yellow] to start a new session, or [yellow]'exit'[/yellow] to quit.")
+    # Start the PyQGIS workers while the user types the first task
+    qgis_pool.start()
 
     state = {}
 
@@ -70,6 +76,8 @@ def main():
             continue
 
         run_id = get_next_run_id()
+        # Unique even when several processes share RUN_DIR, so sessions never resume each other's checkpoints
+        thread_id = f"{run_id}-{uuid.uuid4().hex}"
         print(f"\n🧠 [green]Running Agent Workflow (Session #{run_id})...[/green]")
 
         
@@ -82,7 +90,7 @@ def main():
 
             stream = app.stream(
                 {"messages": [{"role": "user", "content": user_input}]},
-                config={"configurable": {"thread_id": str(run_id)}}
+                config={"configurable": {"thread_id": thread_id}}
             )
 
             start = time.time()
@@ -75,7 +75,8 @@ RAG_AGENT_PROMPT="""
 
     📚 Step 3: Query the Knowledge Base
 
-    - Use the tool `rag_context_tool` with your rewritten query.
+    - Use the tool `rag_context_tool` with your rewritten query. When you have several rewrites, pass them together as a list in one call instead of calling the tool once per query.
+    - Include exact API names in the query (e.g. `QgsVectorLayer`, `processing.run('native:buffer')`); the default `hybrid` mode matches them literally, so a small `top_k` (4-6) is usually enough.
     - If the result lacks parameter examples, expressions, or callable structures, try another query.
 
     ---
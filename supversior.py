@@ -1,11 +1,9 @@
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel
 from langgraph_supervisor import create_supervisor
 from langgraph.prebuilt import create_react_agent
 from langgraph_supervisor import create_handoff_tool
-from config.model_config import get_model_config
-from langgraph.checkpoint.memory import InMemorySaver
-from langgraph.store.memory import InMemoryStore
+from config.llm_client import get_chat_model
+from config.checkpointing import create_checkpointer, create_store
 from tools.file_search import query_to_file
 from tools.rag_context import query_context
 from tools.code_runner import code_generate
@@ -14,13 +12,15 @@ from tools.eval_doctor import eval_doctor
 from prompts.agent_prompt_templates import FILE_AGENT_PROMPT, RAG_AGENT_PROMPT, CODE_AGENT_PROMPT, DEBUG_AGENT_PROMPT, EVAL_AGENT_TEMPLATE, SUPERVISOR_PROMPT
 
 
-checkpointer = InMemorySaver()
-store = InMemoryStore()
+# CHECKPOINT_BACKEND=sqlite keeps threads on disk with bounded retention; the default stays in memory
+checkpointer = create_checkpointer()
+store = create_store()
 
-model = ChatOpenAI(
+model = get_chat_model(
     base_url="<openai-base-url>",
     api_key="<openai-api-key>",
-    model_name="gpt-4o-mini"
+    model_name="gpt-4o-mini",
+    streaming=False
     )
 
 file_agent = create_react_agent(
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from batch_runner import code_runs, load_finished, load_tasks
+
+
+def _write_lines(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def test_load_tasks_reads_ids_and_text(tmp_path):
+    tasks_file = tmp_path / "tasks.jsonl"
+    _write_lines(tasks_file, [
+        {"request_id": "r1", "title": "Buffer", "body": "Buffer roads by 100 m"},
+        {"question": "Count rivers"},
+        {"foo": 1},
+    ])
+    tasks = load_tasks(str(tasks_file))
+    assert tasks == [
+        {"id": "r1", "text": "Buffer\n\nBuffer roads by 100 m"},
+        {"id": "line2", "text": "Count rivers"},
+    ]
+
+
+def test_load_tasks_rejects_duplicate_ids(tmp_path):
+    tasks_file = tmp_path / "tasks.jsonl"
+    _write_lines(tasks_file, [{"id": "a", "task": "one"}, {"id": "a", "task": "two"}])
+    with pytest.raises(ValueError, match="duplicate task id 'a'"):
+        load_tasks(str(tasks_file))
+
+
+def test_load_finished_resume(tmp_path):
+    results_file = tmp_path / "results.jsonl"
+    results_file.write_text(
+        json.dumps({"id": "a", "status": "ok"}) + "\n"
+        + json.dumps({"id": "b", "status": "error"}) + "\n"
+        + '{"id": "c", "sta',  # cut off by a crash
+        encoding="utf-8",
+    )
+    assert load_finished(str(results_file), retry_failed=False) == {"a", "b"}
+    assert load_finished(str(results_file), retry_failed=True) == {"a"}
+    assert load_finished(str(tmp_path / "missing.jsonl"), retry_failed=False) == set()
+
+
+def test_code_runs_reads_success_not_field_names():
+    clean = ToolMessage(
+        content="code=\"print(' success=False stdout= terminated_reason=\\'crash\\'')\" output_file='/r/a.shp' tool_used_file='' success=True "
+                "stdout='##RESULT##' stderr='' wall_time=1.0 cpu_time=0.5 terminated_reason=None "
+                "preflight_issues=[] candidate=0 from_cache=None",
+        tool_call_id="1", name="code_generate_tool",
+    )
+    failed = ToolMessage(
+        content="code='x' output_file='' tool_used_file='' success=False stdout='' stderr='Traceback' "
+                "wall_time=2.0 cpu_time=1.0 terminated_reason='traceback' preflight_issues=[] candidate=0 from_cache=None",
+        tool_call_id="2", name="code_generate_tool",
+    )
+    other = ToolMessage(content="success=False stdout=", tool_call_id="3", name="debug_care_tool")
+    assert code_runs([AIMessage(content="hi"), failed, other, clean]) == [
+        {"success": False, "terminated_reason": "traceback"},
+        {"success": True, "terminated_reason": None},
+    ]
@@ -0,0 +1,98 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from tools import catalog_builder
+from tools.catalog_builder import build_catalog, content_hash
+from tools.file_search import FileMetadata
+from tools.geo_catalog import format_entry
+
+SHIPPED_CATALOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geo_metadata.json")
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    """describe_file without GDAL: vector entries whose feature count is the file size; paths in `failing` raise."""
+    failing = set()
+
+    def describe(path, previous_hash=None):
+        if path in failing:
+            raise RuntimeError("cannot open")
+        digest = content_hash(path)
+        if previous_hash is not None and digest == previous_hash:
+            return path, None, digest
+        entry = {"path": path, "type": "vector", "fields": [], "features": os.path.getsize(path),
+                 "description": os.path.basename(path)}
+        return path, entry, digest
+
+    monkeypatch.setattr(catalog_builder, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(catalog_builder, "describe_file", describe)
+    return failing
+
+
+def _dataset(tmp_path, name, data):
+    path = tmp_path / "data" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_unreadable_file_keeps_its_entry_as_stale(tmp_path, reader, full):
+    roads = _dataset(tmp_path, "roads.geojson", b"12345")
+    rivers = _dataset(tmp_path, "rivers.geojson", b"123")
+    output = str(tmp_path / "geo_metadata.json")
+    build_catalog(str(tmp_path / "data"), output)
+
+    with open(roads, "ab") as f:
+        f.write(b"678")
+    reader.add(roads)
+    stats = build_catalog(str(tmp_path / "data"), output, full=full)
+    assert stats["failed"] == 1
+    entries = {entry["path"]: entry for entry in catalog_builder.load_catalog(output)}
+    assert set(entries) == {roads, rivers}
+    assert entries[roads]["stale"] is True
+    assert entries[roads]["features"] == 5
+    assert "stale" not in entries[rivers]
+
+    # Retried on the next build, and no longer stale once read
+    reader.clear()
+    stats = build_catalog(str(tmp_path / "data"), output)
+    assert stats["extracted"] == 1
+    entry = next(e for e in catalog_builder.load_catalog(output) if e["path"] == roads)
+    assert entry["features"] == 8 and "stale" not in entry
+
+
+def test_stale_entry_of_an_unchanged_file_is_retried(tmp_path, reader):
+    roads = _dataset(tmp_path, "roads.geojson", b"12345")
+    output = str(tmp_path / "geo_metadata.json")
+    build_catalog(str(tmp_path / "data"), output)
+    reader.add(roads)
+    build_catalog(str(tmp_path / "data"), output, full=True)
+
+    reader.clear()
+    stats = build_catalog(str(tmp_path / "data"), output)
+    assert (stats["reused"], stats["rehashed"]) == (0, 1)
+    assert "stale" not in catalog_builder.load_catalog(output)[0]
+
+
+def test_removed_files_are_counted_in_full_mode(tmp_path, reader):
+    roads = _dataset(tmp_path, "roads.geojson", b"1")
+    _dataset(tmp_path, "rivers.geojson", b"2")
+    output = str(tmp_path / "geo_metadata.json")
+    build_catalog(str(tmp_path / "data"), output)
+    os.remove(roads)
+    assert build_catalog(str(tmp_path / "data"), output, full=True)["removed"] == 1
+
+
+def test_shipped_catalog_entries_validate():
+    with open(SHIPPED_CATALOG, encoding="utf-8") as f:
+        entries = json.load(f)
+    rasters = [entry for entry in entries if entry["type"] == "raster"]
+    assert rasters
+    for entry in entries:
+        FileMetadata(**{key: entry[key] for key in FileMetadata.model_fields if key in entry})
+    for entry in rasters:
+        assert entry["features"] is None
+        width, height = entry["size"]
+        assert f"Features/Size: {width}x{height} pixels" in format_entry(entry)
@@ -0,0 +1,82 @@
+import sqlite3
+import time
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+from config.checkpointing import BoundedInMemorySaver, CompactingSqliteSaver
+
+
+def _put(saver, thread_id, step, writes=False):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    checkpoint = create_checkpoint(empty_checkpoint(), {}, step)
+    saved = saver.put(config, checkpoint, {"source": "loop", "step": step}, {})
+    if writes:
+        saver.put_writes(saved, [("messages", f"write {step}")], task_id=f"task-{step}")
+    return saved
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def test_memory_saver_drops_least_recently_used_threads():
+    saver = BoundedInMemorySaver(max_threads=2)
+    for thread_id in ("a", "b"):
+        _put(saver, thread_id, 0)
+    # Reading "a" makes "b" the coldest thread
+    assert saver.get_tuple(_config("a")) is not None
+    _put(saver, "c", 0)
+    assert saver.evicted == 1
+    assert saver.get_tuple(_config("b")) is None
+    assert saver.get_tuple(_config("a")) is not None
+    assert saver.get_tuple(_config("c")) is not None
+
+
+def test_memory_saver_delete_thread_frees_its_slot():
+    saver = BoundedInMemorySaver(max_threads=2)
+    _put(saver, "a", 0)
+    _put(saver, "b", 0)
+    saver.delete_thread("a")
+    _put(saver, "c", 0)
+    assert saver.evicted == 0
+    assert saver.get_tuple(_config("b")) is not None
+
+
+def _count(conn, table, thread_id):
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+
+def test_sqlite_saver_keeps_newest_checkpoints_and_their_writes(tmp_path):
+    conn = sqlite3.connect(tmp_path / "checkpoints.sqlite", check_same_thread=False)
+    saver = CompactingSqliteSaver(conn, keep=2, compact_interval=0)
+    saved = [_put(saver, "t", step, writes=True) for step in range(5)]
+    assert _count(conn, "checkpoints", "t") == 2
+    assert _count(conn, "writes", "t") == 2
+    latest = saver.get_tuple(_config("t"))
+    assert latest.config["configurable"]["checkpoint_id"] == saved[-1]["configurable"]["checkpoint_id"]
+    assert len(list(saver.list(_config("t")))) == 2
+
+
+def test_sqlite_compaction_deletes_idle_threads(tmp_path):
+    conn = sqlite3.connect(tmp_path / "checkpoints.sqlite", check_same_thread=False)
+    saver = CompactingSqliteSaver(conn, keep=0, thread_ttl_days=1, compact_interval=0)
+    for step in range(3):
+        _put(saver, "old", step, writes=True)
+    _put(saver, "new", 0)
+    conn.execute("UPDATE thread_activity SET last_used = ? WHERE thread_id = 'old'", (time.time() - 2 * 24 * 3600,))
+    conn.commit()
+
+    # keep=0 retains every checkpoint until retention is switched on
+    assert _count(conn, "checkpoints", "old") == 3
+    assert saver.compact() == {"threads": 1, "checkpoints": 0}
+    assert _count(conn, "checkpoints", "old") == 0
+    assert _count(conn, "writes", "old") == 0
+    assert _count(conn, "thread_activity", "old") == 0
+    assert saver.get_tuple(_config("new")) is not None
+
+    saver.keep = 1
+    for step in range(1, 4):
+        conn.execute(
+            "INSERT INTO checkpoints SELECT thread_id, checkpoint_ns, checkpoint_id || ?, parent_checkpoint_id, "
+            "type, checkpoint, metadata FROM checkpoints WHERE thread_id = 'new' LIMIT 1", (str(step),))
+    conn.commit()
+    assert saver.compact() == {"threads": 0, "checkpoints": 3}
+    assert _count(conn, "checkpoints", "new") == 1
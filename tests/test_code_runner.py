@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from langchain_core.messages import AIMessageChunk
+from tools import code_runner
+from tools.code_runner import CodeRunnerOutput, _stream_until_cancelled, generate_candidates
+
+
+class _StreamingModel:
+    """Chat model whose stream() yields `chunks` one `delay` apart and records when it is closed."""
+
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.sent = 0
+        self.closed = threading.Event()
+
+    def stream(self, prompt):
+        try:
+            for chunk in self.chunks:
+                time.sleep(self.delay)
+                self.sent += 1
+                yield AIMessageChunk(content=chunk)
+        finally:
+            self.closed.set()
+
+
+def test_stream_is_closed_when_cancelled():
+    cancel = threading.Event()
+    model = _StreamingModel(["a"] * 100, delay=0.01)
+    threading.Timer(0.05, cancel.set).start()
+    assert _stream_until_cancelled(model, "prompt", cancel) is None
+    assert model.closed.is_set()
+    assert model.sent < 100
+
+    assert _stream_until_cancelled(_StreamingModel(["a", "b"]), "prompt", threading.Event()) == "ab"
+    # Already cancelled: the request is never sent
+    model = _StreamingModel(["a"])
+    assert _stream_until_cancelled(model, "prompt", cancel) is None
+    assert model.sent == 0
+
+
+def test_losing_generation_is_closed_when_a_candidate_wins(tmp_path, monkeypatch):
+    fast = _StreamingModel(["```python\n", "print('ok')\n", "```"])
+    slow = _StreamingModel(["x"] * 1000, delay=0.01)
+    models = {code_runner.CANDIDATE_TEMPERATURES[0]: fast, code_runner.CANDIDATE_TEMPERATURES[1]: slow}
+    executed = []
+
+    def execute(code, filepaths, output_dir, cwd, cancel, candidate):
+        executed.append(candidate)
+        output_file = os.path.join(output_dir, "result.txt")
+        with open(output_file, "w") as f:
+            f.write("done")
+        return CodeRunnerOutput(code=code, output_file=output_file, tool_used_file="", success=True,
+                                candidate=candidate)
+
+    monkeypatch.setattr(code_runner, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(code_runner, "get_chat_model", lambda temperature: models[temperature])
+    monkeypatch.setattr(code_runner, "execute_code", execute)
+
+    result = generate_candidates("task", "", [], None, count=2)
+    assert result.success and result.candidate == 0
+    assert result.output_file == os.path.join(str(tmp_path), "result.txt")
+    assert slow.closed.wait(2)
+    assert slow.sent < 1000
+    assert executed == [0]
@@ -0,0 +1,111 @@
+import os
+from tools.catalog_builder import _carry_accelerated
+from tools.dataset_accel import _record, accelerated_path
+
+
+def _touch(path, data=b"x"):
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _entry(tmp_path, sha1="aaaa"):
+    shp = _touch(tmp_path / "roads.shp")
+    tif = _touch(tmp_path / "dem.tif")
+    copy = _touch(tmp_path / f"roads_{sha1}.gpkg")
+    _touch(tmp_path / "roads.qix")
+    _touch(tmp_path / "dem.tif.ovr")
+    vector = {"path": str(shp), "fingerprint": {"sha1": sha1}, "accelerated_path": str(copy),
+              "accelerated": {"qix": True, "format": "GPKG", "source_sha1": sha1}}
+    raster = {"path": str(tif), "type": "raster", "fingerprint": {"sha1": sha1},
+              "accelerated": {"overviews": [2, 4], "source_sha1": sha1}}
+    return vector, raster
+
+
+def test_unchanged_content_keeps_acceleration(tmp_path):
+    vector, raster = _entry(tmp_path)
+    entry = {"path": vector["path"]}
+    _carry_accelerated(entry, vector, "aaaa")
+    assert entry["accelerated_path"] == vector["accelerated_path"]
+    assert os.path.exists(tmp_path / "roads.qix")
+    assert os.path.exists(vector["accelerated_path"])
+
+
+def test_changed_content_deletes_index_overviews_and_copy(tmp_path):
+    vector, raster = _entry(tmp_path)
+    for old in (vector, raster):
+        entry = {"path": old["path"], "fingerprint": {"sha1": "bbbb"}}
+        _carry_accelerated(entry, old, "bbbb")
+        assert "accelerated" not in entry and "accelerated_path" not in entry
+        assert accelerated_path(entry) is None
+    assert not os.path.exists(tmp_path / "roads.qix")
+    assert not os.path.exists(tmp_path / "dem.tif.ovr")
+    assert not os.path.exists(vector["accelerated_path"])
+    assert os.path.exists(vector["path"]) and os.path.exists(raster["path"])
+
+
+def test_new_copy_replaces_the_old_one(tmp_path):
+    vector, _ = _entry(tmp_path)
+    old_copy = vector["accelerated_path"]
+    vector["fingerprint"]["sha1"] = "cccc"
+    new_copy = _touch(tmp_path / "roads_cccc.gpkg")
+    assert _record(vector, {"qix": True, "path": str(new_copy), "format": "GPKG"})
+    assert vector["accelerated_path"] == str(new_copy)
+    assert vector["accelerated"] == {"qix": True, "format": "GPKG", "source_sha1": "cccc"}
+    assert accelerated_path(vector) == str(new_copy)
+    assert not os.path.exists(old_copy)
+
+
+def test_dropping_the_copy_deletes_it(tmp_path):
+    vector, _ = _entry(tmp_path)
+    old_copy = vector["accelerated_path"]
+    assert not _record(vector, {"qix": True})
+    assert "accelerated_path" not in vector
+    assert not os.path.exists(old_copy)
+
+
+def _catalog(tmp_path, entries):
+    import json
+    path = tmp_path / "geo_metadata.json"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    return str(path)
+
+
+def test_entries_without_fingerprint_are_accelerated(tmp_path, monkeypatch):
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    from tools import dataset_accel
+    from tools.catalog_builder import content_hash
+
+    shp = _touch(tmp_path / "roads.shp", b"shape")
+    calls = []
+
+    def fake_accelerate(entry, output_dir, to_gpkg=False, to_cog=False):
+        calls.append(entry["path"])
+        return {"qix": True}
+
+    monkeypatch.setattr(dataset_accel, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(dataset_accel, "accelerate_file", fake_accelerate)
+    # As in the shipped geo_metadata.json: no fingerprint at all
+    catalog = _catalog(tmp_path, [{"path": str(shp), "type": "vector"}])
+
+    stats = dataset_accel.accelerate_catalog(catalog)
+    assert stats == {"accelerated": 1, "converted": 0, "skipped": 0, "failed": 0}
+    assert calls == [str(shp)]
+    entry = json.loads(open(catalog, encoding="utf-8").read())[0]
+    assert entry["accelerated"]["source_sha1"] == entry["fingerprint"]["sha1"] == content_hash(str(shp))
+
+    # Now current: skipped on the next pass
+    assert dataset_accel.accelerate_catalog(catalog)["skipped"] == 1
+    assert calls == [str(shp)]
+
+
+def test_missing_hashes_never_count_as_current(tmp_path):
+    copy = _touch(tmp_path / "roads_.gpkg")
+    entry = {"path": str(tmp_path / "roads.shp"), "accelerated_path": str(copy),
+             "accelerated": {"qix": True, "source_sha1": None}}
+    assert accelerated_path(entry) is None
+    entry["fingerprint"] = {"sha1": "aaaa"}
+    assert accelerated_path(entry) is None
+    entry["accelerated"]["source_sha1"] = "aaaa"
+    assert accelerated_path(entry) == str(copy)
@@ -0,0 +1,25 @@
+import threading
+import numpy as np
+from tools import embedding_service
+from tools.embedding_service import EmbeddingCache
+
+
+def test_counters_are_exact_under_concurrency(monkeypatch):
+    cache = EmbeddingCache(max_entries=16)
+    monkeypatch.setattr(embedding_service, "embedding_cache", cache)
+    monkeypatch.setattr(embedding_service, "encode",
+                        lambda texts, **kwargs: np.ones((len(texts), 4), dtype=np.float32))
+    embedding_service.encode_cached(["warm"])
+    barrier = threading.Barrier(8)
+
+    def work():
+        barrier.wait()
+        for _ in range(500):
+            embedding_service.encode_cached(["warm", "warm"])
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert (cache.hits, cache.misses) == (8 * 500 * 2, 1)
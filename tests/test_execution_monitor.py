@@ -0,0 +1,84 @@
+import subprocess
+import sys
+import time
+import resource
+import threading
+import pytest
+from tools.execution_monitor import (
+    SCRIPT_MEMORY_LIMIT_MB, ExecutionMonitor, limit_process, process_cpu_seconds, restore_limits, run_subprocess,
+)
+
+pytestmark = pytest.mark.skipif(not hasattr(resource, "prlimit"), reason="needs resource.prlimit")
+
+
+def test_limits_are_set_and_restored_on_a_running_process():
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        before = {which: resource.prlimit(proc.pid, which) for which in (resource.RLIMIT_CPU, resource.RLIMIT_AS)}
+        previous = limit_process(proc.pid, cpu_seconds=60, memory_mb=2048)
+        assert previous == before
+        assert resource.prlimit(proc.pid, resource.RLIMIT_AS)[0] == 2048 * 1024 * 1024
+        assert 60 <= resource.prlimit(proc.pid, resource.RLIMIT_CPU)[0] <= 61 + process_cpu_seconds(proc.pid)
+        restore_limits(proc.pid, previous)
+        assert {which: resource.prlimit(proc.pid, which) for which in before} == before
+    finally:
+        proc.kill()
+        proc.wait()
+    # Gone: restoring is a no-op, limiting raises
+    restore_limits(proc.pid, previous)
+    with pytest.raises(OSError):
+        limit_process(proc.pid)
+
+
+def test_cpu_time_of_another_process():
+    proc = subprocess.Popen([sys.executable, "-c", "import time\nt = time.process_time()\nwhile time.process_time() - t < 0.5: pass\ntime.sleep(30)"])
+    try:
+        time.sleep(1.5)
+        assert process_cpu_seconds(proc.pid) >= 0.4
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def test_run_subprocess_limits_the_child_not_the_parent():
+    parent = resource.getrlimit(resource.RLIMIT_AS)
+    code = "import time, resource; time.sleep(0.3); print(resource.getrlimit(resource.RLIMIT_AS)[0])"
+    result = run_subprocess([sys.executable, "-c", code], timeout=10)
+    assert result.returncode == 0
+    if SCRIPT_MEMORY_LIMIT_MB > 0:
+        assert int(result.stdout) == SCRIPT_MEMORY_LIMIT_MB * 1024 * 1024
+    assert resource.getrlimit(resource.RLIMIT_AS) == parent
+
+
+def test_monitor_finds_a_traceback_split_across_reads():
+    monitor = ExecutionMonitor(timeout=60, grace=0)
+    monitor.feed("stdout", "Traceback (most recent call last):\n")
+    assert monitor.check() is None
+    monitor.feed("stderr", "warning\nTraceback (most rec")
+    monitor.feed("stderr", "ent call last):\n")
+    assert monitor.check() == "traceback"
+    assert "[Aborted]" in monitor.result(None, 0.0, "traceback").stderr
+
+
+def test_script_is_stopped_after_a_traceback():
+    # Prints the traceback but keeps running, as scripts that catch and log errors do
+    code = "import time, traceback\ntry:\n    1 / 0\nexcept Exception:\n    traceback.print_exc()\ntime.sleep(30)"
+    started = time.monotonic()
+    result = run_subprocess([sys.executable, "-c", code], timeout=30)
+    assert result.terminated_reason == "traceback"
+    assert "ZeroDivisionError" in result.stderr
+    assert time.monotonic() - started < 15
+
+
+@pytest.mark.parametrize("reason", ["timeout", "cancelled"])
+def test_script_is_stopped_on_timeout_or_cancel(reason):
+    cancel = threading.Event()
+    timeout = 0.5 if reason == "timeout" else 30
+    if reason == "cancelled":
+        threading.Timer(0.5, cancel.set).start()
+    started = time.monotonic()
+    result = run_subprocess([sys.executable, "-c", "print('started', flush=True)\nimport time\ntime.sleep(30)"],
+                            timeout=timeout, cancel=cancel)
+    assert result.terminated_reason == reason
+    assert result.stdout.strip() == "started"
+    assert time.monotonic() - started < 10
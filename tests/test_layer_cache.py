@@ -0,0 +1,203 @@
+import sys
+import types
+import pytest
+from tools import layer_cache as layer_cache_module
+from tools.layer_cache import LayerCache
+
+
+class _Signal:
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def emit(self, *args):
+        for slot in self._slots:
+            slot(*args)
+
+
+class _Provider:
+    def __init__(self):
+        self.dataChanged = _Signal()
+
+
+class QgsVectorLayer:
+    """Just enough of a vector layer for the cache: named like the real class, since keys use the class name."""
+
+    opened = 0
+
+    def __init__(self, path, name="", provider="ogr"):
+        QgsVectorLayer.opened += 1
+        self.path = path
+        self.name = name
+        self.deleted = False
+        self.editable = False
+        self.read_only = False
+        self.subset = ""
+        self.provider = _Provider()
+        for signal in layer_cache_module.CHANGE_SIGNALS:
+            setattr(self, signal, _Signal())
+
+    def isValid(self):
+        return True
+
+    def id(self):
+        return str(id(self))
+
+    def setName(self, name):
+        self.name = name
+
+    def crs(self):
+        return types.SimpleNamespace(authid=lambda: "EPSG:4326")
+
+    def subsetString(self):
+        return self.subset
+
+    def fields(self):
+        return types.SimpleNamespace(names=lambda: ["id"])
+
+    def dataProvider(self):
+        return self.provider
+
+    def isEditable(self):
+        return self.editable
+
+    def rollBack(self):
+        self.editable = False
+
+    def removeSelection(self):
+        pass
+
+    def setReadOnly(self, value):
+        self.read_only = value
+
+    def isReadOnly(self):
+        return self.read_only
+
+
+class _Project:
+    def __init__(self):
+        self.layers = {}
+
+    def mapLayer(self, layer_id):
+        return self.layers.get(layer_id)
+
+    def addMapLayers(self, layers, add_to_legend=True):
+        self.layers.update({layer.id(): layer for layer in layers})
+
+    def takeMapLayer(self, layer):
+        return self.layers.pop(layer.id(), None)
+
+    def removeMapLayer(self, layer_id):
+        self.layers.pop(layer_id).deleted = True
+
+
+@pytest.fixture
+def project(monkeypatch):
+    project = _Project()
+    qgis = types.ModuleType("qgis")
+    core = types.ModuleType("qgis.core")
+    core.QgsProject = types.SimpleNamespace(instance=lambda: project)
+    qgis.core = core
+    monkeypatch.setitem(sys.modules, "qgis", qgis)
+    monkeypatch.setitem(sys.modules, "qgis.core", core)
+    monkeypatch.setattr(layer_cache_module, "_sip", lambda: types.SimpleNamespace(isdeleted=lambda l: l.deleted))
+    QgsVectorLayer.opened = 0
+    return project
+
+
+def _files(tmp_path, count, size=1024):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"layer_{i}.shp"
+        path.write_bytes(b"x" * size)
+        paths.append(str(path))
+    return paths
+
+
+def _run(cache, *paths):
+    """One script: open each path, return the layers it got."""
+    cache.begin_task()
+    return [cache.open(QgsVectorLayer, (path, "layer", "ogr"), {}) for path in paths]
+
+
+def test_untouched_layer_is_reused_read_only(tmp_path, project):
+    cache = LayerCache(budget_mb=1, min_mb=0)
+    path, = _files(tmp_path, 1)
+    first, = _run(cache, path)
+    assert not first.isReadOnly()
+    cache.end_task()
+    second, = _run(cache, path)
+    assert second is first and second.isReadOnly()
+    assert project.mapLayer(first.id()) is first
+    # Opening the same path twice in one script builds a separate layer
+    assert cache.open(QgsVectorLayer, (path, "again", "ogr"), {}) is not first
+    cache.end_task()
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert project.layers == {}
+
+
+@pytest.mark.parametrize("change", [
+    lambda layer: layer.rendererChanged.emit(),
+    lambda layer: layer.styleChanged.emit(),
+    lambda layer: layer.dataProvider().dataChanged.emit(),
+    lambda layer: setattr(layer, "subset", "id > 3"),
+    lambda layer: layer.setReadOnly(False),
+])
+def test_changed_layer_is_evicted(tmp_path, project, change):
+    cache = LayerCache(budget_mb=1, min_mb=0)
+    path, = _files(tmp_path, 1)
+    first, = _run(cache, path)
+    cache.end_task()
+    _run(cache, path)
+    change(first)
+    cache.end_task()
+    second, = _run(cache, path)
+    assert second is not first
+    assert QgsVectorLayer.opened == 2
+
+
+def test_edited_layer_is_rolled_back_and_evicted(tmp_path, project):
+    cache = LayerCache(budget_mb=1, min_mb=0)
+    path, = _files(tmp_path, 1)
+    first, = _run(cache, path)
+    first.editable = True
+    cache.end_task()
+    assert not first.editable
+    assert _run(cache, path)[0] is not first
+
+
+def test_file_change_evicts_before_the_next_script(tmp_path, project):
+    cache = LayerCache(budget_mb=1, min_mb=0)
+    path, = _files(tmp_path, 1)
+    first, = _run(cache, path)
+    cache.end_task()
+    with open(path, "ab") as f:
+        f.write(b"more")
+    assert _run(cache, path)[0] is not first
+
+
+def test_budget_and_layer_limit_drop_least_recently_used(tmp_path, project):
+    paths = _files(tmp_path, 4)
+    # Room for two 1 KiB files
+    cache = LayerCache(budget_mb=2.5 / 1024, min_mb=0)
+    layers = _run(cache, *paths[:3])
+    cache.end_task()
+    assert len(cache._entries) == 2
+    assert _run(cache, paths[0])[0] is not layers[0]
+    cache.end_task()
+
+    cache = LayerCache(budget_mb=1, min_mb=0, max_layers=3)
+    _run(cache, *paths)
+    cache.end_task()
+    assert [key[1] for key in cache._entries] == paths[1:]
+
+
+def test_small_files_are_not_kept(tmp_path, project):
+    cache = LayerCache(budget_mb=1, min_mb=1)
+    path, = _files(tmp_path, 1)
+    first, = _run(cache, path)
+    cache.end_task()
+    assert _run(cache, path)[0] is not first
+    assert cache.hits == 0
@@ -0,0 +1,69 @@
+import time
+import pytest
+from langchain_core.messages import AIMessage
+from tools import llm_cache
+from tools.llm_cache import LLMResponseCache, cached_invoke, invalidate
+
+
+class _Model:
+    def __init__(self, temperature=0.0, model_name="stub"):
+        self.temperature = temperature
+        self.model_name = model_name
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls} to {prompt}")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite"))
+    monkeypatch.setattr(llm_cache, "llm_cache", cache)
+    monkeypatch.setitem(llm_cache.LLM_CACHE_TOOLS, "file_search", True)
+    return cache
+
+
+def test_identical_request_is_answered_from_the_cache(cache):
+    model = _Model()
+    first = cached_invoke(model, "buffer roads", tool="file_search")
+    assert cached_invoke(model, "buffer roads", tool="file_search") == first
+    assert model.calls == 1
+    assert cache.stats["file_search"] == {"hits": 1, "misses": 1}
+
+    # Another prompt, sampling setting or model is a different request
+    cached_invoke(model, "clip rivers", tool="file_search")
+    cached_invoke(_Model(temperature=0.7), "buffer roads", tool="file_search")
+    cached_invoke(_Model(model_name="other"), "buffer roads", tool="file_search")
+    assert cache.stats["file_search"] == {"hits": 1, "misses": 4}
+
+
+def test_invalidated_and_expired_responses_are_fetched_again(cache):
+    model = _Model()
+    cached_invoke(model, "buffer roads", tool="file_search")
+    invalidate(model, "buffer roads")
+    assert cached_invoke(model, "buffer roads", tool="file_search") == "answer 2 to buffer roads"
+
+    cache.ttl = 0.05
+    time.sleep(0.1)
+    assert cached_invoke(model, "buffer roads", tool="file_search") == "answer 3 to buffer roads"
+    assert model.calls == 3
+
+
+def test_disabled_tool_bypasses_the_cache(cache, monkeypatch):
+    monkeypatch.setitem(llm_cache.LLM_CACHE_TOOLS, "file_search", False)
+    model = _Model()
+    cached_invoke(model, "buffer roads", tool="file_search")
+    cached_invoke(model, "buffer roads", tool="file_search")
+    assert model.calls == 2
+    assert cache.stats == {}
+
+
+def test_least_recently_used_responses_are_evicted(cache):
+    cache.max_entries = 10
+    for i in range(100):
+        cache.put(f"key{i}", "file_search", f"response {i}")
+    count = cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    assert count == 10
+    assert cache.get("key99", "file_search") == "response 99"
+    assert cache.get("key1", "file_search") is None
@@ -0,0 +1,51 @@
+import httpx
+import pytest
+from config import llm_client
+from config.llm_client import ConcurrencyLimitedTransport, get_chat_model
+
+
+def _ok(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, content=b"{}")
+
+
+@pytest.fixture
+def models(monkeypatch):
+    monkeypatch.setattr(llm_client, "_models", {})
+    monkeypatch.setattr(llm_client, "_http_client", None)
+    return llm_client._models
+
+
+def test_models_are_shared_per_setting_and_share_one_client(models):
+    settings = dict(base_url="http://node-a:8000/v1", api_key="EMPTY", model_name="stub")
+    model = get_chat_model(**settings, temperature=0.2)
+    assert get_chat_model(**settings, temperature=0.2) is model
+    other = get_chat_model(**settings, temperature=0.8)
+    assert other is not model
+    assert get_chat_model(**settings, temperature=0.2, streaming=False) is not model
+    assert len(models) == 3
+    assert model.http_client is other.http_client is llm_client.get_http_client()
+
+
+def test_slot_is_held_until_the_body_is_closed():
+    limited = ConcurrencyLimitedTransport(httpx.MockTransport(_ok), max_concurrency=1, queue_timeout=0.1)
+    with httpx.Client(transport=limited) as client:
+        request = client.build_request("POST", "http://node-a:8000/v1/chat/completions")
+        response = client.send(request, stream=True)
+        # The only slot of node-a is taken; node-b has its own
+        with pytest.raises(httpx.PoolTimeout):
+            client.post("http://node-a:8000/v1/chat/completions")
+        assert client.post("http://node-b:8000/v1/chat/completions").status_code == 200
+        response.close()
+        assert client.post("http://node-a:8000/v1/chat/completions").status_code == 200
+
+
+def test_slot_is_released_when_the_request_fails():
+    def fail(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    limited = ConcurrencyLimitedTransport(httpx.MockTransport(fail), max_concurrency=1, queue_timeout=0.1)
+    with httpx.Client(transport=limited) as client:
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                client.post("http://node-a:8000/v1/chat/completions")
+    assert limited._slot(httpx.URL("http://node-a:8000")).acquire(blocking=False)
@@ -0,0 +1,96 @@
+import threading
+import time
+import httpx
+from config.llm_hedging import Attempt, LatencyTracker, hedged_call
+from config.llm_client import ConcurrencyLimitedTransport
+from config.llm_router import LeastOutstandingRouter, RoutingTransport
+
+
+class _StaticResolver:
+    def __init__(self, nodes):
+        self._nodes = nodes
+
+    def endpoints(self, timeout=None):
+        return list(self._nodes)
+
+    def is_healthy(self, node):
+        return True
+
+    def report_failure(self, node=None):
+        pass
+
+
+def _tracker(delay):
+    tracker = LatencyTracker(min_samples=1, min_delay=delay)
+    tracker.record(("/v1/chat/completions", False), 0.0)
+    return tracker
+
+
+def test_deadline_counts_from_start():
+    tracker = LatencyTracker()
+    launched = []
+
+    def run(attempt: Attempt) -> int:
+        launched.append(attempt.index)
+        # Queued well past the deadline before being sent
+        time.sleep(0.2)
+        attempt.start()
+        time.sleep(0.02)
+        return attempt.index
+
+    assert hedged_call(run, 0.05, tracker=tracker) == 0
+    assert launched == [0]
+    assert tracker.hedged == 0
+
+
+def test_slow_attempt_is_hedged():
+    tracker = LatencyTracker()
+
+    def run(attempt: Attempt) -> int:
+        stop = threading.Event()
+        attempt.on_cancel(stop.set)
+        attempt.start()
+        stop.wait(0.5 if attempt.index == 0 else 0.01)
+        return attempt.index
+
+    assert hedged_call(run, 0.05, tracker=tracker) == 1
+    assert (tracker.hedged, tracker.hedge_wins) == (1, 1)
+
+
+def _slow_node(request: httpx.Request) -> httpx.Response:
+    time.sleep(0.2)
+    return httpx.Response(200, content=b'{"ok": true}')
+
+
+def test_single_node_is_not_hedged():
+    tracker = _tracker(0.01)
+    router = LeastOutstandingRouter(_StaticResolver(["http://node-a:8000"]))
+    transport = RoutingTransport(httpx.MockTransport(_slow_node), router, hedging=tracker)
+    with httpx.Client(transport=transport) as client:
+        response = client.post("http://node-a:8000/v1/chat/completions", json={})
+    assert response.status_code == 200
+    assert tracker.hedged == 0
+
+
+def test_queueing_for_a_slot_does_not_hedge():
+    tracker = _tracker(0.05)
+    router = LeastOutstandingRouter(_StaticResolver(["http://node-a:8000", "http://node-b:8000"]))
+    hits = []
+
+    def node(request: httpx.Request) -> httpx.Response:
+        hits.append(request.url.host)
+        return httpx.Response(200, content=b"{}")
+
+    limited = ConcurrencyLimitedTransport(httpx.MockTransport(node), max_concurrency=1, queue_timeout=5)
+    transport = RoutingTransport(limited, router, hedging=tracker)
+    # Hold the only slot of both nodes for longer than the deadline
+    slots = [limited._slot(httpx.URL(n)) for n in ("http://node-a:8000", "http://node-b:8000")]
+    for slot in slots:
+        slot.acquire()
+    threading.Timer(0.3, lambda: [slot.release() for slot in slots]).start()
+
+    with httpx.Client(transport=transport) as client:
+        response = client.post("http://node-a:8000/v1/chat/completions", json={})
+    assert response.status_code == 200
+    assert tracker.hedged == 0
+    assert len(hits) == 1
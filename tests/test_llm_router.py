@@ -0,0 +1,136 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from config.model_config import EndpointResolver, normalize_endpoint
+from config.llm_router import LeastOutstandingRouter, RoutingTransport, origin
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """OpenAI-compatible node: answers /v1/models, and /v1/chat/completions with the server's `status`."""
+
+    def do_GET(self):
+        self._reply(200, {"data": [{"id": "stub"}]})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.hits += 1
+        self._reply(self.server.status, {"node": self.server.server_port})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def nodes():
+    servers = []
+    for _ in range(3):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+        server.status = 200
+        server.hits = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _endpoint(server):
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def _client(router):
+    return httpx.Client(transport=RoutingTransport(httpx.HTTPTransport(), router, max_attempts=3))
+
+
+def test_least_outstanding_selection(nodes):
+    endpoints = [_endpoint(s) for s in nodes]
+    router = LeastOutstandingRouter(EndpointResolver("", static=endpoints))
+
+    # Each reservation goes to an idle node until all of them are busy
+    first = [router.acquire() for _ in endpoints]
+    assert sorted(first) == sorted(endpoints)
+    router.release(first[1])
+    assert router.acquire() == first[1]
+    assert router.acquire(exclude={first[0]}) != first[0]
+
+
+def test_requests_spread_and_stats(nodes):
+    endpoints = [_endpoint(s) for s in nodes]
+    router = LeastOutstandingRouter(EndpointResolver("", static=endpoints))
+    with _client(router) as client:
+        for _ in range(6):
+            # Built for the first node; the router may send it to any
+            response = client.post(f"{endpoints[0]}/v1/chat/completions", json={"messages": []})
+            assert response.status_code == 200
+
+    assert sum(s.hits for s in nodes) == 6
+    assert all(s.hits >= 1 for s in nodes)
+    stats = router.stats()
+    assert set(stats) == set(endpoints)
+    for node in endpoints:
+        assert stats[node]["in_flight"] == 0
+        assert stats[node]["failures"] == 0
+        assert stats[node]["duration_s"] is not None
+    assert sum(stats[n]["requests"] for n in endpoints) == 6
+
+
+def test_ejection_after_failure(nodes):
+    endpoints = [_endpoint(s) for s in nodes]
+    nodes[0].status = 503
+    router = LeastOutstandingRouter(EndpointResolver("", static=endpoints), eject_seconds=60)
+    with _client(router) as client:
+        for _ in range(6):
+            response = client.post(f"{endpoints[0]}/v1/chat/completions", json={"messages": []})
+            assert response.status_code == 200
+            assert response.json()["node"] != nodes[0].server_port
+
+    # Tried once, then skipped while ejected
+    assert nodes[0].hits == 1
+    stats = router.stats()
+    assert stats[endpoints[0]]["failures"] == 1
+    assert stats[endpoints[0]]["ejections"] == 1
+    assert stats[endpoints[0]]["ejected"] is True
+    assert not stats[endpoints[1]]["ejected"] and not stats[endpoints[2]]["ejected"]
+
+
+def test_connection_refused_is_ejected(nodes):
+    endpoints = [_endpoint(s) for s in nodes]
+    nodes[2].shutdown()
+    nodes[2].server_close()
+    router = LeastOutstandingRouter(EndpointResolver("", static=endpoints), eject_seconds=60)
+    with _client(router) as client:
+        for _ in range(4):
+            assert client.post(f"{endpoints[0]}/v1/chat/completions", json={}).status_code == 200
+    # Either a request hit the closed port and ejected it, or the health check got there first
+    ejections = router.stats().get(endpoints[2], {}).get("ejections", 0)
+    assert ejections == 1 or not router.resolver.is_healthy(endpoints[2])
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("10.0.0.5", "http://10.0.0.5:8000"),
+    ("10.0.0.5:8001", "http://10.0.0.5:8001"),
+    ("::1", "http://[::1]:8000"),
+    ("fe80::1", "http://[fe80::1]:8000"),
+    ("[2001:db8::2]", "http://[2001:db8::2]:8000"),
+    ("[2001:db8::2]:8001", "http://[2001:db8::2]:8001"),
+    ("gpu-node", "http://gpu-node:8000"),
+    ("https://gpu-node:443/", "https://gpu-node:443"),
+])
+def test_normalize_endpoint(value, expected):
+    assert normalize_endpoint(value) == expected
+
+
+def test_ipv6_origin_round_trips():
+    endpoint = normalize_endpoint("::1")
+    assert origin(f"{endpoint}/v1/chat/completions") == endpoint
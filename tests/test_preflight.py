@@ -0,0 +1,57 @@
+from tools.geo_catalog import CatalogSnapshot
+from tools.preflight import check_script
+
+RESULT_DIR = "/data/result"
+INPUT = "/data/geo/roads.shp"
+
+
+def _catalog():
+    return CatalogSnapshot([
+        {"path": INPUT, "type": "vector", "fields": ["NAME", "LENGTH"], "features": 10, "description": ""},
+        {"path": "/data/geo/rivers.shp", "type": "vector", "fields": ["NAME"], "features": 5, "description": ""},
+    ])
+
+
+def _kinds(issues):
+    return [issue.kind for issue in issues]
+
+
+def test_relative_output_name_joined_onto_result_dir_is_accepted():
+    code = (
+        "import os\n"
+        f"output_dir = '{RESULT_DIR}'\n"
+        "out_name = 'roads_buffer.shp'\n"
+        "output_path = os.path.join(output_dir, out_name)\n"
+    )
+    assert check_script(code, [INPUT], RESULT_DIR) == []
+
+
+def test_absolute_output_outside_result_dir_is_rejected():
+    code = "output_path = '/tmp/roads_buffer.shp'\n"
+    assert _kinds(check_script(code, [INPUT], RESULT_DIR)) == ["output_outside_result_dir"]
+
+
+def test_unknown_absolute_input_is_rejected():
+    code = "layer = QgsVectorLayer('/data/geo/missing.shp', 'm', 'ogr')\n"
+    assert _kinds(check_script(code, [INPUT], RESULT_DIR)) == ["unknown_input"]
+
+
+def test_catalog_path_is_accepted_as_input():
+    code = "layer = QgsVectorLayer('/data/geo/rivers.shp', 'r', 'ogr')\n"
+    assert check_script(code, [INPUT], RESULT_DIR, catalog=_catalog()) == []
+
+
+def test_unknown_field_is_reported_and_created_field_is_not():
+    code = (
+        f"layer = QgsVectorLayer('{INPUT}', 'roads', 'ogr')\n"
+        "layer.dataProvider().addAttributes([QgsField('WIDTH', QVariant.Double)])\n"
+        "for feature in layer.getFeatures():\n"
+        "    print(feature['NAME'], feature['WIDTH'], feature['SPEED'])\n"
+    )
+    issues = check_script(code, [INPUT], RESULT_DIR, catalog=_catalog())
+    assert _kinds(issues) == ["unknown_field"]
+    assert "SPEED" in issues[0].message
+
+
+def test_syntax_error_is_reported():
+    assert _kinds(check_script("x = (", [INPUT], RESULT_DIR)) == ["syntax"]
@@ -0,0 +1,86 @@
+import os
+import sys
+import textwrap
+import pytest
+from tools import qgis_workers
+from tools.qgis_workers import QgisWorkerPool, run_script
+
+# Just enough of qgis.core for a worker to start and reset between scripts
+FAKE_QGIS_CORE = textwrap.dedent('''
+    class QgsApplication:
+        def __init__(self, *args):
+            pass
+
+        def initQgis(self):
+            pass
+
+
+    class QgsProject:
+        @staticmethod
+        def instance():
+            return QgsProject()
+
+        def clear(self):
+            pass
+
+
+    class QgsVectorLayer:
+        pass
+
+
+    class QgsRasterLayer:
+        pass
+''')
+
+
+@pytest.fixture
+def fake_qgis(tmp_path, monkeypatch):
+    package = tmp_path / "site" / "qgis"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (package / "core.py").write_text(FAKE_QGIS_CORE)
+    # Workers inherit the environment
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path / "site"))
+
+
+def _script(tmp_path, name, body):
+    path = tmp_path / name
+    path.write_text(body)
+    return str(path)
+
+
+def test_workers_are_reused_and_recycled(tmp_path, fake_qgis):
+    pid_script = _script(tmp_path, "pid.py", "import os\nprint(os.getpid())\n")
+    pool = QgisWorkerPool(size=1, max_tasks=2, init_timeout=60, python=sys.executable)
+    try:
+        pids = []
+        for _ in range(3):
+            result = pool.run(pid_script, timeout=30, cwd=str(tmp_path))
+            assert result.returncode == 0, result.stderr
+            pids.append(int(result.stdout))
+        # Retired after max_tasks scripts and replaced by a fresh worker
+        assert pids[0] == pids[1] != pids[2]
+        assert pids[0] != os.getpid()
+
+        # A worker whose script ran out of memory is not reused
+        result = pool.run(_script(tmp_path, "oom.py", "raise MemoryError\n"), timeout=30, cwd=str(tmp_path))
+        assert result.returncode == 1 and "MemoryError" in result.stderr
+        assert int(pool.run(pid_script, timeout=30, cwd=str(tmp_path)).stdout) not in pids
+        assert pool.available
+    finally:
+        pool.shutdown()
+
+
+def test_pool_without_qgis_falls_back_to_a_subprocess(tmp_path, monkeypatch):
+    monkeypatch.delenv("PYTHONPATH", raising=False)
+    script = _script(tmp_path, "hello.py", "print('hello')\n")
+    pool = QgisWorkerPool(size=1, init_timeout=60, python=sys.executable)
+    assert pool.run(script, timeout=30, cwd=str(tmp_path)) is None
+    assert not pool.available
+    assert "qgis" in pool.disabled_reason
+
+    monkeypatch.setattr(qgis_workers, "qgis_pool", pool)
+    monkeypatch.setattr(qgis_workers, "QGIS_PYTHON", sys.executable)
+    result = run_script(script, timeout=30, cwd=str(tmp_path))
+    assert result.returncode == 0
+    assert result.stdout.strip() == "hello"
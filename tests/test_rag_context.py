@@ -0,0 +1,77 @@
+import json
+import os
+import faiss
+import numpy as np
+import pytest
+from tools import rag_context
+
+
+def _write(tmp_path, texts):
+    with open(tmp_path / "meta.json", "w", encoding="utf-8") as f:
+        json.dump([{"file": "doc.md", "title": f"T{i}", "text": t} for i, t in enumerate(texts)], f)
+    index = faiss.IndexFlatIP(4)
+    index.add(np.eye(4, dtype="float32")[: len(texts)])
+    faiss.write_index(index, str(tmp_path / "rag.index"))
+    # Rebuilds within one mtime tick still differ in size
+    os.utime(tmp_path / "rag.index", ns=(len(texts), len(texts)))
+    os.utime(tmp_path / "meta.json", ns=(len(texts), len(texts)))
+
+
+@pytest.fixture
+def rag_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_context, "FAISS_INDEX_PATH", str(tmp_path / "rag.index"))
+    monkeypatch.setattr(rag_context, "METADATA_PATH", str(tmp_path / "meta.json"))
+    monkeypatch.setattr(rag_context, "CHUNK_DB_PATH", str(tmp_path / "chunks.sqlite"))
+    monkeypatch.setattr(rag_context, "_index", None)
+    monkeypatch.setattr(rag_context, "_chunk_store", None)
+    monkeypatch.setattr(rag_context, "_chunk_store_stamp", None)
+    return tmp_path
+
+
+def test_chunk_store_follows_index_rebuild(rag_files):
+    _write(rag_files, ["buffer roads", "clip rivers"])
+    store = rag_context.get_chunk_store()
+    assert store.count() == 2
+    assert rag_context.get_chunk_store() is store
+
+    _write(rag_files, ["dissolve counties", "reproject layer", "zonal statistics"])
+    store = rag_context.get_chunk_store()
+    assert store.count() == 3
+    assert store.get_many([0])[0]["content"] == "dissolve counties"
+    assert [i for i, _ in store.search_bm25("zonal", 5)] == [2]
+
+
+def test_rebuilt_chunk_store_invalidates_cached_rankings(rag_files):
+    _write(rag_files, ["buffer roads", "clip rivers"])
+    first = rag_context.query_context.invoke({"question": "clip", "mode": "bm25", "top_k": 2})
+    assert [c.content for c in first.context] == ["clip rivers"]
+
+    # Only the metadata and chunk store change; the FAISS index file stays the same
+    index_stat = os.stat(rag_files / "rag.index")
+    with open(rag_files / "meta.json", "w", encoding="utf-8") as f:
+        json.dump([{"file": "doc.md", "title": "T0", "text": "clip polygons"}, {"file": "doc.md", "title": "T1", "text": "buffer"}], f)
+    os.utime(rag_files / "meta.json", ns=(10, 10))
+    from tools.chunk_store import build_chunk_store
+    build_chunk_store(str(rag_files / "meta.json"), str(rag_files / "chunks.sqlite"))
+    assert os.stat(rag_files / "rag.index").st_mtime_ns == index_stat.st_mtime_ns
+    rag_context._chunk_store = None
+
+    second = rag_context.query_context.invoke({"question": "clip", "mode": "bm25", "top_k": 2})
+    assert [c.content for c in second.context] == ["clip polygons"]
+
+
+def test_provenance_credits_each_query_with_its_own_top_k(rag_files, monkeypatch):
+    _write(rag_files, ["buffer roads", "clip rivers", "buffer distance", "clip extent"])
+    embeddings = {
+        "buffer": [1.0, 0.0, 0.5, 0.0],
+        "clip": [0.0, 1.0, 0.0, 0.5],
+    }
+    monkeypatch.setattr(rag_context, "encode",
+                        lambda texts: np.array([embeddings[t] for t in texts], dtype=np.float32))
+
+    result = rag_context.query_context.invoke({"question": ["buffer", "clip"], "mode": "dense", "top_k": 2})
+    assert result.queries == ["buffer", "clip"]
+    assert sorted(c.content for c in result.context) == ["buffer roads", "clip rivers"]
+    by_content = dict(zip((c.content for c in result.context), result.provenance))
+    # Each query's candidate list (top_k * HYBRID_CANDIDATE_FACTOR deep) holds all four chunks
+    assert by_content == {"buffer roads": [0], "clip rivers": [1]}
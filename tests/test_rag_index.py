@@ -0,0 +1,52 @@
+import json
+import faiss
+import numpy as np
+from tools.rag_index import (
+    benchmark, build_index, format_report, load_index, load_questions, recommend, split_holdout,
+)
+
+
+def test_holdout_vectors_are_not_indexed():
+    vectors = np.random.default_rng(0).normal(size=(300, 16)).astype("float32")
+    kept, held = split_holdout(vectors, 20)
+    assert kept.shape == (280, 16) and held.shape == (20, 16)
+    kept_rows = {row.tobytes() for row in kept}
+    assert not any(row.tobytes() in kept_rows for row in held)
+
+
+def test_sweep_rows_and_recommendation():
+    vectors = np.random.default_rng(1).normal(size=(2000, 16)).astype("float32")
+    kept, held = split_holdout(vectors, 50)
+    rows = benchmark(build_index(kept, "flat"), {"ivf": build_index(kept, "ivf", nlist=16)}, held,
+                     k=5, nprobe_values=[1, 16])
+    by_setting = {row["setting"]: row for row in rows if row["index"] == "ivf"}
+    # Probing every list is exact
+    assert by_setting["nprobe=16"]["recall"] == 1.0
+    assert recommend(rows, target_recall=0.99)["ivf"]["setting"] == "nprobe=16"
+    assert "baseline" not in recommend(rows, target_recall=0.0)
+
+
+def test_load_questions(tmp_path):
+    (tmp_path / "q.txt").write_text("How do I buffer roads?\n\nClip rivers to a county\n", encoding="utf-8")
+    (tmp_path / "q.jsonl").write_text("\n".join(json.dumps(r) for r in [
+        {"id": 1, "task": "Dissolve counties by state"},
+        {"request_id": "x", "title": "t", "body": "Reproject to EPSG:3857"},
+    ]), encoding="utf-8")
+    assert load_questions(str(tmp_path / "q.txt")) == ["How do I buffer roads?", "Clip rivers to a county"]
+    assert load_questions(str(tmp_path / "q.jsonl")) == ["Dissolve counties by state", "Reproject to EPSG:3857"]
+
+
+def test_mmap_maps_ivf_and_warns_for_other_indexes(tmp_path, capsys):
+    vectors = np.random.default_rng(2).normal(size=(1000, 16)).astype("float32")
+    for kind in ("ivf", "hnsw"):
+        faiss.write_index(build_index(vectors, kind, nlist=8), str(tmp_path / f"{kind}.index"))
+    ivf = load_index(str(tmp_path / "ivf.index"), mmap=True)
+    assert "not an IVF index" not in capsys.readouterr().err
+    assert ivf.ntotal == 1000
+    hnsw = load_index(str(tmp_path / "hnsw.index"), mmap=True)
+    assert "not an IVF index" in capsys.readouterr().err
+    assert hnsw.ntotal == 1000
+
+    rows = benchmark(build_index(vectors, "flat"), {"hnsw": hnsw}, vectors[:10], k=5, loaded_bytes={"hnsw": 2**20})
+    assert all(row["resident_mb"] >= 1.0 for row in rows if row["index"] == "hnsw")
+    assert "resident MB" in format_report(rows, 5)
@@ -0,0 +1,109 @@
+import time
+import pytest
+from tools import code_runner
+from tools.code_runner import CodeRunnerOutput
+from tools.script_cache import ScriptCache, artifact_unchanged, task_key
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    roads = tmp_path / "roads.geojson"
+    roads.write_text('{"type": "FeatureCollection", "features": []}')
+    return [str(roads)]
+
+
+def test_key_ignores_spacing_and_case_but_not_inputs(inputs):
+    key = task_key("Buffer the roads by 100 m.", inputs, "docs")
+    assert task_key("  buffer the ROADS   by 100 m ", inputs, "docs") == key
+    assert task_key("Buffer the roads by 200 m", inputs, "docs") != key
+    assert task_key("Buffer the roads by 100 m", inputs, "other docs") != key
+    with open(inputs[0], "a") as f:
+        f.write(" ")
+    assert task_key("Buffer the roads by 100 m", inputs, "docs") != key
+
+
+def test_get_put_invalidate_and_expiry(tmp_path):
+    cache = ScriptCache(str(tmp_path / "scripts.sqlite"))
+    output = tmp_path / "out.txt"
+    output.write_text("result")
+    assert cache.get("k") is None
+    cache.put("k", "question", "print(1)", str(output), "", "done")
+    entry = cache.get("k")
+    assert entry["code"] == "print(1)" and entry["stdout"] == "done"
+    assert artifact_unchanged(entry)
+
+    output.write_text("changed result")
+    assert not artifact_unchanged(entry)
+    output.unlink()
+    assert not artifact_unchanged(entry)
+
+    cache.invalidate("k")
+    assert cache.get("k") is None
+    cache.put("k", "question", "print(1)", "", "", "")
+    assert not artifact_unchanged(cache.get("k"))
+    cache.ttl = 0.05
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    """code_generate with a fresh store, and generation / execution that only record their calls."""
+    cache = ScriptCache(str(tmp_path / "scripts.sqlite"))
+    output_file = tmp_path / "result.txt"
+    calls = {"generated": 0, "executed": 0, "fail": False}
+
+    def execute(code, filepaths, **kwargs):
+        calls["executed"] += 1
+        if calls["fail"]:
+            return CodeRunnerOutput(code=code, output_file="", tool_used_file="", success=False, stderr="Traceback")
+        output_file.write_text(f"run {calls['executed']}")
+        return CodeRunnerOutput(code=code, output_file=str(output_file), tool_used_file="", success=True)
+
+    def generate(question, context, filepaths, debug_advice):
+        calls["generated"] += 1
+        calls["fail"] = False
+        return execute("print('generated')", filepaths)
+
+    monkeypatch.setattr(code_runner, "script_cache", cache)
+    monkeypatch.setattr(code_runner, "SCRIPT_CACHE_ENABLED", True)
+    monkeypatch.setattr(code_runner, "execute_code", execute)
+    monkeypatch.setattr(code_runner, "_generate", generate)
+    return cache, output_file, calls
+
+
+def _ask(inputs, debug_advice=None):
+    return code_runner.code_generate.func("Buffer the roads", "docs", inputs, debug_advice)
+
+
+def test_repeated_task_reuses_the_artifact_then_reruns_the_script(inputs, runner):
+    cache, output_file, calls = runner
+    assert _ask(inputs).from_cache is None
+    assert cache.stats["misses"] == 1
+
+    # Output untouched: returned without running anything
+    assert _ask(inputs).from_cache == "artifact"
+    assert (calls["generated"], calls["executed"]) == (1, 1)
+
+    # Output changed: the stored script runs again without the LLM
+    output_file.write_text("edited")
+    assert _ask(inputs).from_cache == "rerun"
+    assert (calls["generated"], calls["executed"]) == (1, 2)
+    assert cache.stats == {"artifact_hits": 1, "rerun_hits": 1, "misses": 1}
+
+    # Debug advice means the stored result was rejected
+    assert _ask(inputs, debug_advice="use a 200 m buffer").from_cache is None
+    assert calls["generated"] == 2
+
+
+def test_script_that_stops_working_is_dropped(inputs, runner):
+    cache, output_file, calls = runner
+    _ask(inputs)
+    key = task_key("Buffer the roads", inputs, "docs")
+    output_file.unlink()
+    calls["fail"] = True
+    # The rerun fails, so the entry is invalidated and new code is generated and stored
+    assert _ask(inputs).success
+    assert calls["generated"] == 2
+    assert cache.stats["misses"] == 2
+    assert cache.get(key)["code"] == "print('generated')"
@@ -0,0 +1,42 @@
+import time
+import numpy as np
+from tools.semantic_cache import SemanticCache
+
+
+def test_exact_and_similar_queries_hit():
+    cache = SemanticCache(threshold=0.95)
+    cache.put("k=8", "buffer roads", np.array([1.0, 0.0, 0.0]), "roads docs")
+    assert cache.get_exact("k=8", "buffer roads") == "roads docs"
+    # Same direction, other length: cosine 1
+    assert cache.get_similar("k=8", np.array([2.0, 0.1, 0.0])) == "roads docs"
+    assert cache.get_similar("k=8", np.array([0.0, 1.0, 0.0])) is None
+    # Other retrieval parameters never share results
+    assert cache.get_exact("k=4", "buffer roads") is None
+    assert cache.get_similar("k=4", np.array([1.0, 0.0, 0.0])) is None
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_version_change_clears_everything():
+    cache = SemanticCache()
+    cache.check_version(("index-1", "chunks-1"))
+    cache.put("k=8", "buffer roads", np.ones(3), "old docs")
+    cache.check_version(("index-1", "chunks-1"))
+    assert cache.get_exact("k=8", "buffer roads") == "old docs"
+    cache.check_version(("index-1", "chunks-2"))
+    assert cache.get_exact("k=8", "buffer roads") is None
+    assert cache.get_similar("k=8", np.ones(3)) is None
+
+
+def test_expired_and_least_recently_used_entries_are_dropped():
+    cache = SemanticCache(max_entries=2, ttl=0.05)
+    cache.put("k=8", "a", np.array([1.0, 0.0]), "A")
+    cache.put("k=8", "b", np.array([0.0, 1.0]), "B")
+    assert cache.get_exact("k=8", "a") == "A"
+    cache.put("k=8", "c", None, "C")
+    assert cache.get_exact("k=8", "b") is None
+    # Stored without a vector: only found by its text
+    assert cache.get_exact("k=8", "c") == "C"
+    assert cache.get_similar("k=8", np.array([0.0, 1.0])) is None
+    time.sleep(0.1)
+    assert cache.get_exact("k=8", "a") is None
+    assert cache.get_similar("k=8", np.array([1.0, 0.0])) is None
@@ -0,0 +1,55 @@
+import threading
+from tools.geo_catalog import CatalogSnapshot
+from tools.spatial_index import SpatialIndex, parse_bbox
+
+
+def test_antimeridian_box_is_split():
+    index = SpatialIndex([
+        {"bbox": [170, -10, -170, 10]},   # Fiji, across 180°
+        {"bbox": [-82.5, 33.8, -80.5, 34.4]},
+        {"bbox": [10, 5, 12, 1]},          # miny > maxy: cannot be ruled out
+        {},
+    ])
+    assert index.unbounded == {2, 3}
+    assert index.intersecting([[175, -5, 179, 5]]) == {0, 2, 3}
+    assert index.intersecting([[-179, -5, -175, 5]]) == {0, 2, 3}
+    assert index.intersecting([[0, -5, 20, 5]]) == {2, 3}
+    assert index.intersecting([[-82, 34, -81, 35]]) == {1, 2, 3}
+
+
+def test_antimeridian_region():
+    index = SpatialIndex([{"bbox": [178, 0, 179, 1]}, {"bbox": [-179, 0, -178, 1]}, {"bbox": [0, 0, 1, 1]}])
+    assert index.intersecting([[175, -5, -175, 5]]) == {0, 1}
+
+
+def test_parse_bbox_orders_latitudes_only():
+    assert parse_bbox("clip to bbox: -82.5, 34.4, -80.5, 33.8") == [-82.5, 33.8, -80.5, 34.4]
+    # minx > maxx crosses the antimeridian and must not be swapped into a near-global box
+    assert parse_bbox("clip to bbox: 170, -20, -170, -10") == [170.0, -20.0, -170.0, -10.0]
+
+
+def test_parsed_bbox_across_antimeridian_finds_datasets():
+    index = SpatialIndex([{"bbox": [175, -20, 179, -10]}, {"bbox": [-179, -18, -171, -12]}, {"bbox": [0, -20, 10, -10]}])
+    region = parse_bbox("clip to bbox: 170, -20, -170, -10")
+    assert index.intersecting([region]) == {0, 1}
+
+
+def test_snapshot_builds_one_index_under_concurrency():
+    snapshot = CatalogSnapshot([
+        {"path": f"/data/{i}.shp", "type": "vector", "fields": [], "features": 1, "description": "",
+         "bbox": [i, 0, i + 1, 1]}
+        for i in range(200)
+    ])
+    barrier = threading.Barrier(8)
+    seen = []
+
+    def use():
+        barrier.wait()
+        seen.append(snapshot.spatial_index)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(index) for index in seen}) == 1
@@ -0,0 +1,386 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple
+
+# === Configuration ===
+VECTOR_EXTENSIONS = {".shp", ".geojson", ".gpkg", ".fgb", ".kml", ".gml"}
+RASTER_EXTENSIONS = {".tif", ".tiff", ".img", ".vrt", ".asc", ".jp2"}
+# Files next to a shapefile that change its schema or contents
+SHAPEFILE_SIDECARS = (".dbf", ".shx", ".prj", ".cpg")
+# Bytes read from the head and tail of each file for the content hash
+HASH_BLOCK_SIZE = 1 << 20
+# Bumped whenever extraction adds or changes entry keys, forcing a re-read of older entries
+CATALOG_SCHEMA = 3
+
+
+# === Fingerprints ===
+def _member_files(path: str) -> List[str]:
+    files = [path]
+    stem, ext = os.path.splitext(path)
+    if ext.lower() == ".shp":
+        for sidecar in SHAPEFILE_SIDECARS:
+            for candidate in (stem + sidecar, stem + sidecar.upper()):
+                if os.path.exists(candidate):
+                    files.append(candidate)
+                    break
+    return files
+
+
+def stat_fingerprint(path: str) -> Dict[str, int]:
+    """Cheap fingerprint (latest mtime and total size over the file and its sidecars)."""
+    stats = [os.stat(p) for p in _member_files(path)]
+    return {
+        "mtime_ns": max(st.st_mtime_ns for st in stats),
+        "size": sum(st.st_size for st in stats),
+    }
+
+
+def content_hash(path: str) -> str:
+    """Hash of the head and tail of the file and its sidecars, plus their sizes."""
+    digest = hashlib.sha1()
+    for member in _member_files(path):
+        size = os.path.getsize(member)
+        digest.update(f"{os.path.basename(member)}:{size}".encode("utf-8"))
+        with open(member, "rb") as f:
+            digest.update(f.read(HASH_BLOCK_SIZE))
+            if size > 2 * HASH_BLOCK_SIZE:
+                f.seek(-HASH_BLOCK_SIZE, os.SEEK_END)
+                digest.update(f.read(HASH_BLOCK_SIZE))
+            elif size > HASH_BLOCK_SIZE:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+# === Metadata extraction (runs in worker processes) ===
+def _crs_label(srs) -> str:
+    if srs is None:
+        return "Unknown"
+    srs.AutoIdentifyEPSG()
+    name = srs.GetAuthorityName(None)
+    code = srs.GetAuthorityCode(None)
+    if name and code:
+        return f"{name}:{code}"
+    return srs.ExportToWkt() or "Unknown"
+
+
+def _bbox_to_wgs84(srs, minx: float, miny: float, maxx: float, maxy: float) -> Optional[List[float]]:
+    """Transform an extent to [min_lon, min_lat, max_lon, max_lat] in EPSG:4326."""
+    from osgeo import osr
+
+    if srs is None:
+        return None
+    try:
+        wgs84 = osr.SpatialReference()
+        wgs84.ImportFromEPSG(4326)
+        wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        source = srs.Clone()
+        source.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        transform = osr.CoordinateTransformation(source, wgs84)
+        bounds = transform.TransformBounds(minx, miny, maxx, maxy, 21)
+    except Exception:
+        return None
+    return [round(float(v), 6) for v in bounds]
+
+
+def _describe_vector(path: str) -> Dict[str, Any]:
+    from osgeo import ogr
+
+    ogr.UseExceptions()
+    ds = ogr.Open(path)
+    layer = ds.GetLayer(0)
+    defn = layer.GetLayerDefn()
+
+    geom_type = ogr.GT_Flatten(layer.GetGeomType())
+    if geom_type == ogr.wkbUnknown:
+        geometry = "Unknown"
+    else:
+        geometry = ogr.GeometryTypeToName(geom_type).replace(" ", "")
+
+    fields = [defn.GetFieldDefn(i).GetName() for i in range(defn.GetFieldCount())]
+    srs = layer.GetSpatialRef()
+    crs = _crs_label(srs)
+
+    bbox = None
+    if layer.GetFeatureCount() > 0:
+        minx, maxx, miny, maxy = layer.GetExtent()
+        bbox = _bbox_to_wgs84(srs, minx, miny, maxx, maxy)
+
+    return {
+        "filename": os.path.basename(path),
+        "path": path,
+        "type": "vector",
+        "geometry": geometry,
+        "fields": fields,
+        "features": layer.GetFeatureCount(),
+        "crs": crs,
+        "bbox": bbox,
+        "description": f"Vector layer （{geometry}），including fields {fields}， CRS: {crs}",
+    }
+
+
+def _describe_raster(path: str) -> Dict[str, Any]:
+    from osgeo import gdal, osr
+
+    gdal.UseExceptions()
+    ds = gdal.Open(path)
+    width, height, bands = ds.RasterXSize, ds.RasterYSize, ds.RasterCount
+
+    wkt = ds.GetProjection()
+    epsg = ""
+    bbox = None
+    if wkt:
+        srs = osr.SpatialReference(wkt=wkt)
+        gt = ds.GetGeoTransform()
+        xs = [gt[0] + gt[1] * px + gt[2] * py for px, py in ((0, 0), (width, 0), (0, height), (width, height))]
+        ys = [gt[3] + gt[4] * px + gt[5] * py for px, py in ((0, 0), (width, 0), (0, height), (width, height))]
+        bbox = _bbox_to_wgs84(srs, min(xs), min(ys), max(xs), max(ys))
+        label = _crs_label(srs)
+        epsg = label if label.startswith("EPSG:") else ""
+
+    return {
+        "filename": os.path.basename(path),
+        "path": path,
+        "type": "raster",
+        "fields": [f"band_{i + 1}" for i in range(bands)],
+        # Rasters have no features; their pixel dimensions go in "size"
+        "features": None,
+        "size": [width, height],
+        "crs": wkt or "Unknown",
+        "bbox": bbox,
+        "description": f" raster image， size {width}x{height}，{bands} bands, CRS: {epsg}",
+    }
+
+
+def describe_file(path: str, previous_hash: Optional[str] = None) -> Tuple[str, Optional[Dict[str, Any]], str]:
+    """
+    Extract catalog metadata for one file.
+
+    Args:
+        path (str): Dataset path
+        previous_hash (Optional[str]): Content hash recorded by the last build
+
+    Returns:
+        Tuple[str, Optional[Dict[str, Any]], str]: (path, entry, content hash).
+        The entry is None when the content hash equals previous_hash, i.e. the
+        file was touched but not modified.
+    """
+    digest = content_hash(path)
+    if previous_hash is not None and digest == previous_hash:
+        return path, None, digest
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in RASTER_EXTENSIONS:
+        entry = _describe_raster(path)
+    else:
+        entry = _describe_vector(path)
+    return path, entry, digest
+
+
+# === Catalog build ===
+def scan_directory(data_dir: str) -> List[str]:
+    """Return all vector and raster datasets below data_dir, sorted by path."""
+    found = []
+    for root, _, files in os.walk(data_dir):
+        for name in files:
+            ext = os.path.splitext(name)[1].lower()
+            if ext in VECTOR_EXTENSIONS or ext in RASTER_EXTENSIONS:
+                found.append(os.path.abspath(os.path.join(root, name)))
+    return sorted(found)
+
+
+def load_catalog(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_catalog(path: str, entries: List[Dict[str, Any]]) -> None:
+    """Write the catalog atomically so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def acceleration_files(entry: Dict[str, Any]) -> List[str]:
+    """
+    Files tools.dataset_accel made for an entry: the .qix next to a shapefile,
+    the external .ovr next to a raster and the converted copy.
+    """
+    accelerated = entry.get("accelerated") or {}
+    files = []
+    if accelerated.get("qix"):
+        files.append(os.path.splitext(entry["path"])[0] + ".qix")
+    if accelerated.get("overviews"):
+        files.append(entry["path"] + ".ovr")
+    if entry.get("accelerated_path"):
+        files.append(entry["accelerated_path"])
+    return files
+
+
+def remove_files(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[catalog_builder] Could not remove {path}: {e}", file=sys.stderr)
+
+
+def _carry_accelerated(entry: Dict[str, Any], old: Optional[Dict[str, Any]], digest: str) -> None:
+    """
+    Keep what tools.dataset_accel recorded for the file as long as its content
+    is the same. Once it changed, the index, overviews and copy describe the
+    old content (GDAL and OGR would still use them), so they are deleted.
+    """
+    accelerated = (old or {}).get("accelerated")
+    if not accelerated:
+        return
+    if accelerated.get("source_sha1") == digest:
+        entry["accelerated"] = accelerated
+        if old.get("accelerated_path"):
+            entry["accelerated_path"] = old["accelerated_path"]
+    else:
+        remove_files(acceleration_files(old))
+
+
+def build_catalog(data_dir: str, output_path: str, workers: Optional[int] = None, full: bool = False) -> Dict[str, int]:
+    """
+    Build or update geo_metadata.json for every dataset under data_dir.
+
+    Files whose mtime and size match the previous build are reused as-is.
+    Changed files are re-hashed and only re-read when their content hash differs.
+    A file that cannot be read keeps its last known entry, marked "stale",
+    until a later build reads it again.
+
+    Args:
+        data_dir (str): Root directory to scan
+        output_path (str): Catalog file to create or update
+        workers (Optional[int]): Size of the process pool (defaults to CPU count)
+        full (bool): Re-read every file; the previous catalog only supplies entries for files that fail
+
+    Returns:
+        Dict[str, int]: Counts of reused, rehashed, extracted, failed and removed files
+    """
+    known = {item["path"]: item for item in load_catalog(output_path)}
+    previous = {} if full else known
+    # Converted copies written by tools.dataset_accel are not datasets of their own
+    copies = {item["accelerated_path"] for item in known.values() if item.get("accelerated_path")}
+    paths = [path for path in scan_directory(data_dir) if path not in copies]
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    pending: Dict[str, Dict[str, int]] = {}
+    previous_hashes: Dict[str, Optional[str]] = {}
+    stats = {"reused": 0, "rehashed": 0, "extracted": 0, "failed": 0, "removed": 0}
+
+    for path in paths:
+        fingerprint = stat_fingerprint(path)
+        old = previous.get(path)
+        old_fp = (old or {}).get("fingerprint", {})
+        # Entries written by an older builder are re-extracted even if the content is unchanged
+        current_schema = old_fp.get("schema") == CATALOG_SCHEMA
+        if old and current_schema and not old.get("stale") and old_fp.get("mtime_ns") == fingerprint["mtime_ns"] and old_fp.get("size") == fingerprint["size"]:
+            entries[path] = old
+            stats["reused"] += 1
+        else:
+            pending[path] = fingerprint
+            previous_hashes[path] = old_fp.get("sha1") if current_schema else None
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(describe_file, path, previous_hashes[path]): path
+                for path in pending
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    _, entry, digest = future.result()
+                except Exception as e:
+                    print(f"[catalog_builder] Failed to read {path}: {e}", file=sys.stderr)
+                    stats["failed"] += 1
+                    # Keep the last known entry (also in full mode) so a transient read error does not drop the file;
+                    # its fingerprint stays that of the last successful read, so the next build retries it
+                    if path in known:
+                        entries[path] = dict(known[path], stale=True)
+                    continue
+
+                if entry is None:
+                    entry = dict(previous[path])
+                    entry.pop("stale", None)
+                    stats["rehashed"] += 1
+                else:
+                    stats["extracted"] += 1
+                entry["fingerprint"] = dict(pending[path], sha1=digest, schema=CATALOG_SCHEMA)
+                _carry_accelerated(entry, known.get(path), digest)
+                entries[path] = entry
+
+    stats["removed"] = len(set(known) - set(paths))
+
+    # Keep the previous order for known files and append new ones
+    ordered = [entries[p] for p in previous if p in entries]
+    ordered += [entries[p] for p in paths if p in entries and p not in previous]
+    write_catalog(output_path, ordered)
+    return stats
+
+
+def build_gazetteer(layer_path: str, name_field: str, output_path: str) -> int:
+    """
+    Write a place name -> EPSG:4326 bounding boxes lookup from a polygon layer.
+
+    file_search uses it to resolve place names mentioned in a question to a
+    region. Names are lower-cased; a name shared by several features (e.g.
+    counties in different states) keeps one box per feature.
+
+    Returns:
+        int: Number of distinct names written
+    """
+    from osgeo import ogr
+
+    ogr.UseExceptions()
+    ds = ogr.Open(layer_path)
+    layer = ds.GetLayer(0)
+    srs = layer.GetSpatialRef()
+
+    places: Dict[str, List[List[float]]] = {}
+    for feature in layer:
+        name = feature.GetField(name_field)
+        geom = feature.GetGeometryRef()
+        if not name or geom is None:
+            continue
+        minx, maxx, miny, maxy = geom.GetEnvelope()
+        bbox = _bbox_to_wgs84(srs, minx, miny, maxx, maxy)
+        if bbox:
+            places.setdefault(str(name).strip().lower(), []).append(bbox)
+
+    write_catalog(output_path, places)
+    return len(places)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build geo_metadata.json from a directory of vector and raster files.")
+    parser.add_argument("data_dir", help="Directory to scan recursively")
+    parser.add_argument("-o", "--output", default="geo_metadata.json", help="Catalog file to create or update")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--full", action="store_true", help="Re-read every file instead of updating incrementally")
+    parser.add_argument("--gazetteer", help="Polygon layer whose feature names are used to resolve regions in queries")
+    parser.add_argument("--gazetteer-field", default="NAME", help="Name field of the gazetteer layer")
+    parser.add_argument("--gazetteer-output", default="gazetteer.json", help="Where to write the gazetteer lookup")
+    args = parser.parse_args(argv)
+
+    stats = build_catalog(args.data_dir, args.output, workers=args.workers, full=args.full)
+    print(f"[catalog_builder] {args.output}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+    if args.gazetteer:
+        count = build_gazetteer(args.gazetteer, args.gazetteer_field, args.gazetteer_output)
+        print(f"[catalog_builder] {args.gazetteer_output}: {count} place names")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+# Chunks per INSERT batch while building
+BUILD_BATCH_SIZE = 5000
+# Bumped when the table layout changes so older stores are rebuilt
+STORE_SCHEMA = "2"
+# BM25 column weights for (title, content)
+BM25_WEIGHTS = (2.0, 1.0)
+# Keep "_" inside tokens so snake_case names stay whole; QgsVectorLayer is already one token
+FTS_TOKENIZER = "unicode61 tokenchars '_'"
+# Query words that match most chunks and only slow the BM25 scan down
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i",
+    "in", "is", "it", "of", "on", "or", "the", "this", "to", "use", "using", "what", "with",
+}
+
+
+def _source_stamp(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def build_chunk_store(metadata_path: str, db_path: str) -> int:
+    """
+    Convert rag_metadata.json into a SQLite chunk store.
+
+    Row ids are the positions in the JSON list, i.e. the FAISS vector ids.
+    The store is written to a temporary file and moved into place, so
+    readers never see a half-built database.
+
+    Returns:
+        int: Number of chunks written
+    """
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE chunks (id INTEGER PRIMARY KEY, source TEXT, title TEXT, content TEXT)")
+        conn.execute("CREATE TABLE store_info (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(
+            "CREATE VIRTUAL TABLE chunks_fts USING fts5("
+            "title, content, content='chunks', content_rowid='id', "
+            f"tokenize=\"{FTS_TOKENIZER}\")"
+        )
+        for start in range(0, len(metadata), BUILD_BATCH_SIZE):
+            conn.executemany(
+                "INSERT INTO chunks (id, source, title, content) VALUES (?, ?, ?, ?)",
+                [
+                    (i, item.get("file", "Unknown File"), item.get("title", "No Title"), item.get("text", ""))
+                    for i, item in enumerate(metadata[start:start + BUILD_BATCH_SIZE], start)
+                ],
+            )
+        conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO store_info VALUES ('source_stamp', ?)", (_source_stamp(metadata_path),))
+        conn.execute("INSERT INTO store_info VALUES ('schema', ?)", (STORE_SCHEMA,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return len(metadata)
+
+
+def is_stale(metadata_path: str, db_path: str) -> bool:
+    """True if the store is missing or was built from a different version of the JSON file."""
+    if not os.path.exists(db_path):
+        return True
+    if not os.path.exists(metadata_path):
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            info = dict(conn.execute("SELECT key, value FROM store_info").fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return True
+    return info.get("schema") != STORE_SCHEMA or info.get("source_stamp") != _source_stamp(metadata_path)
+
+
+class ChunkStore:
+    """
+    Read-only random access to RAG chunks by vector id.
+
+    Each thread gets its own SQLite connection; only the requested rows are
+    read, so memory does not grow with the size of the knowledge base.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Fetch chunks by id.
+
+        Returns:
+            Dict[int, Dict[str, Any]]: id -> {"source", "title", "content"}; unknown ids are absent
+        """
+        ids = [int(i) for i in ids if i is not None and int(i) >= 0]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self._conn().execute(
+            f"SELECT id, source, title, content FROM chunks WHERE id IN ({placeholders})", ids
+        ).fetchall()
+        return {row[0]: {"source": row[1], "title": row[2], "content": row[3]} for row in rows}
+
+    def search_bm25(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Lexical BM25 search over chunk titles and contents.
+
+        The query is reduced to its word tokens and OR-ed, so API names such as
+        QgsVectorLayer or processing.run('native:buffer') match literally.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk id, BM25 score), best first (higher is better)
+        """
+        terms = [t for t in dict.fromkeys(re.findall(r"\w+", query.lower())) if t not in STOPWORDS]
+        if not terms or limit <= 0:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        rows = self._conn().execute(
+            "SELECT rowid, bm25(chunks_fts, ?, ?) AS score FROM chunks_fts "
+            "WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?",
+            (*BM25_WEIGHTS, match, limit),
+        ).fetchall()
+        # SQLite's bm25() is negative, lower meaning more relevant
+        return [(row[0], -row[1]) for row in rows]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the SQLite chunk store used by rag_context from rag_metadata.json.")
+    parser.add_argument("--metadata", required=True, help="rag_metadata.json")
+    parser.add_argument("-o", "--output", required=True, help="SQLite file to write")
+    args = parser.parse_args(argv)
+
+    count = build_chunk_store(args.metadata, args.output)
+    print(f"[chunk_store] Wrote {count} chunks to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
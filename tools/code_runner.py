@@ -1,27 +1,33 @@
 import os
 import re
 import json
+import shutil
 import tempfile
-import subprocess
+import threading
 import traceback
-from typing import List, Annotated
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Annotated, Optional
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.prebuilt import InjectedState
-from langchain_openai import ChatOpenAI
-from config.model_config import get_model_config
+from config.llm_client import get_chat_model
 from prompts.tool_prompt_templates import CODE_GENERATION_PROMPT
-from langchain_core.messages.ai import AIMessage
+from tools import llm_cache
+from tools.qgis_workers import run_script
+from tools.preflight import PreflightIssue, check_script, format_issues
+from tools.geo_catalog import get_catalog
+from tools.file_search import METADATA_PATH
+from tools.script_cache import SCRIPT_CACHE_ENABLED, artifact_unchanged, script_cache, task_key
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-# === LLM config ===
-model_config = get_model_config()
-model = ChatOpenAI(
-    base_url=model_config['base_url'],
-    api_key=model_config['api_key'],
-    model_name=model_config['model_name'],
-    streaming=True)
+# Seconds a generated script may run
+SCRIPT_TIMEOUT = 120
+OUTPUT_DIR = r"/home/kaiyuan/lu2025-17-15/Kaiyuan/sp_group/result"
+# Code candidates sampled and run in parallel per call; 1 keeps the single generate-and-run path
+CODE_CANDIDATES = int(os.environ.get("CODE_CANDIDATES", "1"))
+# Sampling temperature of each parallel candidate (cycled if there are more candidates)
+CANDIDATE_TEMPERATURES = [0.2, 0.5, 0.8, 1.0]
 
 class CodeRunnerInput(BaseModel):
     question: str = Field(..., description="User's task description")
@@ -36,44 +42,74 @@ class CodeRunnerOutput(BaseModel):
     success: bool
     stdout: str = ""
     stderr: str = ""
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    terminated_reason: str | None = Field(None, description="Why the script was stopped early: preflight, timeout, traceback, cpu_limit, crash or cancelled")
+    preflight_issues: List[PreflightIssue] = Field(default_factory=list, description="Problems found before execution; the script was not run if any")
+    candidate: int = Field(0, description="Index of the parallel candidate that produced this code")
+    from_cache: str | None = Field(None, description="Set when a stored script answered the task: artifact (output reused) or rerun")
 
-@tool(
-    "code_generate_tool",
-    args_schema=CodeRunnerInput,
-    return_direct=False,
-    description="Generate and execute PyQGIS code based on the user task, semantic context, and provided input files. The tool attempts to run the code, capture standard output and error, and determine whether the execution was successful. Optionally accepts debug advice to refine the generation logic."
-)
-def code_generate(
-    question: str,
-    context: str,
+
+def extract_code(raw_output: str) -> str:
+    match = re.search(r"```python\s*(.*?)```", raw_output, re.DOTALL)
+    return match.group(1).strip() if match else raw_output.strip()
+
+
+def _catalog():
+    try:
+        return get_catalog(METADATA_PATH)
+    except (OSError, ValueError):
+        return None
+
+
+def execute_code(
+    generated_code: str,
     filepaths: List[str],
-    debug_advice: str | None = None,
-    # state: Annotated[dict, InjectedState],
-    # call_id: Annotated[str, InjectedToolCallId]
-    ) -> CodeRunnerOutput:
-    #print(f"[code_runner] Entering code_generate... Call ID: {call_id}")
-    generated_code = ""
-    stdout = ""
-    stderr = ""
-    
-    prompt = CODE_GENERATION_PROMPT.render(
-        question=question,
-        filepath=filepaths,
-        context=context,
-        output_path=r"/home/kaiyuan/lu2025-17-15/Kaiyuan/sp_group/result",
-        debug_advice=debug_advice or ""
-    )
+    output_dir: str = OUTPUT_DIR,
+    cwd: Optional[str] = None,
+    cancel: Optional[threading.Event] = None,
+    candidate: int = 0,
+) -> CodeRunnerOutput:
+    """
+    Check generated code statically, run it, and apply the success check: the
+    ##RESULT## output file exists and is non-empty, stderr has no traceback and
+    the script was not stopped.
 
-    raw_output = model.invoke(prompt)
+    A script that fails the pre-flight check (syntax, unknown input paths or
+    fields, outputs outside `output_dir`) is rejected without being started.
 
-    if isinstance(raw_output, AIMessage):
-        raw_output = raw_output.content or ""
-    elif not isinstance(raw_output, str):
-        raw_output = str(raw_output or "")
+    Args:
+        generated_code (str): PyQGIS script
+        filepaths (List[str]): Input files the script was given
+        output_dir (str): Directory the script must write its outputs to
+        cwd (Optional[str]): Working directory for the script
+        cancel (Optional[threading.Event]): Stops the script when set
+        candidate (int): Candidate index recorded in the output
 
-    match = re.search(r"```python\s*(.*?)```", raw_output, re.DOTALL)
-    generated_code = match.group(1).strip() if match else raw_output.strip()
+    Returns:
+        CodeRunnerOutput: Execution outcome
+    """
+    stdout = ""
+    stderr = ""
+    result = None
+    output_file = ""
+    success = False
+    script_path = None
     match_input = re.search(r"##INPUT##\s*(\{.*\})", generated_code)
+
+    issues = check_script(generated_code, filepaths, output_dir, catalog=_catalog())
+    if issues:
+        return CodeRunnerOutput(
+            code=generated_code,
+            output_file="",
+            tool_used_file=match_input.group(1) if match_input else "",
+            success=False,
+            stderr=format_issues(issues),
+            terminated_reason="preflight",
+            preflight_issues=issues,
+            candidate=candidate,
+        )
+
     try:
         with tempfile.NamedTemporaryFile(delete=False, suffix=".py", mode="w") as temp_file:
             temp_file.write(generated_code)
@@ -83,14 +119,9 @@ def code_generate(
         env["QT_QPA_PLATFORM"] = "offscreen"
         env["PYTHONUNBUFFERED"] = "1"
 
-        result = subprocess.run(
-            ["python", script_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=120,
-            env=env,
-            text=True
-        )
+        # Runs in a warm PyQGIS worker when available, otherwise in a fresh subprocess; output is
+        # watched while it runs and the script is stopped early after a Traceback
+        result = run_script(script_path, timeout=SCRIPT_TIMEOUT, env=env, cwd=cwd, cancel=cancel)
 
         stdout = result.stdout.strip()
         stderr = result.stderr.strip()
@@ -106,31 +137,225 @@ def code_generate(
         file_size_ok = os.path.getsize(output_file) > 0 if file_exists else False
         traceback_error = "traceback" in stderr.lower()
 
-        success = file_exists and file_size_ok and not traceback_error
-
-        if success:
-            return CodeRunnerOutput(
-                code=generated_code,
-                output_file=output_file,
-                tool_used_file=match_input,
-                success=True,
-                stdout=stdout,
-                stderr=stderr
-            )
+        success = file_exists and file_size_ok and not traceback_error and not result.terminated_reason
 
     except Exception as e:
         stderr += f"\n[Exception Caught]\n{traceback.format_exc()}"
 
     finally:
-        if os.path.exists(script_path):
+        if script_path and os.path.exists(script_path):
             os.remove(script_path)
 
     return CodeRunnerOutput(
         code=generated_code,
-        output_file="",
-        tool_used_file=match_input,
-        success=False,
+        output_file=output_file if success else "",
+        tool_used_file=match_input.group(1) if match_input else "",
+        success=success,
         stdout=stdout,
-        stderr=stderr
+        stderr=stderr,
+        wall_time=result.wall_time if result else 0.0,
+        cpu_time=result.cpu_time if result else 0.0,
+        terminated_reason=result.terminated_reason if result else None,
+        candidate=candidate,
+    )
+
+
+def _publish_output(sandbox: str, output: CodeRunnerOutput) -> CodeRunnerOutput:
+    """Move the winning candidate's files from its sandbox into OUTPUT_DIR."""
+    output_file = os.path.abspath(output.output_file)
+    if os.path.commonpath([output_file, sandbox]) != sandbox:
+        # Written outside the sandbox; leave it where the script put it
+        return output
+    for name in os.listdir(sandbox):
+        target = os.path.join(OUTPUT_DIR, name)
+        if os.path.isdir(target) and not os.path.islink(target):
+            shutil.rmtree(target)
+        shutil.move(os.path.join(sandbox, name), target)
+    return output.model_copy(update={
+        "output_file": os.path.join(OUTPUT_DIR, os.path.relpath(output_file, sandbox)),
+        # Point the script at where its files now live, so it can be stored and re-run
+        "code": output.code.replace(sandbox, OUTPUT_DIR),
+    })
+
+
+def _stream_until_cancelled(model, prompt: str, cancel: threading.Event) -> Optional[str]:
+    """
+    Stream a completion, giving up as soon as `cancel` is set.
+
+    Closing the stream closes the HTTP response, so the server stops
+    generating and the connection slot is released.
+
+    Returns:
+        Optional[str]: Response text, or None if cancelled before it was complete
+    """
+    if cancel.is_set():
+        return None
+    stream = model.stream(prompt)
+    parts = []
+    try:
+        for chunk in stream:
+            if cancel.is_set():
+                return None
+            parts.append(llm_cache.response_text(chunk))
+    finally:
+        stream.close()
+    return None if cancel.is_set() else "".join(parts)
 
+
+def generate_candidates(
+    question: str,
+    context: str,
+    filepaths: List[str],
+    debug_advice: str | None,
+    count: int,
+) -> CodeRunnerOutput:
+    """
+    Sample `count` scripts at different temperatures and run them concurrently.
+
+    Each candidate gets its own sandbox directory under OUTPUT_DIR, used both as
+    its working directory and as the output path in its prompt. The first
+    candidate that passes the success check wins: its files are moved into
+    OUTPUT_DIR and the others are cancelled. Their running scripts are killed
+    and generations still streaming from the LLM are closed or never started.
+    If all fail, the result of the lowest-temperature candidate is returned.
+    """
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    cancel = threading.Event()
+    lock = threading.Lock()
+    winner: List[CodeRunnerOutput] = []
+
+    def attempt(index: int, sandbox: str) -> Optional[CodeRunnerOutput]:
+        if cancel.is_set():
+            return None
+        prompt = CODE_GENERATION_PROMPT.render(
+            question=question,
+            filepath=filepaths,
+            context=context,
+            output_path=sandbox,
+            debug_advice=debug_advice or ""
+        )
+        temperature = CANDIDATE_TEMPERATURES[index % len(CANDIDATE_TEMPERATURES)]
+        # Prompts differ by sandbox path, so candidates bypass the response cache
+        model = get_chat_model(temperature=temperature)
+        response = _stream_until_cancelled(model, prompt, cancel)
+        if response is None:
+            return None
+        generated_code = extract_code(response)
+        output = execute_code(generated_code, filepaths, output_dir=sandbox, cwd=sandbox, cancel=cancel, candidate=index)
+        if output.success:
+            with lock:
+                if winner:
+                    return None
+                output = _publish_output(sandbox, output)
+                winner.append(output)
+                cancel.set()
+        return output
+
+    pool = ThreadPoolExecutor(max_workers=count, thread_name_prefix="code-candidate")
+    futures = []
+    for index in range(count):
+        sandbox = tempfile.mkdtemp(prefix=f"candidate{index}_", dir=OUTPUT_DIR)
+        future = pool.submit(attempt, index, sandbox)
+        # Losers may still be shutting down when the winner returns; each cleans up its own sandbox
+        future.add_done_callback(lambda _, sandbox=sandbox: shutil.rmtree(sandbox, ignore_errors=True))
+        futures.append(future)
+    try:
+        pending = set(futures)
+        while pending and not winner:
+            _, pending = wait(pending, return_when=FIRST_COMPLETED)
+    finally:
+        cancel.set()
+        pool.shutdown(wait=False)
+
+    if winner:
+        return winner[0]
+    for future in futures:
+        if future.exception() is None and future.result() is not None:
+            return future.result()
+    errors = "\n".join(f"[candidate {i}] {future.exception()}" for i, future in enumerate(futures) if future.exception())
+    return CodeRunnerOutput(
+        code="", output_file="", tool_used_file="", success=False,
+        stderr=f"[code_runner] No candidate could be generated\n{errors}",
     )
+
+
+@tool(
+    "code_generate_tool",
+    args_schema=CodeRunnerInput,
+    return_direct=False,
+    description="Generate and execute PyQGIS code based on the user task, semantic context, and provided input files. The tool attempts to run the code, capture standard output and error, and determine whether the execution was successful. Optionally accepts debug advice to refine the generation logic."
+)
+def code_generate(
+    question: str,
+    context: str,
+    filepaths: List[str],
+    debug_advice: str | None = None,
+    # state: Annotated[dict, InjectedState],
+    # call_id: Annotated[str, InjectedToolCallId]
+    ) -> CodeRunnerOutput:
+    #print(f"[code_runner] Entering code_generate... Call ID: {call_id}")
+    key = task_key(question, filepaths, context) if SCRIPT_CACHE_ENABLED else None
+    # Debug advice means the last result was rejected, so a stored script is not wanted
+    if key and not debug_advice:
+        cached = _from_script_cache(key, question, filepaths)
+        if cached is not None:
+            return cached
+
+    output = _generate(question, context, filepaths, debug_advice)
+    if key and output.success:
+        script_cache.put(key, question, output.code, output.output_file, output.tool_used_file, output.stdout)
+    return output
+
+
+def _from_script_cache(key: str, question: str, filepaths: List[str]) -> Optional[CodeRunnerOutput]:
+    """
+    Answer a task from the store of successful scripts.
+
+    The stored output is returned as-is when it is unchanged since the script
+    wrote it; otherwise the stored script is run again (no LLM call). A script
+    that no longer succeeds is dropped from the store.
+    """
+    entry = script_cache.get(key)
+    if entry is None:
+        script_cache.count("misses")
+        return None
+    if artifact_unchanged(entry):
+        script_cache.count("artifact_hits")
+        return CodeRunnerOutput(
+            code=entry["code"],
+            output_file=entry["output_file"],
+            tool_used_file=entry["tool_used_file"],
+            success=True,
+            stdout=entry["stdout"],
+            from_cache="artifact",
+        )
+    output = execute_code(entry["code"], filepaths)
+    if not output.success:
+        script_cache.invalidate(key)
+        script_cache.count("misses")
+        return None
+    script_cache.count("rerun_hits")
+    script_cache.put(key, question, output.code, output.output_file, output.tool_used_file, output.stdout)
+    return output.model_copy(update={"from_cache": "rerun"})
+
+
+def _generate(question: str, context: str, filepaths: List[str], debug_advice: str | None) -> CodeRunnerOutput:
+    if CODE_CANDIDATES > 1:
+        return generate_candidates(question, context, filepaths, debug_advice, CODE_CANDIDATES)
+
+    prompt = CODE_GENERATION_PROMPT.render(
+        question=question,
+        filepath=filepaths,
+        context=context,
+        output_path=OUTPUT_DIR,
+        debug_advice=debug_advice or ""
+    )
+
+    model = get_chat_model()
+    raw_output = llm_cache.cached_invoke(model, prompt, tool="code_runner")
+
+    output = execute_code(extract_code(raw_output), filepaths)
+    if not output.success:
+        # A retry with the same prompt must sample new code instead of replaying this failure
+        llm_cache.invalidate(model, prompt)
+    return output
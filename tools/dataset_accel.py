@@ -0,0 +1,223 @@
+import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+from tools.catalog_builder import content_hash, load_catalog, remove_files, write_catalog
+
+# === Configuration ===
+# Converted copies go to this directory next to the catalog unless --output-dir is given
+ACCELERATED_DIR_NAME = "accelerated"
+# Rasters smaller than this on both sides are read fast enough without overviews
+MIN_OVERVIEW_SIZE = 1024
+OVERVIEW_RESAMPLING = "AVERAGE"
+# Creation options of the Cloud Optimized GeoTIFF copies (tiled, compressed, internal overviews)
+COG_OPTIONS = ["COMPRESS=DEFLATE", "BLOCKSIZE=512", "OVERVIEWS=AUTO", f"RESAMPLING={OVERVIEW_RESAMPLING}", "NUM_THREADS=ALL_CPUS"]
+
+
+def source_sha1(entry: Dict[str, Any]) -> Optional[str]:
+    """Content hash recorded by tools.catalog_builder, or None for entries built without fingerprints."""
+    return (entry.get("fingerprint") or {}).get("sha1") or None
+
+
+def is_current(entry: Dict[str, Any]) -> bool:
+    """True if the entry was accelerated for its current content (both hashes known and equal)."""
+    accelerated = entry.get("accelerated") or {}
+    sha1 = source_sha1(entry)
+    return bool(accelerated) and sha1 is not None and accelerated.get("source_sha1") == sha1
+
+
+def accelerated_path(entry: Dict[str, Any]) -> Optional[str]:
+    """Path of the converted copy of a catalog entry, if it exists and was made from the current file."""
+    path = entry.get("accelerated_path")
+    if not path or not os.path.exists(path) or not is_current(entry):
+        return None
+    return path
+
+
+def _copy_name(entry: Dict[str, Any], ext: str) -> str:
+    # The hash prefix keeps files with the same name from different folders apart
+    stem = os.path.splitext(os.path.basename(entry["path"]))[0]
+    return f"{stem}_{(source_sha1(entry) or '')[:8]}{ext}"
+
+
+# === Per-file work (runs in worker processes) ===
+def _accelerate_vector(entry: Dict[str, Any], output_dir: str, to_gpkg: bool) -> Dict[str, Any]:
+    from osgeo import gdal, ogr
+
+    gdal.UseExceptions()
+    ogr.UseExceptions()
+    path = entry["path"]
+    done: Dict[str, Any] = {}
+    if path.lower().endswith(".shp"):
+        # OGR picks up the .qix next to the shapefile for every spatial filter
+        ds = ogr.Open(path, 1)
+        layer = ds.GetLayer(0)
+        ds.ExecuteSQL(f'CREATE SPATIAL INDEX ON "{layer.GetName()}"')
+        ds = None
+        done["qix"] = True
+    if to_gpkg and not path.lower().endswith(".gpkg"):
+        target = os.path.join(output_dir, _copy_name(entry, ".gpkg"))
+        tmp = target + ".tmp.gpkg"
+        gdal.VectorTranslate(
+            tmp, path,
+            options=gdal.VectorTranslateOptions(format="GPKG", layerCreationOptions=["SPATIAL_INDEX=YES"]),
+        )
+        os.replace(tmp, target)
+        done["path"] = target
+        done["format"] = "GPKG"
+    return done
+
+
+def _accelerate_raster(entry: Dict[str, Any], output_dir: str, to_cog: bool) -> Dict[str, Any]:
+    from osgeo import gdal
+
+    gdal.UseExceptions()
+    path = entry["path"]
+    done: Dict[str, Any] = {}
+    if to_cog:
+        target = os.path.join(output_dir, _copy_name(entry, ".tif"))
+        tmp = target + ".tmp.tif"
+        gdal.Translate(tmp, path, options=gdal.TranslateOptions(format="COG", creationOptions=COG_OPTIONS))
+        os.replace(tmp, target)
+        done["path"] = target
+        done["format"] = "COG"
+        return done
+
+    ds = gdal.Open(path)
+    if ds.RasterCount and ds.GetRasterBand(1).GetOverviewCount() == 0:
+        levels = []
+        factor = 2
+        while max(ds.RasterXSize, ds.RasterYSize) // factor >= MIN_OVERVIEW_SIZE // 4:
+            levels.append(factor)
+            factor *= 2
+        if max(ds.RasterXSize, ds.RasterYSize) >= MIN_OVERVIEW_SIZE and levels:
+            # Opened read-only, so GDAL writes them to an external .ovr and leaves the file untouched
+            ds.BuildOverviews(OVERVIEW_RESAMPLING, levels)
+            done["overviews"] = levels
+    ds = None
+    return done
+
+
+def accelerate_file(entry: Dict[str, Any], output_dir: str, to_gpkg: bool = False, to_cog: bool = False) -> Dict[str, Any]:
+    """
+    Make one catalog entry faster to read.
+
+    Shapefiles get a .qix spatial index and rasters external overviews, both
+    next to the file. With `to_gpkg` / `to_cog` a converted copy (GeoPackage
+    with R-tree index, tiled COG with internal overviews) is written to
+    `output_dir` instead of the raster overviews.
+
+    Returns:
+        Dict[str, Any]: What was done; "path" is set when a converted copy was written
+    """
+    if entry.get("type") == "raster":
+        return _accelerate_raster(entry, output_dir, to_cog)
+    return _accelerate_vector(entry, output_dir, to_gpkg)
+
+
+# === Catalog pass ===
+def _record(entry: Dict[str, Any], done: Dict[str, Any]) -> bool:
+    """Store the result of accelerate_file in the entry; a copy it replaced is deleted. True if a copy was converted."""
+    converted = done.pop("path", None)
+    replaced = entry.get("accelerated_path")
+    if converted:
+        entry["accelerated_path"] = converted
+    else:
+        entry.pop("accelerated_path", None)
+    if replaced and replaced != converted:
+        # Named after the old content hash, so nothing would ever use it again
+        remove_files([replaced])
+    done["source_sha1"] = source_sha1(entry)
+    entry["accelerated"] = done
+    return bool(converted)
+
+
+def accelerate_catalog(catalog_path: str, output_dir: Optional[str] = None, to_gpkg: bool = False,
+                       to_cog: bool = False, workers: Optional[int] = None, force: bool = False) -> Dict[str, int]:
+    """
+    Run accelerate_file over every entry of geo_metadata.json and record the results.
+
+    Each entry gets an "accelerated" record (what was done and the content
+    hash of the source it was done for) and, when a copy was converted,
+    "accelerated_path". Entries already accelerated for their current
+    content are skipped unless `force` is set. Entries without a content
+    hash (catalogs written before tools.catalog_builder recorded
+    fingerprints) are hashed here first.
+
+    Args:
+        catalog_path (str): Catalog file built by tools.catalog_builder
+        output_dir (Optional[str]): Directory for converted copies
+        to_gpkg (bool): Convert vectors to GeoPackage
+        to_cog (bool): Convert rasters to Cloud Optimized GeoTIFF
+        workers (Optional[int]): Size of the process pool (defaults to CPU count)
+        force (bool): Redo entries that are already accelerated
+
+    Returns:
+        Dict[str, int]: Counts of accelerated, converted, skipped and failed entries
+    """
+    entries = load_catalog(catalog_path)
+    output_dir = output_dir or os.path.join(os.path.dirname(os.path.abspath(catalog_path)), ACCELERATED_DIR_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+    stats = {"accelerated": 0, "converted": 0, "skipped": 0, "failed": 0}
+
+    pending: List[int] = []
+    unhashed = 0
+    for position, entry in enumerate(entries):
+        if source_sha1(entry) is None:
+            try:
+                entry["fingerprint"] = dict(entry.get("fingerprint") or {}, sha1=content_hash(entry["path"]))
+            except OSError as e:
+                print(f"[dataset_accel] Cannot read {entry['path']}: {e}", file=sys.stderr)
+                stats["failed"] += 1
+                continue
+            unhashed += 1
+        wanted = to_cog if entry.get("type") == "raster" else to_gpkg
+        if not force and is_current(entry) and (accelerated_path(entry) or not wanted):
+            stats["skipped"] += 1
+        else:
+            pending.append(position)
+
+    if unhashed:
+        print(f"[dataset_accel] {unhashed} entries had no content hash and were hashed now; "
+              f"rebuild the catalog with `python -m tools.catalog_builder` to record full fingerprints",
+              file=sys.stderr)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(accelerate_file, entries[position], output_dir, to_gpkg, to_cog): position
+                for position in pending
+            }
+            for future in as_completed(futures):
+                entry = entries[futures[future]]
+                try:
+                    done = future.result()
+                except Exception as e:
+                    print(f"[dataset_accel] Failed on {entry['path']}: {e}", file=sys.stderr)
+                    stats["failed"] += 1
+                    continue
+                if _record(entry, done):
+                    stats["converted"] += 1
+                stats["accelerated"] += 1
+
+    write_catalog(catalog_path, entries)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Add spatial indexes and overviews to the datasets of geo_metadata.json.")
+    parser.add_argument("catalog", help="Catalog file built by tools.catalog_builder")
+    parser.add_argument("--output-dir", help=f"Where converted copies go (default: '{ACCELERATED_DIR_NAME}' next to the catalog)")
+    parser.add_argument("--gpkg", action="store_true", help="Convert vectors to GeoPackage with an R-tree index")
+    parser.add_argument("--cog", action="store_true", help="Convert rasters to tiled Cloud Optimized GeoTIFF with overviews")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--force", action="store_true", help="Redo entries that are already accelerated")
+    args = parser.parse_args(argv)
+
+    stats = accelerate_catalog(args.catalog, args.output_dir, args.gpkg, args.cog, args.workers, args.force)
+    print(f"[dataset_accel] {args.catalog}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
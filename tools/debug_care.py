@@ -5,18 +5,9 @@ from typing import List, Annotated
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.prebuilt import InjectedState
-from langchain_openai import ChatOpenAI
 from prompts.tool_prompt_templates import DEBUG_CARE_PROMPT
-from config.model_config import get_model_config
-from langchain_core.messages.ai import AIMessage
-
-# === LLM config ===
-model_config = get_model_config()
-model = ChatOpenAI(
-    base_url=model_config['base_url'],
-    api_key=model_config['api_key'],
-    model_name=model_config['model_name'],
-    streaming=True)
+from config.llm_client import get_chat_model
+from tools.llm_cache import cached_invoke
 
 class DebugInput(BaseModel):
     question: str = Field(..., description="User's task description")
@@ -59,12 +50,7 @@ def debug_care(
         code_error=code_error
     )
 
-    raw_output = model.invoke(prompt)
-
-    if isinstance(raw_output, AIMessage):
-        raw_output = raw_output.content or ""
-    elif not isinstance(raw_output, str):
-        raw_output = str(raw_output or "")
+    raw_output = cached_invoke(get_chat_model(), prompt, tool="debug_care")
 
     match_code = re.search(r"```CODE_ADVICE\s*(.*?)```", raw_output, re.DOTALL)
     match_agent = re.search(r"```AGENT_CALLING_ADVICE\s*(.*?)```", raw_output, re.DOTALL)
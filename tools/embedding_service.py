@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+# === Configuration ===
+MODEL_NAME = os.environ.get("EMBEDDING_MODEL_NAME", "nomic-ai/nomic-embed-text-v2-moe")
+# "cpu", "cuda", "cuda:1", ...; None lets sentence-transformers pick
+EMBEDDING_DEVICE: Optional[str] = os.environ.get("EMBEDDING_DEVICE") or None
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "32"))
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_embedding_model() -> "SentenceTransformer":
+    """
+    Get the process-wide embedding model, loading it on first use.
+
+    All tools share this instance so the model is held in memory once.
+    sentence-transformers (and torch) are imported here rather than at module
+    level so importing a tool module stays cheap.
+
+    Returns:
+        SentenceTransformer: The shared embedding model
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(MODEL_NAME, device=EMBEDDING_DEVICE, trust_remote_code=True)
+    return _model
+
+
+def encode(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    normalize: bool = False,
+    prefix: str = "",
+) -> np.ndarray:
+    """
+    Embed a batch of texts with the shared model.
+
+    Args:
+        texts (List[str]): Texts to embed
+        batch_size (Optional[int]): Encoder batch size (defaults to EMBEDDING_BATCH_SIZE)
+        normalize (bool): L2-normalize the vectors so dot product equals cosine similarity
+        prefix (str): Task prefix prepended to every text (e.g. "search_query: ")
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), dim)
+    """
+    vectors = get_embedding_model().encode(
+        [prefix + text for text in texts] if prefix else list(texts),
+        batch_size=batch_size or EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=normalize,
+    )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+# === Embedding Cache ===
+class EmbeddingCache:
+    """
+    LRU cache of embeddings keyed by a hash of (model, prefix, normalize, text).
+
+    When `path` is set, vectors are also written to a SQLite file so they
+    survive restarts and are shared between processes; the file keeps at most
+    `max_disk_entries` rows, dropping the oldest first.
+    """
+
+    def __init__(self, max_entries: int = 4096, path: Optional[str] = None, max_disk_entries: int = 200_000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._conn = None
+        self._disk_writes = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._conn.commit()
+
+    @staticmethod
+    def key(text: str, prefix: str = "", normalize: bool = False) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{MODEL_NAME}\0{prefix}\0{int(normalize)}\0".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+
+            missing = [key for key in keys if key not in found]
+            if missing and self._conn is not None:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self._conn is not None and items:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()],
+                )
+                self._disk_writes += len(items)
+                if self._disk_writes >= 1000:
+                    self._disk_writes = 0
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?",
+                        (self.max_disk_entries,),
+                    )
+                self._conn.commit()
+
+    def count(self, hits: int, misses: int) -> None:
+        """Add to the hit/miss counters; callers on several threads share them."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "4096"))
+# SQLite file for a persistent embedding cache; unset keeps the cache in memory only
+EMBEDDING_CACHE_PATH: Optional[str] = os.environ.get("EMBEDDING_CACHE_PATH") or None
+
+embedding_cache = EmbeddingCache(max_entries=EMBEDDING_CACHE_SIZE, path=EMBEDDING_CACHE_PATH)
+
+
+def encode_cached(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    normalize: bool = False,
+    prefix: str = "",
+) -> np.ndarray:
+    """
+    Same as encode(), but reuses cached vectors and embeds only unseen texts,
+    each distinct text once, in a single batch.
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), dim)
+    """
+    keys = [EmbeddingCache.key(text, prefix, normalize) for text in texts]
+    found = embedding_cache.get_many(list(dict.fromkeys(keys)))
+
+    todo: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in todo:
+            todo[key] = text
+
+    embedding_cache.count(hits=len(keys) - len(todo), misses=len(todo))
+
+    if todo:
+        vectors = encode(list(todo.values()), batch_size=batch_size, normalize=normalize, prefix=prefix)
+        fresh = dict(zip(todo.keys(), vectors))
+        embedding_cache.put_many(fresh)
+        found.update(fresh)
+
+    return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
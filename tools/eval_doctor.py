@@ -1,33 +1,23 @@
 import json
 import re
+import numpy as np
 from typing import List, Dict, Annotated
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.prebuilt import InjectedState
-from langchain_core.messages.ai import AIMessage
-from langchain_openai import ChatOpenAI
-from sentence_transformers import SentenceTransformer, util
-from config.model_config import get_model_config
+from tools.embedding_service import encode_cached
+from tools.llm_cache import cached_invoke
+from config.llm_client import get_chat_model
 from prompts.tool_prompt_templates import EVAL_DOCTOR_TEMPLATE
 
-# === Load LLM & Embedding Model ===
-model_config = get_model_config()
-
-llm = ChatOpenAI(
-    base_url=model_config['base_url'],
-    api_key=model_config['api_key'],
-    model_name=model_config['model_name'],
-    streaming=True)
-
-embedding_model = SentenceTransformer("nomic-ai/nomic-embed-text-v2-moe", trust_remote_code=True)
-
 # === Input Schema ===
 class FileMetadata(BaseModel):
     path: str
     type: str
     geometry: str = ""
     fields: List[str]
-    features: int
+    features: int | None = Field(None, description="Feature count of a vector layer; None for rasters")
+    size: List[int] | None = Field(None, description="Raster width and height in pixels")
     crs: str = "Unknown"
     description: str
 
@@ -52,8 +42,18 @@ class EvalOutput(BaseModel):
 
 # === Embedding Similarity Helper ===
 def cosine_sim(a: str, b: str) -> float: 
-    emb = embedding_model.encode([a, b], convert_to_tensor=True) 
-    return float(util.pytorch_cos_sim(emb[0], emb[1]))
+    emb = encode_cached([a, b], normalize=True)
+    return float(np.dot(emb[0], emb[1]))
+
+def similarity_scores(context_text: str, full_task_text: str, generated_code: str) -> Dict[str, float]:
+    # One batched encode; the code is embedded once and cached across evaluations
+    context_emb, full_task_emb, code_emb = encode_cached(
+        [context_text, full_task_text, generated_code], normalize=True
+    )
+    return {
+        "context_to_code": float(np.dot(context_emb, code_emb)),
+        "full_task_to_code": float(np.dot(full_task_emb, code_emb))
+    }
 
 # === Tool Implementation ===
 @tool(
@@ -102,11 +102,7 @@ def eval_doctor(
         generated_code = input.generated_code
     )
 
-    raw_output = llm.invoke(prompt)
-    if isinstance(raw_output, AIMessage):
-        raw_output = raw_output.content or ""
-    elif not isinstance(raw_output, str):
-        raw_output = str(raw_output or "")
+    raw_output = cached_invoke(get_chat_model(), prompt, tool="eval_doctor")
 
     try:
         llm_eval = json.loads(re.search(r"\{.*\}", raw_output, re.DOTALL).group(0))
@@ -137,10 +133,7 @@ def eval_doctor(
         f"RAG Context: {context_text}"
     ])
 
-    similarity = {
-        "context_to_code": cosine_sim(context_text, input.generated_code),
-        "full_task_to_code": cosine_sim(full_task_text, input.generated_code)
-    }
+    similarity = similarity_scores(context_text, full_task_text, input.generated_code)
 
     return EvalOutput(
     context_relevance=EvalScoreExplanation(**llm_eval["context_relevance"]),
@@ -0,0 +1,250 @@
+import os
+import time
+import codecs
+import signal
+import threading
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows; limits are then skipped
+    resource = None
+
+# === Configuration ===
+# CPU seconds a generated script may use (0 = unlimited)
+SCRIPT_CPU_LIMIT = int(os.environ.get("SCRIPT_CPU_LIMIT", "300"))
+# Address space a script may use in MB (0 = unlimited); covers the whole worker process while it runs a script
+SCRIPT_MEMORY_LIMIT_MB = int(os.environ.get("SCRIPT_MEMORY_LIMIT_MB", "16384"))
+# Seconds a script may keep running after printing a Traceback (lets the traceback finish)
+TRACEBACK_GRACE = float(os.environ.get("SCRIPT_TRACEBACK_GRACE", "2"))
+# Seconds between checks of a running script
+POLL_INTERVAL = 0.1
+# stderr text that means the script has failed
+FATAL_MARKERS = ("Traceback (most recent call last):", "Fatal Python error")
+
+
+class ScriptResult:
+    """Outcome of running one generated script."""
+
+    def __init__(self, returncode: Optional[int], stdout: str, stderr: str, wall_time: float = 0.0,
+                 cpu_time: float = 0.0, terminated_reason: Optional[str] = None):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        # None if the script exited by itself, else "timeout", "traceback", "cpu_limit", "crash" or "cancelled"
+        self.terminated_reason = terminated_reason
+
+    @property
+    def timed_out(self) -> bool:
+        return self.terminated_reason == "timeout"
+
+
+class ExecutionMonitor:
+    """
+    Watches the output of a running script and decides when to stop it.
+
+    Output is fed in as it arrives (from pipes or from files being written).
+    check() returns "traceback" once a Traceback has been on stderr for
+    `grace` seconds, "timeout" once the wall-clock limit has passed and
+    "cancelled" once `cancel` is set (e.g. another candidate already won).
+    """
+
+    def __init__(self, timeout: float, grace: float = TRACEBACK_GRACE, cancel: Optional[threading.Event] = None):
+        self.cancel = cancel
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+        self.timeout = timeout
+        self.grace = grace
+        self.fatal_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._chunks: Dict[str, List[str]] = {"stdout": [], "stderr": []}
+        self._tail = ""
+
+    def feed(self, stream: str, text: str) -> None:
+        if not text:
+            return
+        with self._lock:
+            self._chunks[stream].append(text)
+            if stream == "stderr" and self.fatal_at is None:
+                # Keep the end of the previous chunk so a marker split across reads is still found
+                window = self._tail + text
+                if any(marker in window for marker in FATAL_MARKERS):
+                    self.fatal_at = time.monotonic()
+                self._tail = window[-64:]
+
+    def check(self) -> Optional[str]:
+        if self.cancel is not None and self.cancel.is_set():
+            return "cancelled"
+        now = time.monotonic()
+        if self.fatal_at is not None and now - self.fatal_at >= self.grace:
+            return "traceback"
+        if now >= self.deadline:
+            return "timeout"
+        return None
+
+    @property
+    def stdout(self) -> str:
+        with self._lock:
+            return "".join(self._chunks["stdout"])
+
+    @property
+    def stderr(self) -> str:
+        with self._lock:
+            return "".join(self._chunks["stderr"])
+
+    @property
+    def wall_time(self) -> float:
+        return time.monotonic() - self.started
+
+    def result(self, returncode: Optional[int], cpu_time: float, reason: Optional[str]) -> ScriptResult:
+        """Build the ScriptResult; a note on why the script was stopped is appended to stderr."""
+        stderr = self.stderr
+        if reason == "timeout":
+            stderr += f"\n[Timeout] Script did not finish within {self.timeout:.0f}s"
+        elif reason == "traceback":
+            stderr += f"\n[Aborted] Script was stopped {self.grace:.0f}s after printing a Traceback"
+        elif reason == "cpu_limit":
+            stderr += f"\n[Aborted] Script exceeded the CPU limit of {SCRIPT_CPU_LIMIT}s"
+        elif reason == "cancelled":
+            stderr += "\n[Cancelled] Script was stopped because it was no longer needed"
+        elif reason == "crash":
+            stderr += f"\n[Crashed] Script process exited with code {returncode}"
+        return ScriptResult(returncode, self.stdout, stderr, self.wall_time, cpu_time, reason)
+
+
+Limits = Dict[int, Tuple[int, int]]
+
+
+def process_cpu_seconds(pid: int) -> float:
+    """CPU time (user + system) a running process has used so far, from /proc; 0 where unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # The command name may contain spaces; the fields after it are fixed
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def _lower_soft_limit(pid: int, which: int, soft: int) -> Tuple[int, int]:
+    previous = resource.prlimit(pid, which)
+    hard = previous[1]
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.prlimit(pid, which, (soft, hard))
+    return previous
+
+
+def limit_process(pid: int, cpu_seconds: int = SCRIPT_CPU_LIMIT, memory_mb: int = SCRIPT_MEMORY_LIMIT_MB) -> Limits:
+    """
+    Set RLIMIT_CPU / RLIMIT_AS of a running process from outside with prlimit.
+
+    The CPU limit counts from the CPU time the process has already used, so
+    a long-lived worker gets `cpu_seconds` for the next script. Only soft
+    limits are lowered, so restore_limits() can raise them again.
+
+    Returns:
+        Limits: The previous limits, for restore_limits(); empty where prlimit is unavailable
+
+    Raises:
+        OSError: If the process no longer exists
+    """
+    previous: Limits = {}
+    if resource is None or not hasattr(resource, "prlimit"):
+        return previous
+    if cpu_seconds > 0:
+        used = int(process_cpu_seconds(pid))
+        previous[resource.RLIMIT_CPU] = _lower_soft_limit(pid, resource.RLIMIT_CPU, used + cpu_seconds)
+    if memory_mb > 0:
+        previous[resource.RLIMIT_AS] = _lower_soft_limit(pid, resource.RLIMIT_AS, memory_mb * 1024 * 1024)
+    return previous
+
+
+def restore_limits(pid: int, previous: Limits) -> None:
+    """Put back limits returned by limit_process(); a process that has exited is ignored."""
+    for which, limits in previous.items():
+        try:
+            resource.prlimit(pid, which, limits)
+        except (OSError, ValueError):
+            return
+
+
+def exit_reason(returncode: Optional[int]) -> Optional[str]:
+    """Termination reason implied by a return code (killed by a signal we did not send)."""
+    if returncode is None or returncode >= 0:
+        return None
+    if returncode == -getattr(signal, "SIGXCPU", 24):
+        return "cpu_limit"
+    return "crash"
+
+
+def _pump(pipe, stream: str, monitor: ExecutionMonitor) -> None:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for line in iter(pipe.readline, b""):
+        monitor.feed(stream, decoder.decode(line))
+    monitor.feed(stream, decoder.decode(b"", final=True))
+    pipe.close()
+
+
+def run_subprocess(cmd: List[str], timeout: float, env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None,
+                   cancel: Optional[threading.Event] = None) -> ScriptResult:
+    """
+    Run a command under an ExecutionMonitor.
+
+    stdout/stderr are read line by line while it runs. The process is killed
+    on timeout, on `cancel` or shortly after a Traceback, gets the CPU/memory
+    rlimits right after it is spawned, and its CPU time comes from wait4's rusage.
+
+    Returns:
+        ScriptResult: Output so far, return code, wall/CPU time and termination reason
+    """
+    monitor = ExecutionMonitor(timeout, cancel=cancel)
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        cwd=cwd,
+    )
+    # Set from here rather than with preexec_fn, which is not safe in a threaded parent
+    try:
+        limit_process(proc.pid)
+    except OSError:
+        # Already exited; wait4 below collects it
+        pass
+    readers = [
+        threading.Thread(target=_pump, args=(proc.stdout, "stdout", monitor), daemon=True),
+        threading.Thread(target=_pump, args=(proc.stderr, "stderr", monitor), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    reason = None
+    cpu_time = 0.0
+    while True:
+        if hasattr(os, "wait4"):
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        else:
+            pid, status, usage = (proc.pid, None, None) if proc.poll() is not None else (0, None, None)
+        if pid:
+            break
+        reason = monitor.check()
+        if reason:
+            proc.kill()
+            if hasattr(os, "wait4"):
+                pid, status, usage = os.wait4(proc.pid, 0)
+            else:
+                proc.wait()
+            break
+        time.sleep(POLL_INTERVAL)
+
+    if status is not None:
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        cpu_time = usage.ru_utime + usage.ru_stime
+    # Grandchildren may still hold the pipes; do not wait for them
+    for reader in readers:
+        reader.join(1.0)
+    return monitor.result(proc.returncode, cpu_time, reason or exit_reason(proc.returncode))
@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import numpy as np
+from typing import List, Dict, Any, Tuple, Optional, Set
+from tools.embedding_service import encode, encode_cached
+
+# === Configuration ===
+QUERY_PREFIX = "search_query: "
+DOCUMENT_PREFIX = "search_document: "
+MAX_FIELDS_IN_TEXT = 60
+
+
+def entry_to_text(item: Dict[str, Any]) -> str:
+    """
+    Build the text that represents one catalog entry in the vector index.
+
+    Args:
+        item (Dict[str, Any]): One entry of geo_metadata.json
+
+    Returns:
+        str: Filename, type, geometry, fields and description joined together
+    """
+    fields = item.get("fields") or []
+    return "\n".join([
+        f"File: {item.get('filename') or item['path']}",
+        f"Type: {item.get('type', '')} {item.get('geometry', '')}".strip(),
+        f"Fields: {', '.join(map(str, fields[:MAX_FIELDS_IN_TEXT]))}",
+        f"Description: {item.get('description', '')}",
+    ])
+
+
+class FileIndex:
+    """
+    Dense vector index over catalog entries used to shortlist files before
+    they are listed in the file search prompt.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature = None
+        self._version = None
+        self._vectors = None
+
+    @staticmethod
+    def _signature_of(texts: List[str]) -> str:
+        digest = hashlib.sha1()
+        for text in texts:
+            digest.update(text.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def build(self, entries: List[Dict[str, Any]], version: Any = None) -> None:
+        """
+        Embed the entries, skipping the work if they did not change since the last build.
+
+        Args:
+            entries (List[Dict[str, Any]]): Catalog entries to index
+            version (Any): Optional cheap identity of the entries (e.g. file stamp);
+                when it matches the last build the entries are not even re-read
+        """
+        if version is not None and version == self._version:
+            return
+        texts = [entry_to_text(item) for item in entries]
+        signature = self._signature_of(texts)
+        with self._lock:
+            if signature == self._signature:
+                self._version = version
+                return
+            self._vectors = encode_cached(texts, normalize=True, prefix=DOCUMENT_PREFIX)
+            self._signature = signature
+            self._version = version
+
+    def search(self, question: str, k: int, allowed: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Return the k entries closest to the question.
+
+        Args:
+            question (str): User's task description
+            k (int): Number of entries to return
+            allowed (Optional[Set[int]]): Restrict the search to these entry positions
+
+        Returns:
+            List[Tuple[int, float]]: (entry position, cosine similarity), best first
+        """
+        vectors = self._vectors
+        if vectors is None or len(vectors) == 0:
+            return []
+        query = encode([question], normalize=True, prefix=QUERY_PREFIX)
+        scores = vectors @ query[0]
+        if allowed is not None:
+            mask = np.full(len(scores), -np.inf, dtype=np.float32)
+            positions = [i for i in allowed if i < len(scores)]
+            mask[positions] = 0.0
+            scores = scores + mask
+            k = min(k, len(positions))
+            if k == 0:
+                return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
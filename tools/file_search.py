@@ -1,25 +1,73 @@
 import json
 import re
 import os
-from typing import List, Annotated
+from typing import List, Set, Annotated
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.prebuilt import InjectedState
-from langchain_openai import ChatOpenAI
 from prompts.tool_prompt_templates import FILE_SEARCH_PROMPT
-from config.model_config import get_model_config
-from langchain_core.messages.ai import AIMessage
-
-# === LLM config ===
-model_config = get_model_config()
-model = ChatOpenAI(
-    base_url=model_config['base_url'],
-    api_key=model_config['api_key'],
-    model_name=model_config['model_name'],
-    streaming=True)
+from config.llm_client import get_chat_model
+from tools.file_index import FileIndex
+from tools.geo_catalog import get_catalog, CatalogSnapshot
+from tools.spatial_index import Gazetteer, parse_bbox
+from tools.llm_cache import cached_invoke
+from tools.dataset_accel import accelerated_path
 
 # === Configuration ===
 METADATA_PATH = r"/home/kaiyuan/Project_K/data/geo_metadata.json"
+# Place name -> bbox lookup used to resolve regions named in the question (optional)
+GAZETTEER_PATH = r"/home/kaiyuan/Project_K/data/gazetteer.json"
+# Number of candidate files shown to the LLM after the embedding pre-filter
+FILE_SEARCH_TOP_K = 20
+# Below this best-match cosine similarity the shortlist is not trusted and the full catalog is listed
+FILE_SEARCH_MIN_SCORE = 0.35
+
+file_index = FileIndex()
+gazetteer = Gazetteer(GAZETTEER_PATH)
+
+
+def region_candidates(question: str, catalog: CatalogSnapshot, bbox: List[float] | None = None) -> Set[int] | None:
+    """
+    Positions of the catalog entries that cover the region of the task.
+
+    The region is the explicit bbox if given, else a "bbox: ..." in the question,
+    else the extents of place names found in the gazetteer. Returns None when
+    no region is known or when nothing in the catalog covers it.
+    """
+    if bbox and len(bbox) == 4:
+        regions = [bbox]
+    else:
+        explicit = parse_bbox(question)
+        regions = [explicit] if explicit else gazetteer.resolve(question)
+    if not regions:
+        return None
+
+    candidates = catalog.spatial_index.intersecting(regions)
+    if len(candidates) == len(catalog.entries) or not candidates - catalog.spatial_index.unbounded:
+        return None
+    return candidates
+
+
+def shortlist_metadata(question: str, catalog: CatalogSnapshot, top_k: int = FILE_SEARCH_TOP_K, allowed: Set[int] | None = None) -> str:
+    """
+    List the catalog entries most similar to the question as prompt text.
+
+    Only entries in `allowed` are considered when it is given. Falls back to
+    listing every considered entry when they are already few enough or when
+    the best match is below FILE_SEARCH_MIN_SCORE.
+    """
+    positions = sorted(allowed) if allowed is not None else range(len(catalog.entries))
+    full_listing = catalog.formatted if allowed is None else catalog.format_subset(positions)
+
+    if top_k <= 0 or len(positions) <= top_k:
+        return full_listing
+
+    file_index.build(catalog.entries, version=catalog.version)
+    hits = file_index.search(question, top_k, allowed=allowed)
+    if not hits or hits[0][1] < FILE_SEARCH_MIN_SCORE:
+        return full_listing
+
+    return catalog.format_subset([i for i, _ in hits if i < len(catalog.entries)])
 
 
 # === Output Schema ===
@@ -28,7 +76,8 @@ class FileMetadata(BaseModel):
     type: str
     geometry: str = ""
     fields: List[str]
-    features: int
+    features: int | None = Field(None, description="Feature count of a vector layer; None for rasters")
+    size: List[int] | None = Field(None, description="Raster width and height in pixels")
     crs: str = "Unknown"
     description: str
 
@@ -38,6 +87,7 @@ class FileSearchResult(BaseModel):
 # === Input Schema ===
 class FileSearchInput(BaseModel):
     question: str = Field(..., description="User's geospatial task request in natural language")
+    bbox: List[float] | None = Field(None, description="Optional area of interest as [min_lon, min_lat, max_lon, max_lat] in EPSG:4326")
 
 # === Tool Definition ===
 @tool(
@@ -50,33 +100,20 @@ def query_to_file(
     question: str,
     # state: Annotated[dict, InjectedState],
     # call_id: Annotated[str, InjectedToolCallId]
+    bbox: List[float] | None = None
 ) -> FileSearchResult:
     #print(f"🔍 [file_search] Entering semantic_file_search... Call ID: {call_id}")
 
-    with open(METADATA_PATH, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
-
-    formatted_metadata = "\n".join([
-        f"- File: {item['path']}\n"
-        f"  Type: {item['type']} ({item.get('geometry', '')})\n"
-        f"  Fields: {item['fields']}\n"
-        f"  Features/Size: {item['features']}\n"
-        f"  CRS: {item.get('crs', 'Unknown')}\n"
-        f"  Description: {item['description']}\n"
-        for item in metadata
-    ])
+    catalog = get_catalog(METADATA_PATH)
+    allowed = region_candidates(question, catalog, bbox)
+    formatted_metadata = shortlist_metadata(question, catalog, allowed=allowed)
 
     prompt = FILE_SEARCH_PROMPT.render(
         question=question,
         metadata=formatted_metadata
     )
 
-    response = model.invoke(prompt).content.strip()
-
-    if isinstance(response, AIMessage):
-        response = response.content or ""
-    elif not isinstance(response, str):
-        response = str(response or "")
+    response = cached_invoke(get_chat_model(), prompt, tool="file_search").strip()
 
     match = re.search(r"```Filepaths\s*\n(.*?)```", response, re.DOTALL)
     if match:
@@ -91,14 +128,17 @@ def query_to_file(
 
     matched_files = []
     for path in selected_paths:
-        match = next((item for item in metadata if item["path"] == path), None)
+        match = catalog.by_path.get(path) if isinstance(path, str) else None
         if match:
             matched_files.append(FileMetadata(
-                path=match["path"],
+                # Indexed GeoPackage / COG copy when one was made from the current file
+                path=accelerated_path(match) or match["path"],
                 type=match["type"],
                 geometry=match.get("geometry", ""),
                 fields=match["fields"],
-                features=match["features"],
+                # Catalogs built before raster entries had "size" kept "WxH pixels" here
+                features=match["features"] if isinstance(match.get("features"), int) else None,
+                size=match.get("size"),
                 crs=match.get("crs", "Unknown"),
                 description=match["description"]
             ))
@@ -0,0 +1,114 @@
+import os
+import json
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+from tools.spatial_index import SpatialIndex
+
+
+def _features_or_size(item: Dict[str, Any]) -> Any:
+    if item.get("size"):
+        width, height = item["size"]
+        return f"{width}x{height} pixels"
+    return item.get("features")
+
+
+def format_entry(item: Dict[str, Any]) -> str:
+    """Render one catalog entry the way FILE_SEARCH_PROMPT lists it."""
+    return (
+        f"- File: {item['path']}\n"
+        f"  Type: {item['type']} ({item.get('geometry', '')})\n"
+        f"  Fields: {item['fields']}\n"
+        f"  Features/Size: {_features_or_size(item)}\n"
+        f"  CRS: {item.get('crs', 'Unknown')}\n"
+        f"  Description: {item['description']}\n"
+    )
+
+
+class CatalogSnapshot:
+    """
+    One parsed version of geo_metadata.json.
+
+    Holds the entries, a path -> entry map (also keyed by accelerated copies)
+    and the prompt text of every entry.
+    A snapshot is never mutated, so callers can keep using it while the
+    catalog reloads a newer version.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], version: Any = None):
+        self.entries = entries
+        self.version = version
+        self.by_path: Dict[str, Dict[str, Any]] = {item["path"]: item for item in entries}
+        # Converted copies (tools.dataset_accel) resolve to the entry of their source
+        for item in entries:
+            if item.get("accelerated_path"):
+                self.by_path.setdefault(item["accelerated_path"], item)
+        self.formatted_entries: List[str] = [format_entry(item) for item in entries]
+        self.formatted: str = "\n".join(self.formatted_entries)
+        self._spatial_index: Optional[SpatialIndex] = None
+        self._spatial_index_lock = threading.Lock()
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """R-tree over the entries' bounding boxes, built once on first use."""
+        if self._spatial_index is None:
+            with self._spatial_index_lock:
+                if self._spatial_index is None:
+                    self._spatial_index = SpatialIndex(self.entries)
+        return self._spatial_index
+
+    def format_subset(self, positions: List[int]) -> str:
+        """Prompt text for the entries at the given positions."""
+        return "\n".join(self.formatted_entries[i] for i in positions)
+
+
+class GeoCatalog:
+    """
+    In-process cache of a metadata file that reloads only when the file's
+    mtime or size changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._snapshot: Optional[CatalogSnapshot] = None
+
+    def _current_stamp(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Return the current snapshot, reloading the file first if it changed on disk."""
+        stamp = self._current_stamp()
+        if stamp == self._stamp and self._snapshot is not None:
+            return self._snapshot
+
+        with self._lock:
+            stamp = self._current_stamp()
+            if stamp != self._stamp or self._snapshot is None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+                self._snapshot = CatalogSnapshot(entries, version=(self.path,) + stamp)
+                self._stamp = stamp
+            return self._snapshot
+
+
+_catalogs: Dict[str, GeoCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path: str) -> CatalogSnapshot:
+    """
+    Return the up-to-date catalog snapshot for a metadata file.
+
+    Args:
+        path (str): Path to a geo_metadata.json file
+
+    Returns:
+        CatalogSnapshot: Shared parsed catalog, reloaded if the file changed
+    """
+    catalog = _catalogs.get(path)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.setdefault(path, GeoCatalog(path))
+    return catalog.snapshot()
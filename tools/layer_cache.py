@@ -0,0 +1,241 @@
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+from tools.catalog_builder import stat_fingerprint
+
+# === Configuration ===
+# Budget of the opened-layer cache in each QGIS worker, counted as the size of the files on disk (0 disables)
+LAYER_CACHE_MB = float(os.environ.get("LAYER_CACHE_MB", "1024"))
+# Smaller files open fast enough that keeping them is not worth the memory
+LAYER_CACHE_MIN_MB = float(os.environ.get("LAYER_CACHE_MIN_MB", "1"))
+# Maximum number of layers kept per worker
+LAYER_CACHE_MAX_LAYERS = int(os.environ.get("LAYER_CACHE_MAX_LAYERS", "32"))
+# Providers whose layers are backed by a local file and can be shared between scripts
+CACHEABLE_PROVIDERS = {"QgsVectorLayer": "ogr", "QgsRasterLayer": "gdal"}
+# Layer and provider signals after which a cached layer is no longer what its file would open as
+CHANGE_SIGNALS = ("rendererChanged", "styleChanged", "crsChanged", "dataChanged", "subsetStringChanged",
+                  "beforeEditingStarted", "layerModified")
+
+Key = Tuple[str, str, str]
+
+
+def _sip():
+    try:
+        from qgis.PyQt import sip
+    except ImportError:
+        import sip
+    return sip
+
+
+def _state(layer: Any) -> Tuple:
+    """What a script can change on a layer without touching the file; a changed layer is not reused."""
+    state = [layer.crs().authid()]
+    if hasattr(layer, "subsetString"):
+        state += [layer.subsetString(), tuple(layer.fields().names())]
+    return tuple(state)
+
+
+class _Entry:
+    def __init__(self, layer: Any, fingerprint: Dict[str, int]):
+        self.layer = layer
+        self.fingerprint = fingerprint
+        self.state = _state(layer)
+        self.changed = False
+        self.sealed = False
+        signals = [getattr(layer, name, None) for name in CHANGE_SIGNALS]
+        provider = layer.dataProvider()
+        if provider is not None:
+            # Writes through dataProvider() bypass the layer's edit buffer
+            signals.append(getattr(provider, "dataChanged", None))
+        for signal in signals:
+            if signal is not None:
+                signal.connect(self._mark_changed)
+
+    def _mark_changed(self, *args: Any) -> None:
+        self.changed = True
+
+    def seal(self) -> None:
+        """Make a kept vector layer read-only, so later scripts cannot edit the shared layer."""
+        if not self.sealed and hasattr(self.layer, "setReadOnly"):
+            self.layer.setReadOnly(True)
+        self.sealed = True
+
+    def modified(self) -> bool:
+        layer = self.layer
+        if self.changed or _state(layer) != self.state:
+            return True
+        return self.sealed and hasattr(layer, "isReadOnly") and not layer.isReadOnly()
+
+
+class LayerCache:
+    """
+    Opened QgsVectorLayer / QgsRasterLayer objects kept across scripts in a worker.
+
+    install() replaces the two constructors in qgis.core, so a script that
+    opens a file layer (ogr or gdal provider, no options) gets the layer a
+    previous script already opened: the provider has parsed the file, its
+    schema, extent and GDAL block cache are warm. Within one script each
+    cached layer is handed out once; opening the same path again builds a
+    separate layer.
+
+    The script that first opens a file gets a writable layer; once kept,
+    vector layers are read-only, so a later script's startEditing() fails
+    instead of changing the layer every following script shares. A script
+    that must edit a file it did not create in the same run passes
+    QgsVectorLayer.LayerOptions() and gets a layer of its own.
+
+    Between scripts the cached layers are registered in QgsProject.instance(),
+    where Processing resolves an "INPUT" given as a file path to the already
+    open layer instead of loading it again. end_task() takes them back before
+    the project is cleared and drops every layer that the script edited,
+    filtered, re-projected, restyled or deleted, wrote to through its
+    provider, or whose file (with its sidecars) changed on disk. Beyond `budget_mb` of file size or `max_layers`, the
+    least recently used are dropped.
+    """
+
+    def __init__(self, budget_mb: float = LAYER_CACHE_MB, min_mb: float = LAYER_CACHE_MIN_MB,
+                 max_layers: int = LAYER_CACHE_MAX_LAYERS):
+        self.budget = budget_mb * 1024 * 1024
+        self.min_size = min_mb * 1024 * 1024
+        self.max_layers = max_layers
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self._handed_out: Set[Key] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0 and self.max_layers > 0
+
+    def install(self) -> None:
+        """Route QgsVectorLayer(...) / QgsRasterLayer(...) in qgis.core through the cache."""
+        if not self.enabled:
+            return
+        import qgis.core
+
+        for name in CACHEABLE_PROVIDERS:
+            setattr(qgis.core, name, self._proxy(getattr(qgis.core, name)))
+
+    def _proxy(self, real: type) -> type:
+        cache = self
+
+        class _CachedLayer(type):
+            def __call__(cls, *args, **kwargs):
+                return cache.open(real, args, kwargs)
+
+            def __getattr__(cls, name):
+                return getattr(real, name)
+
+            def __instancecheck__(cls, obj):
+                return isinstance(obj, real)
+
+            def __subclasscheck__(cls, subclass):
+                return issubclass(subclass, real)
+
+        return _CachedLayer(real.__name__, (), {})
+
+    @staticmethod
+    def _key(real: type, args: tuple, kwargs: dict) -> Optional[Key]:
+        if len(args) > 3 or "options" in kwargs:
+            return None
+        source = args[0] if args else kwargs.get("path", kwargs.get("uri"))
+        provider = args[2] if len(args) > 2 else kwargs.get("providerLib", kwargs.get("providerType"))
+        if provider is None:
+            provider = CACHEABLE_PROVIDERS[real.__name__]
+        if provider != CACHEABLE_PROVIDERS[real.__name__] or not isinstance(source, str):
+            return None
+        path, sep, rest = source.partition("|")
+        if not os.path.isfile(path):
+            return None
+        return real.__name__, os.path.abspath(path) + sep + rest, provider
+
+    @staticmethod
+    def _fingerprint(key: Key) -> Optional[Dict[str, int]]:
+        try:
+            return stat_fingerprint(key[1].partition("|")[0])
+        except OSError:
+            return None
+
+    def open(self, real: type, args: tuple, kwargs: dict) -> Any:
+        key = self._key(real, args, kwargs)
+        if key is None or key in self._handed_out:
+            return real(*args, **kwargs)
+        fingerprint = self._fingerprint(key)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if fingerprint == entry.fingerprint and not _sip().isdeleted(entry.layer):
+                self._entries.move_to_end(key)
+                self._handed_out.add(key)
+                self.hits += 1
+                name = args[1] if len(args) > 1 else kwargs.get("baseName")
+                if name is not None:
+                    entry.layer.setName(name)
+                return entry.layer
+            self._discard(key)
+        self.misses += 1
+        layer = real(*args, **kwargs)
+        if fingerprint is not None and fingerprint["size"] >= self.min_size and layer.isValid():
+            self._entries[key] = _Entry(layer, fingerprint)
+            self._handed_out.add(key)
+        return layer
+
+    def _discard(self, key: Key) -> None:
+        entry = self._entries.pop(key)
+        if _sip().isdeleted(entry.layer):
+            return
+        from qgis.core import QgsProject
+
+        project = QgsProject.instance()
+        if project.mapLayer(entry.layer.id()) is not None:
+            # Owned by the project; removing it deletes it
+            project.removeMapLayer(entry.layer.id())
+
+    def begin_task(self) -> None:
+        """Drop layers whose file changed and register the rest with the project for Processing."""
+        if not self._entries:
+            return
+        from qgis.core import QgsProject
+
+        for key, entry in list(self._entries.items()):
+            if (_sip().isdeleted(entry.layer) or entry.modified()
+                    or self._fingerprint(key) != entry.fingerprint):
+                self._discard(key)
+        QgsProject.instance().addMapLayers([entry.layer for entry in self._entries.values()], False)
+
+    def end_task(self) -> None:
+        """Take the layers back from the project and keep only those the script left untouched."""
+        self._handed_out.clear()
+        if not self._entries:
+            return
+        from qgis.core import QgsProject
+
+        project = QgsProject.instance()
+        sip = _sip()
+        for key, entry in list(self._entries.items()):
+            layer = entry.layer
+            if sip.isdeleted(layer):
+                del self._entries[key]
+                continue
+            if project.mapLayer(layer.id()) is not None:
+                project.takeMapLayer(layer)
+            if hasattr(layer, "isEditable") and layer.isEditable():
+                layer.rollBack()
+                del self._entries[key]
+            elif entry.modified() or self._fingerprint(key) != entry.fingerprint:
+                del self._entries[key]
+            else:
+                if hasattr(layer, "removeSelection"):
+                    layer.removeSelection()
+                entry.seal()
+        total = sum(entry.fingerprint["size"] for entry in self._entries.values())
+        while self._entries and (total > self.budget or len(self._entries) > self.max_layers):
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.fingerprint["size"]
+
+    def reset(self) -> None:
+        """Forget every layer (e.g. after an error left the project in an unknown state)."""
+        self._entries.clear()
+        self._handed_out.clear()
+
+
+layer_cache = LayerCache()
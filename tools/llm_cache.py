@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+from langchain_core.messages.ai import AIMessage
+
+# === Configuration ===
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", r"/home/kaiyuan/lu2025-17-15/Kaiyuan/sp_group/cache/llm_cache.sqlite")
+# Seconds a cached response stays valid
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Maximum number of cached responses; least recently used are evicted first
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "50000"))
+# Per-tool switches; LLM_CACHE_DISABLE="code_runner,debug_care" turns tools off, "all" disables the cache
+LLM_CACHE_TOOLS: Dict[str, bool] = {
+    "file_search": True,
+    "code_runner": True,
+    "debug_care": True,
+    "eval_doctor": True,
+}
+_disabled = {name.strip() for name in os.environ.get("LLM_CACHE_DISABLE", "").split(",") if name.strip()}
+for _name in LLM_CACHE_TOOLS:
+    if "all" in _disabled or _name in _disabled:
+        LLM_CACHE_TOOLS[_name] = False
+
+# Sampling parameters that change the response and therefore belong in the key
+_KEY_PARAMS = ("temperature", "top_p", "max_tokens", "seed", "frequency_penalty", "presence_penalty", "stop")
+
+
+def response_text(raw_output: Any) -> str:
+    """Plain text of a model response (AIMessage, str or anything else)."""
+    if isinstance(raw_output, AIMessage):
+        return raw_output.content or ""
+    if not isinstance(raw_output, str):
+        return str(raw_output or "")
+    return raw_output
+
+
+class LLMResponseCache:
+    """
+    Content-addressed store of LLM responses in SQLite.
+
+    The key is a hash of the model name, its sampling parameters and the
+    rendered prompt. Entries expire after `ttl` seconds; beyond `max_entries`
+    the least recently used are evicted. Hit/miss counters are kept per tool.
+    """
+
+    def __init__(self, path: str, ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, tool TEXT, response TEXT NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def key(model: Any, prompt: str) -> str:
+        params = {name: getattr(model, name, None) for name in _KEY_PARAMS}
+        payload = json.dumps(
+            {"model": getattr(model, "model_name", None) or str(model), "params": params, "prompt": prompt},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, tool: str, outcome: str) -> None:
+        counters = self.stats.setdefault(tool, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def get(self, key: str, tool: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self._count(tool, "misses")
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._count(tool, "hits")
+            return row[0]
+
+    def put(self, key: str, tool: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, tool, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, tool, response, now, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            conn.commit()
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+llm_cache = LLMResponseCache(LLM_CACHE_PATH)
+
+
+def cached_invoke(model: Any, prompt: str, tool: str) -> str:
+    """
+    model.invoke(prompt) through the response cache.
+
+    Args:
+        model (Any): Chat model (e.g. ChatOpenAI)
+        prompt (str): Fully rendered prompt
+        tool (str): Calling tool; selects the LLM_CACHE_TOOLS switch and the stats bucket
+
+    Returns:
+        str: Response text, from the cache when an identical request was answered before
+    """
+    if not LLM_CACHE_TOOLS.get(tool, False):
+        return response_text(model.invoke(prompt))
+
+    key = LLMResponseCache.key(model, prompt)
+    cached = llm_cache.get(key, tool)
+    if cached is not None:
+        return cached
+
+    response = response_text(model.invoke(prompt))
+    if response:
+        llm_cache.put(key, tool, response)
+    return response
+
+
+def invalidate(model: Any, prompt: str) -> None:
+    """Forget the cached response for this request, e.g. because it turned out to be unusable."""
+    llm_cache.invalidate(LLMResponseCache.key(model, prompt))
@@ -0,0 +1,298 @@
+import os
+import ast
+from typing import Any, Dict, Iterable, List, Optional, Set
+from pydantic import BaseModel, Field
+from tools.catalog_builder import VECTOR_EXTENSIONS, RASTER_EXTENSIONS
+from tools.geo_catalog import CatalogSnapshot
+
+# === Configuration ===
+# Extensions of files a script may read as input data
+DATA_EXTENSIONS = VECTOR_EXTENSIONS | RASTER_EXTENSIONS
+# Extensions that mark a string as a written file when it appears in an output position
+OUTPUT_EXTENSIONS = DATA_EXTENSIONS | {".csv", ".json", ".txt", ".png", ".html", ".xlsx"}
+# Assignment targets whose string value is treated as an output path
+OUTPUT_NAME_HINTS = ("out", "result", "save", "dest", "export")
+# Processing parameters holding a field name, and the parameter holding the layer it belongs to
+FIELD_PARAMETERS = {"FIELD": "INPUT", "JOIN_FIELD": "JOIN", "FIELDS_TO_COPY": "JOIN"}
+# Processing parameters that name a field the algorithm creates
+NEW_FIELD_PARAMETERS = ("FIELD_NAME", "OUTPUT_FIELD", "PREFIX")
+# Methods whose first argument is a field name of the layer/feature they are called on
+FIELD_METHODS_ON_FEATURE = ("attribute",)
+FIELD_METHODS_ON_FIELDS = ("indexOf", "indexFromName", "lookupField", "field")
+FIELD_METHODS_ON_LAYER = ("fieldNameIndex",)
+# Methods that write to the path at the given positional argument (open() counts when its mode writes)
+WRITER_METHODS = {"writeAsVectorFormat": 1, "writeAsVectorFormatV2": 1, "writeAsVectorFormatV3": 1, "to_file": 0, "to_csv": 0}
+
+
+class PreflightIssue(BaseModel):
+    kind: str = Field(..., description="syntax, unknown_input, unknown_field or output_outside_result_dir")
+    message: str
+    line: int | None = None
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.realpath(path))
+
+
+def _is_under(path: str, directory: str) -> bool:
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:
+        return False
+
+
+def _str(node: Optional[ast.AST]) -> Optional[str]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def _ext(path: str) -> str:
+    return os.path.splitext(path.split("|")[0])[1].lower()
+
+
+class _ScriptFacts(ast.NodeVisitor):
+    """Collects path strings, layer/feature variables and field references from a script."""
+
+    def __init__(self):
+        # Simple `name = "literal"` assignments (last one wins; flow is ignored)
+        self.constants: Dict[str, str] = {}
+        # variable -> data path, for `layer = QgsVectorLayer(path, ...)`
+        self.layers: Dict[str, str] = {}
+        # variable -> layer variable, for `for feature in layer.getFeatures()`
+        self.features: Dict[str, str] = {}
+        self.outputs: List[ast.Constant] = []
+        self.created_fields: Set[str] = set()
+        # (layer variable or path, field name, node)
+        self.field_refs: List[tuple] = []
+
+    # --- helpers ---
+    def resolve(self, node: Optional[ast.AST]) -> Optional[str]:
+        value = _str(node)
+        if value is None and isinstance(node, ast.Name):
+            value = self.constants.get(node.id)
+        return value
+
+    def layer_of(self, node: Optional[ast.AST]) -> Optional[str]:
+        """Data path behind a layer variable or a path given directly."""
+        if isinstance(node, ast.Name) and node.id in self.layers:
+            return self.layers[node.id]
+        value = self.resolve(node)
+        return value if value and _ext(value) in VECTOR_EXTENSIONS else None
+
+    def mark_output(self, node: Optional[ast.AST]) -> None:
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            self.outputs.append(node)
+        elif isinstance(node, ast.Name):
+            for assigned in self._assigned_nodes.get(node.id, []):
+                self.outputs.append(assigned)
+
+    # --- visitors ---
+    def collect(self, tree: ast.AST) -> None:
+        self._assigned_nodes: Dict[str, List[ast.Constant]] = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                name = node.targets[0].id
+                value = _str(node.value)
+                if value is not None:
+                    self.constants[name] = value
+                    self._assigned_nodes.setdefault(name, []).append(node.value)
+                    if any(hint in name.lower() for hint in OUTPUT_NAME_HINTS) and _ext(value) in OUTPUT_EXTENSIONS:
+                        self.outputs.append(node.value)
+        self.visit(tree)
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) and isinstance(node.value, ast.Call):
+            func = node.value.func
+            name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else ""
+            if name == "QgsVectorLayer" and node.value.args:
+                path = self.resolve(node.value.args[0])
+                if path:
+                    self.layers[node.targets[0].id] = path
+        self.generic_visit(node)
+
+    def _bind_features(self, target: ast.AST, iterable: ast.AST) -> None:
+        if (
+            isinstance(target, ast.Name)
+            and isinstance(iterable, ast.Call)
+            and isinstance(iterable.func, ast.Attribute)
+            and iterable.func.attr in ("getFeatures", "selectedFeatures")
+            and isinstance(iterable.func.value, ast.Name)
+            and iterable.func.value.id in self.layers
+        ):
+            self.features[target.id] = iterable.func.value.id
+
+    def visit_For(self, node: ast.For) -> None:
+        self._bind_features(node.target, node.iter)
+        self.generic_visit(node)
+
+    def visit_ListComp(self, node: ast.ListComp) -> None:
+        # Bind the loop variables before the element expression is visited
+        for generator in node.generators:
+            self._bind_features(generator.target, generator.iter)
+        self.generic_visit(node)
+
+    visit_SetComp = visit_GeneratorExp = visit_DictComp = visit_ListComp
+
+    def visit_Subscript(self, node: ast.Subscript) -> None:
+        field = _str(node.slice)
+        if field is not None and isinstance(node.value, ast.Name) and node.value.id in self.features:
+            self.field_refs.append((self.features[node.value.id], field, node))
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        func = node.func
+        if isinstance(func, ast.Attribute):
+            field = _str(node.args[0]) if node.args else None
+            owner = func.value
+            if field is not None:
+                if func.attr in FIELD_METHODS_ON_FEATURE and isinstance(owner, ast.Name) and owner.id in self.features:
+                    self.field_refs.append((self.features[owner.id], field, node))
+                elif func.attr in FIELD_METHODS_ON_LAYER and isinstance(owner, ast.Name) and owner.id in self.layers:
+                    self.field_refs.append((owner.id, field, node))
+                elif (
+                    func.attr in FIELD_METHODS_ON_FIELDS
+                    and isinstance(owner, ast.Call)
+                    and isinstance(owner.func, ast.Attribute)
+                    and owner.func.attr == "fields"
+                    and isinstance(owner.func.value, ast.Name)
+                    and owner.func.value.id in self.layers
+                ):
+                    self.field_refs.append((owner.func.value.id, field, node))
+            position = WRITER_METHODS.get(func.attr)
+            if position is not None and len(node.args) > position:
+                self.mark_output(node.args[position])
+        name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else ""
+        if name == "QgsField" and node.args and _str(node.args[0]):
+            self.created_fields.add(_str(node.args[0]))
+        if isinstance(func, ast.Name) and func.id == "open" and node.args:
+            mode = _str(node.args[1]) if len(node.args) > 1 else _str(next((k.value for k in node.keywords if k.arg == "mode"), None))
+            if mode and any(m in mode for m in "wax"):
+                self.mark_output(node.args[0])
+        self.generic_visit(node)
+
+    def visit_Dict(self, node: ast.Dict) -> None:
+        params = {_str(key): value for key, value in zip(node.keys, node.values) if _str(key)}
+        if "OUTPUT" in params:
+            self.mark_output(params["OUTPUT"])
+        for key in NEW_FIELD_PARAMETERS:
+            if _str(params.get(key)):
+                self.created_fields.add(_str(params[key]))
+        for key, layer_key in FIELD_PARAMETERS.items():
+            if key not in params or layer_key not in params:
+                continue
+            layer = params[layer_key]
+            owner = layer.id if isinstance(layer, ast.Name) and layer.id in self.layers else self.layer_of(layer)
+            if owner is None:
+                continue
+            values = params[key].elts if isinstance(params[key], (ast.List, ast.Tuple)) else [params[key]]
+            for value in values:
+                if _str(value) is not None:
+                    self.field_refs.append((owner, _str(value), value))
+        self.generic_visit(node)
+
+
+def check_script(
+    code: str,
+    filepaths: Iterable[str],
+    output_dir: str,
+    catalog: Optional[CatalogSnapshot] = None,
+) -> List[PreflightIssue]:
+    """
+    Static checks of a generated script, run before it is executed.
+
+    Reports syntax errors, absolute data paths that are neither provided
+    input files nor catalog entries, absolute output paths outside
+    `output_dir`, and field names
+    used on a layer loaded from an input file that the catalog does not list
+    for that file. Only what can be read from literals is checked, so a
+    script that passes may still fail at run time.
+
+    Args:
+        code (str): Generated script
+        filepaths (Iterable[str]): Input files the script was given
+        output_dir (str): Directory outputs must be written to
+        catalog (Optional[CatalogSnapshot]): Catalog metadata for the input and field checks
+
+    Returns:
+        List[PreflightIssue]: Problems found; empty if the script may run
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [PreflightIssue(kind="syntax", message=f"{e.msg}: {(e.text or '').strip()}", line=e.lineno)]
+
+    facts = _ScriptFacts()
+    facts.collect(tree)
+    issues: List[PreflightIssue] = []
+    output_root = _norm(output_dir)
+    inputs = {_norm(path): path for path in filepaths}
+    catalog_paths = {_norm(path) for path in catalog.by_path} if catalog is not None else set()
+
+    output_nodes = {id(node) for node in facts.outputs}
+    for node in facts.outputs:
+        path = node.value
+        if not path or path.startswith(("memory:", "TEMPORARY_OUTPUT", "ogr:")) or _ext(path) not in OUTPUT_EXTENSIONS:
+            continue
+        # Relative names are usually file names joined onto the output directory at run time
+        if not os.path.isabs(path):
+            continue
+        if not _is_under(_norm(path), output_root):
+            issues.append(PreflightIssue(
+                kind="output_outside_result_dir",
+                message=f"Output '{path}' is outside the result directory {output_dir}",
+                line=node.lineno,
+            ))
+
+    reported: Set[str] = set()
+    for node in ast.walk(tree):
+        path = _str(node)
+        if path is None or id(node) in output_nodes or _ext(path) not in DATA_EXTENSIONS:
+            continue
+        # Relative names are usually output file names joined onto a directory
+        if not os.path.isabs(path.split("|")[0]) or path in reported:
+            continue
+        normalized = _norm(path.split("|")[0])
+        if normalized in inputs or normalized in catalog_paths or _is_under(normalized, output_root):
+            continue
+        reported.add(path)
+        issues.append(PreflightIssue(
+            kind="unknown_input",
+            message=f"'{path}' is not one of the provided input files: {sorted(inputs.values())}",
+            line=node.lineno,
+        ))
+
+    if catalog is not None:
+        issues.extend(_field_issues(facts, catalog))
+    return issues
+
+
+def _field_issues(facts: _ScriptFacts, catalog: CatalogSnapshot) -> List[PreflightIssue]:
+    by_path = {_norm(path): item for path, item in catalog.by_path.items()}
+    created = {name.lower() for name in facts.created_fields}
+    issues: List[PreflightIssue] = []
+    seen: Set[tuple] = set()
+    for owner, field, node in facts.field_refs:
+        path = facts.layers.get(owner, owner)
+        entry: Optional[Dict[str, Any]] = by_path.get(_norm(path.split("|")[0]))
+        if not entry or entry.get("type") != "vector" or not entry.get("fields"):
+            continue
+        known = {name.lower() for name in entry["fields"]}
+        if field.lower() in known or field.lower() in created or (path, field) in seen:
+            continue
+        seen.add((path, field))
+        issues.append(PreflightIssue(
+            kind="unknown_field",
+            message=f"Field '{field}' does not exist in {os.path.basename(path)}; available fields: {entry['fields']}",
+            line=getattr(node, "lineno", None),
+        ))
+    return issues
+
+
+def format_issues(issues: List[PreflightIssue]) -> str:
+    """stderr text for a script rejected by the pre-flight check."""
+    lines = ["[Preflight] Script was not executed:"]
+    for issue in issues:
+        location = f"line {issue.line}: " if issue.line else ""
+        lines.append(f"  - {issue.kind}: {location}{issue.message}")
+    return "\n".join(lines)
@@ -0,0 +1,451 @@
+import os
+import sys
+import json
+import codecs
+import runpy
+import atexit
+import select
+import tempfile
+import threading
+import traceback
+import subprocess
+from typing import Dict, List, Optional, Tuple
+from tools.execution_monitor import (
+    POLL_INTERVAL, ExecutionMonitor, ScriptResult, exit_reason, limit_process, restore_limits, run_subprocess,
+)
+from tools.layer_cache import layer_cache
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# === Configuration ===
+# Interpreter with PyQGIS, used for the workers and for the subprocess fallback
+QGIS_PYTHON = os.environ.get("QGIS_PYTHON", "python")
+# Number of warm PyQGIS worker processes; 0 runs every script in a fresh `python` subprocess
+QGIS_WORKERS = int(os.environ.get("QGIS_WORKERS", "2"))
+# A worker is replaced after this many scripts, so leaks in QGIS or in scripts cannot pile up
+QGIS_WORKER_MAX_TASKS = int(os.environ.get("QGIS_WORKER_MAX_TASKS", "25"))
+# Seconds a new worker may take to start QgsApplication and Processing
+QGIS_WORKER_INIT_TIMEOUT = float(os.environ.get("QGIS_WORKER_INIT_TIMEOUT", "120"))
+# Repository root; workers run `python -m tools.qgis_workers` from here
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# === Worker process ===
+
+def _init_qgis():
+    """Start QgsApplication once and make the calls generated scripts use for setup harmless."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import qgis.core
+    from qgis.core import QgsApplication
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    try:
+        from processing.core.Processing import Processing
+        Processing.initialize()
+    except Exception:
+        # Scripts that need Processing import and initialize it themselves
+        pass
+
+    # Scripts call QgsApplication(...), initQgis() and exitQgis() as if they owned the process
+    QgsApplication.initQgis = staticmethod(lambda *args: None)
+    QgsApplication.exitQgis = staticmethod(lambda *args: None)
+
+    class _SharedApplication(type):
+        def __call__(cls, *args, **kwargs):
+            return app
+
+        def __getattr__(cls, name):
+            return getattr(QgsApplication, name)
+
+    qgis.core.QgsApplication = _SharedApplication("QgsApplication", (), {})
+    # Layers opened by one script stay open for the next ones
+    layer_cache.install()
+    return app
+
+
+def _reset_qgis() -> None:
+    try:
+        layer_cache.end_task()
+    except Exception:
+        layer_cache.reset()
+    try:
+        from qgis.core import QgsProject
+        QgsProject.instance().clear()
+    except Exception:
+        pass
+
+
+def _exec_script(script_path: str, stdout_path: str, stderr_path: str, cwd: str, env: Dict[str, str]) -> int:
+    """Run a script in a fresh __main__ namespace with fds 1/2 redirected to the given files."""
+    saved_fds = os.dup(1), os.dup(2)
+    saved_env, saved_path, saved_argv = dict(os.environ), list(sys.path), list(sys.argv)
+    returncode = 0
+    with open(stdout_path, "wb", buffering=0) as out, open(stderr_path, "wb", buffering=0) as err:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        try:
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(env)
+            sys.argv = [script_path]
+            sys.path.insert(0, os.path.dirname(os.path.abspath(script_path)))
+            runpy.run_path(script_path, run_name="__main__")
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                returncode = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            for fd in saved_fds:
+                os.close(fd)
+            os.environ.clear()
+            os.environ.update(saved_env)
+            sys.path[:] = saved_path
+            sys.argv = saved_argv
+            _reset_qgis()
+    return returncode
+
+
+def _cpu_seconds() -> float:
+    """CPU time of this process and its finished children (scripts may start subprocesses)."""
+    if resource is None:
+        return 0.0
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _worker_main() -> None:
+    """Serve run requests read as JSON lines from stdin; replies go to the original stdout."""
+    # Keep the control channel away from fd 1, which QGIS and the scripts write to
+    control = os.fdopen(os.dup(1), "w", buffering=1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+
+    def reply(*message) -> None:
+        control.write(json.dumps(message) + "\n")
+
+    try:
+        _init_qgis()
+    except BaseException as e:
+        reply("failed", f"{type(e).__name__}: {e}")
+        return
+    reply("ready", os.getpid())
+    home = os.getcwd()
+    for line in sys.stdin:
+        message = json.loads(line)
+        if message[0] == "stop":
+            return
+        _, script_path, stdout_path, stderr_path, cwd, env = message
+        cpu_before = _cpu_seconds()
+        try:
+            layer_cache.begin_task()
+        except Exception:
+            layer_cache.reset()
+        returncode = _exec_script(script_path, stdout_path, stderr_path, cwd, env)
+        os.dup2(devnull, 1)
+        os.chdir(home)
+        reply("done", returncode, _cpu_seconds() - cpu_before)
+
+
+# === Parent side ===
+
+class _Tail:
+    """Reads what a worker has appended to one of its output files since the last call."""
+
+    def __init__(self, path: str, stream: str):
+        self.path = path
+        self.stream = stream
+        self.offset = 0
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def read(self, monitor: ExecutionMonitor, final: bool = False) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            data = b""
+        self.offset += len(data)
+        monitor.feed(self.stream, self.decoder.decode(data, final=final))
+
+
+class _Worker:
+    def __init__(self, python: str):
+        self.process = subprocess.Popen(
+            [python, "-m", "tools.qgis_workers", "--worker"],
+            cwd=REPO_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env={**os.environ, "QT_QPA_PLATFORM": "offscreen", "PYTHONUNBUFFERED": "1"},
+        )
+        self.tasks = 0
+        self.ready = False
+        self.error: Optional[str] = None
+
+    def _send(self, *message) -> None:
+        self.process.stdin.write(json.dumps(message) + "\n")
+        self.process.stdin.flush()
+
+    def _receive(self, timeout: Optional[float]) -> Optional[list]:
+        """Next reply, or None on timeout. Raises EOFError if the worker died."""
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            return None
+        line = self.process.stdout.readline()
+        if not line:
+            raise EOFError
+        return json.loads(line)
+
+    def wait_ready(self, timeout: float) -> bool:
+        if self.ready:
+            return True
+        if self.error is None:
+            try:
+                message = self._receive(timeout)
+                if message is None:
+                    self.error = f"did not start within {timeout:.0f}s"
+                elif message[0] == "ready":
+                    self.ready = True
+                else:
+                    self.error = message[1]
+            except (EOFError, OSError, ValueError):
+                self.error = f"exited during startup (exit code {self.process.poll()})"
+        return self.ready
+
+    def run(self, script_path: str, timeout: float, cwd: str, env: Dict[str, str],
+            cancel: Optional[threading.Event] = None) -> Tuple[ScriptResult, bool]:
+        """
+        Run one script under an ExecutionMonitor, tailing its output files.
+        Returns the result and whether the worker can be reused.
+
+        The CPU/memory rlimits are set on the worker for this script only and
+        put back once it has finished; a worker whose script ran out of
+        memory is not reused.
+        """
+        fd_out, stdout_path = tempfile.mkstemp(suffix=".out")
+        fd_err, stderr_path = tempfile.mkstemp(suffix=".err")
+        os.close(fd_out)
+        os.close(fd_err)
+        self.tasks += 1
+        monitor = ExecutionMonitor(timeout, cancel=cancel)
+        tails = [_Tail(stdout_path, "stdout"), _Tail(stderr_path, "stderr")]
+        message, reason = None, None
+        limits = {}
+        try:
+            try:
+                limits = limit_process(self.process.pid)
+                self._send("run", os.path.abspath(script_path), stdout_path, stderr_path, cwd, env)
+                while message is None:
+                    message = self._receive(POLL_INTERVAL)
+                    for tail in tails:
+                        tail.read(monitor)
+                    if message is None:
+                        reason = monitor.check()
+                        if reason:
+                            self.kill()
+                            break
+            except (EOFError, OSError, ValueError):
+                message = None
+            for tail in tails:
+                tail.read(monitor, final=True)
+
+            if message is not None:
+                restore_limits(self.process.pid, limits)
+                result = monitor.result(message[1], message[2], None)
+                # The allocation that failed may have left QGIS or GDAL half-initialized
+                return result, "MemoryError" not in result.stderr
+            if reason is None:
+                returncode = self.process.wait(5)
+                reason = exit_reason(returncode) or "crash"
+                return monitor.result(returncode, 0.0, reason), False
+            return monitor.result(None, 0.0, reason), False
+        finally:
+            for path in (stdout_path, stderr_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stop(self) -> None:
+        try:
+            self._send("stop")
+            self.process.stdin.close()
+            self.process.wait(5)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill(self) -> None:
+        self.process.kill()
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class QgisWorkerPool:
+    """
+    Long-lived worker processes with QgsApplication already initialized.
+
+    Each script runs in a fresh __main__ namespace (runpy) with its own
+    stdout/stderr, working directory and environment; the QGIS project is
+    cleared afterwards. A worker is killed when a script exceeds its timeout
+    and replaced when it crashes or after `max_tasks` scripts. If workers
+    cannot start (e.g. qgis is not importable) the pool disables itself and
+    run() returns None so callers fall back to a subprocess.
+    """
+
+    def __init__(self, size: int = QGIS_WORKERS, max_tasks: int = QGIS_WORKER_MAX_TASKS,
+                 init_timeout: float = QGIS_WORKER_INIT_TIMEOUT, python: str = QGIS_PYTHON):
+        self.size = size
+        self.python = python
+        self.max_tasks = max_tasks
+        self.init_timeout = init_timeout
+        self.disabled_reason: Optional[str] = None if size > 0 else "QGIS_WORKERS=0"
+        self._cond = threading.Condition()
+        self._idle: List[_Worker] = []
+        self._count = 0
+        atexit.register(self.shutdown)
+
+    @property
+    def available(self) -> bool:
+        return self.disabled_reason is None
+
+    def _spawn(self) -> None:
+        # Called with self._cond held
+        self._idle.append(_Worker(self.python))
+        self._count += 1
+
+    def start(self) -> None:
+        """Start the workers now so their QGIS start-up overlaps with other work."""
+        with self._cond:
+            while self.available and self._count < self.size:
+                self._spawn()
+
+    def _acquire(self, cancel: Optional[threading.Event] = None) -> Optional[_Worker]:
+        with self._cond:
+            while self.available and not (cancel is not None and cancel.is_set()):
+                if self._idle:
+                    return self._idle.pop()
+                if self._count < self.size:
+                    self._spawn()
+                    continue
+                self._cond.wait(POLL_INTERVAL if cancel is not None else None)
+        return None
+
+    def _retire(self, worker: _Worker) -> None:
+        threading.Thread(target=worker.stop, daemon=True).start()
+        with self._cond:
+            self._count -= 1
+            if self.available:
+                # Keep a warm replacement ready for the next script
+                self._spawn()
+            self._cond.notify()
+
+    def _release(self, worker: _Worker, reusable: bool) -> None:
+        if not reusable or worker.tasks >= self.max_tasks:
+            self._retire(worker)
+            return
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def _disable(self, reason: str) -> None:
+        print(f"[qgis_workers] Worker pool disabled, using subprocesses: {reason}", file=sys.stderr)
+        with self._cond:
+            self.disabled_reason = reason
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._cond.notify_all()
+        for worker in idle:
+            worker.kill()
+
+    def run(self, script_path: str, timeout: float, cwd: Optional[str] = None,
+            env: Optional[Dict[str, str]] = None, cancel: Optional[threading.Event] = None) -> Optional[ScriptResult]:
+        """
+        Run a script in a warm worker.
+
+        Args:
+            script_path (str): Python file to execute as __main__
+            timeout (float): Seconds before the worker is killed
+            cwd (Optional[str]): Working directory (defaults to the current one)
+            env (Optional[Dict[str, str]]): Environment (defaults to os.environ)
+            cancel (Optional[threading.Event]): Stops the script (or the wait for a worker) when set
+
+        Returns:
+            Optional[ScriptResult]: None if the pool is unavailable or `cancel` was set before a worker was free
+        """
+        worker = self._acquire(cancel)
+        if worker is None:
+            return None
+        if not worker.wait_ready(self.init_timeout):
+            with self._cond:
+                self._count -= 1
+            worker.kill()
+            self._disable(worker.error or "worker failed to start")
+            return None
+        result, reusable = worker.run(
+            script_path, timeout, cwd or os.getcwd(), dict(env if env is not None else os.environ), cancel
+        )
+        self._release(worker, reusable)
+        return result
+
+    def shutdown(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+        for worker in idle:
+            worker.stop()
+
+
+qgis_pool = QgisWorkerPool()
+
+
+def run_script(script_path: str, timeout: float, env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None,
+               cancel: Optional[threading.Event] = None) -> ScriptResult:
+    """
+    Run a generated PyQGIS script, in a warm worker when possible.
+
+    Falls back to a fresh `python` subprocess when the worker pool is disabled
+    or cannot start.
+
+    Args:
+        script_path (str): Python file to execute
+        timeout (float): Seconds before the script is stopped
+        env (Optional[Dict[str, str]]): Environment for the script
+        cwd (Optional[str]): Working directory for the script
+        cancel (Optional[threading.Event]): Stops the script when set
+
+    Returns:
+        ScriptResult: Return code, captured output, wall/CPU time and why it was stopped, if it was
+    """
+    if qgis_pool.available:
+        result = qgis_pool.run(script_path, timeout, cwd=cwd, env=env, cancel=cancel)
+        if result is not None:
+            return result
+    if cancel is not None and cancel.is_set():
+        return ExecutionMonitor(timeout).result(None, 0.0, "cancelled")
+
+    return run_subprocess([QGIS_PYTHON, script_path], timeout, env, cwd=cwd, cancel=cancel)
+
+
+if __name__ == "__main__" and sys.argv[1:] == ["--worker"]:
+    # Started by _Worker as `python -m tools.qgis_workers --worker`; keep the repository off the scripts' import path
+    sys.path.pop(0)
+    _worker_main()
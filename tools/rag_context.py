@@ -1,28 +1,107 @@
 
-import json
+import os
+import threading
 import numpy as np
 import faiss
-from typing import List, Annotated
+from typing import List, Dict, Literal, Annotated
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.prebuilt import InjectedState
-from sentence_transformers import SentenceTransformer
+from tools.embedding_service import encode
+from tools.rag_index import load_index, configure_search
+from tools.chunk_store import ChunkStore, build_chunk_store, is_stale
+from tools.semantic_cache import SemanticCache
 
 # === Configuration ===
-FAISS_INDEX_PATH = r"/home/kaiyuan/Project_K/rag_db/rag_faiss.index"
+# Flat, IVF, IVF-PQ, PQ or HNSW index built with `python -m tools.rag_index build`
+FAISS_INDEX_PATH = os.environ.get("FAISS_INDEX_PATH", r"/home/kaiyuan/Project_K/rag_db/rag_faiss.index")
 METADATA_PATH = r"/home/kaiyuan/Project_K/rag_db/rag_metadata.json"
-MODEL_NAME = "nomic-ai/nomic-embed-text-v2-moe"
+# SQLite copy of METADATA_PATH, (re)built automatically when the JSON file changes
+CHUNK_DB_PATH = os.environ.get("CHUNK_DB_PATH", r"/home/kaiyuan/Project_K/rag_db/rag_chunks.sqlite")
+# Memory-map the index instead of reading it into RAM
+FAISS_MMAP = os.environ.get("FAISS_MMAP", "0") == "1"
+# Search-time knobs for IVF (nprobe) and HNSW (efSearch) indexes; see `python -m tools.rag_index bench`
+FAISS_NPROBE = int(os.environ.get("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.environ.get("FAISS_EF_SEARCH", "128"))
+# Candidates taken from each ranking (dense, BM25) per requested result before fusion
+HYBRID_CANDIDATE_FACTOR = 4
+# Reciprocal rank fusion constant; larger values flatten the advantage of top ranks
+RRF_K = 60
+# Reuse the rankings of a cached query whose embedding is at least this cosine-similar
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = int(os.environ.get("SEMANTIC_CACHE_SIZE", "1024"))
+SEMANTIC_CACHE_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", "3600"))
+
+# === Load Vector DB ===
+_index = None
+_index_stamp = None
+_index_lock = threading.Lock()
+
+
+def index_version() -> tuple:
+    """mtime and size of the FAISS index file; changes whenever the index is rebuilt."""
+    st = os.stat(FAISS_INDEX_PATH)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_index() -> faiss.Index:
+    """Load the FAISS index on first use (or after the file changed) and apply the configured search parameters."""
+    global _index, _index_stamp
+    stamp = index_version()
+    if _index is None or stamp != _index_stamp:
+        with _index_lock:
+            if _index is None or stamp != _index_stamp:
+                _index = configure_search(
+                    load_index(FAISS_INDEX_PATH, mmap=FAISS_MMAP),
+                    nprobe=FAISS_NPROBE,
+                    ef_search=FAISS_EF_SEARCH,
+                )
+                _index_stamp = stamp
+    return _index
+
+
+_chunk_store = None
+_chunk_store_stamp = None
+_chunk_store_lock = threading.Lock()
+
+
+def get_chunk_store() -> ChunkStore:
+    """
+    Open the chunk store on first use, building it from METADATA_PATH if it is missing or stale.
+
+    Whenever the FAISS index changes (index_version()), the store is checked
+    again and reopened, so chunk ids keep matching the vectors of a rebuilt index.
+    """
+    global _chunk_store, _chunk_store_stamp
+    stamp = index_version()
+    if _chunk_store is None or stamp != _chunk_store_stamp:
+        with _chunk_store_lock:
+            if _chunk_store is None or stamp != _chunk_store_stamp:
+                if is_stale(METADATA_PATH, CHUNK_DB_PATH):
+                    build_chunk_store(METADATA_PATH, CHUNK_DB_PATH)
+                _chunk_store = ChunkStore(CHUNK_DB_PATH)
+                _chunk_store_stamp = stamp
+    return _chunk_store
+
+
+def chunk_store_version() -> tuple:
+    """mtime and size of the chunk store file; changes whenever the store is rebuilt."""
+    st = os.stat(CHUNK_DB_PATH)
+    return (st.st_mtime_ns, st.st_size)
+
+
+query_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_SIZE,
+    ttl=SEMANTIC_CACHE_TTL,
+)
 
-# === Load Embedding Model and Vector DB ===
-embedding_model = SentenceTransformer(MODEL_NAME, trust_remote_code=True)
-index = faiss.read_index(FAISS_INDEX_PATH)
-with open(METADATA_PATH, "r", encoding="utf-8") as f:
-    metadata = json.load(f)
 
 # === Input and Output Schema ===
 class RAGContextInput(BaseModel):
-    question: str = Field(..., description="The user's task description or the rewritten query used to retrieve helpful context. This query should focus on retrieving documents that can assist in solving the user's task.")
+    question: str | List[str] = Field(..., description="The user's task description or the rewritten query used to retrieve helpful context. This query should focus on retrieving documents that can assist in solving the user's task. Pass a list to run several rewritten queries in one call.")
     top_k: int = Field(8, description="Number of top documents to retrieve from the knowledge base")
+    mode: Literal["hybrid", "dense", "bm25"] = Field("hybrid", description="Ranking: 'dense' embedding search, 'bm25' exact keyword/API-name search, or 'hybrid' to fuse both (recommended)")
 
 class ContextChunk(BaseModel):
     source: str
@@ -31,6 +110,29 @@ class ContextChunk(BaseModel):
 
 class RAGContextOutput(BaseModel):
     context: List[ContextChunk] = Field(..., description="Top matching knowledge base chunks")
+    queries: List[str] = Field(default_factory=list, description="The queries that were run")
+    provenance: List[List[int]] = Field(default_factory=list, description="For each context chunk, the positions in `queries` of the queries that retrieved it")
+
+
+# === Ranking Helpers ===
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> List[int]:
+    """Merge ranked id lists, scoring each id by the sum of 1 / (k + rank) over the lists."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking):
+            scores[idx] = scores.get(idx, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def dense_rankings(query_embeddings: np.ndarray, limit: int) -> List[List[int]]:
+    """Run one batched FAISS search for all query embeddings."""
+    _, indices = get_index().search(query_embeddings, limit)
+    # Approximate indexes return -1 when fewer than `limit` neighbours are found
+    return [[int(idx) for idx in row if idx >= 0] for row in indices]
+
+
+def bm25_ranking(question: str, limit: int) -> List[int]:
+    return [idx for idx, _ in get_chunk_store().search_bm25(question, limit)]
 
 
 # === Main Retrieval Function ===
@@ -41,26 +143,69 @@ class RAGContextOutput(BaseModel):
     description="Retrieve relevant paragraphs from the knowledge base to support the user's GIS-related task."
 )
 def query_context(
-    question: str,
+    question: str | List[str],
     # state: Annotated[dict, InjectedState],
     # call_id: Annotated[str, InjectedToolCallId],
-    top_k: int = 8
+    top_k: int = 8,
+    mode: str = "hybrid"
     ) -> RAGContextOutput:
     #print(f"🔍 [rag_context] Entering semantic_rag_context... Call ID: {call_id}")
 
-    query_embedding = embedding_model.encode([question], convert_to_numpy=True)
-    distances, indices = index.search(np.array(query_embedding), top_k)
+    questions = [question] if isinstance(question, str) else list(dict.fromkeys(q for q in question if q))
+    if not questions:
+        return RAGContextOutput(context=[])
+
+    # With one query and one ranking, exactly top_k candidates are needed
+    single = len(questions) == 1 and mode != "hybrid"
+    depth = top_k if single else top_k * HYBRID_CANDIDATE_FACTOR
+
+    # rankings[i] holds the ranked id lists produced for questions[i]
+    rankings: List[List[List[int]]] = [None] * len(questions)
+
+    # Cached rankings: exact text first, then by embedding similarity (not for pure keyword search)
+    # BM25 rankings come from the chunk store, which can be rebuilt on its own
+    get_chunk_store()
+    query_cache.check_version((index_version(), chunk_store_version()))
+    params = (mode, depth)
+    for i, q in enumerate(questions):
+        rankings[i] = query_cache.get_exact(params, q)
+
+    pending = [i for i, r in enumerate(rankings) if r is None]
+    if pending:
+        # Keyword-only search needs no embeddings; its cache entries are matched by exact text
+        embeddings = encode([questions[i] for i in pending]) if mode != "bm25" else [None] * len(pending)
+        if mode != "bm25":
+            for i, emb in zip(pending, embeddings):
+                rankings[i] = query_cache.get_similar(params, emb)
+
+        todo = [(i, emb) for i, emb in zip(pending, embeddings) if rankings[i] is None]
+        if todo:
+            fresh: Dict[int, List[List[int]]] = {i: [] for i, _ in todo}
+            if mode in ("dense", "hybrid"):
+                dense = dense_rankings(np.stack([emb for _, emb in todo]), depth)
+                for (i, _), ranking in zip(todo, dense):
+                    fresh[i].append(ranking)
+            if mode in ("bm25", "hybrid"):
+                for i, _ in todo:
+                    fresh[i].append(bm25_ranking(questions[i], depth))
+            for i, emb in todo:
+                rankings[i] = fresh[i]
+                query_cache.put(params, questions[i], emb, fresh[i])
+
+    ids = reciprocal_rank_fusion([r for per_query in rankings for r in per_query])[:top_k]
+    chunks = get_chunk_store().get_many(ids)
+
+    # A query is credited with a chunk only if the chunk is in that query's own top_k;
+    # its candidate lists are several times deeper and would credit nearly everything
+    own_top = [set(reciprocal_rank_fusion(per_query)[:top_k]) for per_query in rankings]
 
     results = []
-    for i in range(top_k):
-        idx = indices[0][i]
-        if idx < len(metadata):
-            item = metadata[idx]
-            results.append(ContextChunk(
-                source=item.get("file", "Unknown File"),
-                title=item.get("title", "No Title"),
-                content=item.get("text", "")
-            ))
+    provenance = []
+    for idx in ids:
+        item = chunks.get(idx)
+        if item:
+            results.append(ContextChunk(**item))
+            provenance.append([i for i, top in enumerate(own_top) if idx in top])
     
-    return RAGContextOutput(context=results)
+    return RAGContextOutput(context=results, queries=questions, provenance=provenance)
 
@@ -0,0 +1,345 @@
+import os
+import sys
+import json
+import resource
+import time
+import argparse
+import numpy as np
+import faiss
+from typing import List, Dict, Optional
+
+# === Index Variants ===
+# kind -> faiss.index_factory description; {nlist}, {m} and {hnsw_m} are filled in by build_index
+INDEX_KINDS: Dict[str, str] = {
+    "flat": "Flat",
+    "ivf": "IVF{nlist},Flat",
+    "ivfpq": "IVF{nlist},PQ{m}",
+    "pq": "PQ{m}",
+    "hnsw": "HNSW{hnsw_m}",
+}
+
+
+def default_nlist(ntotal: int) -> int:
+    """Rule of thumb: about 4*sqrt(N) inverted lists, with enough points per list to train."""
+    return max(1, min(int(4 * np.sqrt(ntotal)), ntotal // 39 or 1))
+
+
+def build_index(
+    vectors: np.ndarray,
+    kind: str = "flat",
+    metric: int = faiss.METRIC_L2,
+    nlist: Optional[int] = None,
+    m: int = 16,
+    hnsw_m: int = 32,
+) -> faiss.Index:
+    """
+    Build and fill a FAISS index of the given kind.
+
+    Args:
+        vectors (np.ndarray): (N, dim) float32 vectors, in vector id order
+        kind (str): One of INDEX_KINDS
+        metric (int): faiss.METRIC_L2 or faiss.METRIC_INNER_PRODUCT; should match the flat baseline
+        nlist (Optional[int]): Number of IVF lists (defaults to default_nlist(N))
+        m (int): Number of PQ sub-quantizers; must divide the vector dimension
+        hnsw_m (int): HNSW graph degree
+
+    Returns:
+        faiss.Index: Trained index containing all vectors
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind '{kind}', expected one of {sorted(INDEX_KINDS)}")
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    description = INDEX_KINDS[kind].format(
+        nlist=nlist or default_nlist(len(vectors)),
+        m=m,
+        hnsw_m=hnsw_m,
+    )
+    index = faiss.index_factory(vectors.shape[1], description, metric)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def load_index(path: str, mmap: bool = False) -> faiss.Index:
+    """
+    Read an index from disk, optionally memory-mapped.
+
+    FAISS only maps the inverted lists of IVF indexes (ivf, ivfpq): their
+    vector codes stay on disk and are paged in on demand, so resident memory
+    no longer grows with the knowledge base, while the coarse quantizer is
+    still read into memory. Flat, PQ and HNSW indexes are read fully into
+    memory even with mmap, which is reported on stderr; so are indexes FAISS
+    cannot map at all.
+    """
+    if mmap:
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            print(f"[rag_index] Cannot memory-map {path} ({e}); loading into memory.", file=sys.stderr)
+        else:
+            if faiss.try_extract_index_ivf(index) is None:
+                kind = type(faiss.downcast_index(index)).__name__
+                print(f"[rag_index] {path} is a {kind}, not an IVF index; FAISS only memory-maps IVF inverted lists, "
+                      "so it is fully resident.", file=sys.stderr)
+            return index
+    return faiss.read_index(path)
+
+
+def resident_bytes() -> int:
+    """Resident set size of this process, including mapped index pages that have been read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Peak rather than current size, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def configure_search(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> faiss.Index:
+    """Set IVF nprobe and/or HNSW efSearch on the index; parameters the index does not have are ignored."""
+    params = faiss.ParameterSpace()
+    for name, value in (("nprobe", nprobe), ("efSearch", ef_search)):
+        if value is None:
+            continue
+        try:
+            params.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass
+    return index
+
+
+def reconstruct_vectors(index: faiss.Index) -> np.ndarray:
+    """Return all vectors stored in a flat index, in id order."""
+    return index.reconstruct_n(0, index.ntotal)
+
+
+# === Recall vs Latency Report ===
+# Keys tried, in order, for the question of a JSONL line (same as batch_runner task files)
+QUESTION_KEYS = ("question", "task", "prompt", "body")
+# Recall@k a setting must reach to be recommended
+TARGET_RECALL = 0.95
+
+
+def load_questions(path: str) -> List[str]:
+    """
+    Real questions to benchmark with: one per line, or JSONL records with a
+    text under one of QUESTION_KEYS (e.g. a batch_runner task file).
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                line = next((record[k] for k in QUESTION_KEYS if record.get(k)), "")
+            if line:
+                questions.append(line)
+    return questions
+
+
+def embed_questions(questions: List[str]) -> np.ndarray:
+    """Embed questions exactly as rag_context embeds queries at search time."""
+    from tools.embedding_service import encode
+
+    return encode(questions)
+
+
+def split_holdout(vectors: np.ndarray, count: int, seed: int = 0):
+    """
+    Take `count` random vectors out of the set.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (remaining vectors to index, held-out vectors to query with)
+    """
+    rng = np.random.default_rng(seed)
+    held = np.zeros(len(vectors), dtype=bool)
+    held[rng.choice(len(vectors), size=min(count, len(vectors) - 1), replace=False)] = True
+    return np.ascontiguousarray(vectors[~held]), np.ascontiguousarray(vectors[held])
+
+
+def sample_queries(vectors: np.ndarray, count: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Perturbed copies of random stored vectors; optimistic, use real questions or held-out vectors where possible."""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)]
+    scale = noise * float(np.std(vectors))
+    return (picked + rng.normal(0.0, scale, picked.shape)).astype(np.float32)
+
+
+def _timed_search(index: faiss.Index, queries: np.ndarray, k: int):
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], k)
+        latencies[i] = time.perf_counter() - start
+        ids[i] = found[0]
+    return ids, latencies
+
+
+def benchmark(
+    baseline: faiss.Index,
+    candidates: Dict[str, faiss.Index],
+    queries: np.ndarray,
+    k: int = 8,
+    nprobe_values: List[int] = (),
+    ef_search_values: List[int] = (),
+    loaded_bytes: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, float]]:
+    """
+    Measure recall@k against the exact baseline and per-query latency for
+    every candidate index and search setting.
+
+    Args:
+        loaded_bytes (Dict[str, int]): Resident memory each candidate added when it was loaded or built
+
+    Returns:
+        List[Dict[str, float]]: One row per (index, setting) with recall, mean, p50 and p95 latency in ms,
+        and the resident MB of the index: what loading it added plus the pages its searches read so far
+    """
+    loaded_bytes = loaded_bytes or {}
+    truth, base_lat = _timed_search(baseline, queries, k)
+    rows = [{
+        "index": "baseline", "setting": "exact", "recall": 1.0,
+        "mean_ms": base_lat.mean() * 1e3,
+        "p50_ms": np.percentile(base_lat, 50) * 1e3,
+        "p95_ms": np.percentile(base_lat, 95) * 1e3,
+        "resident_mb": float("nan"),
+    }]
+
+    for name, index in candidates.items():
+        settings = [("default", {})]
+        if faiss.try_extract_index_ivf(index) is not None:
+            settings += [(f"nprobe={v}", {"nprobe": v}) for v in nprobe_values]
+        if hasattr(faiss.downcast_index(index), "hnsw"):
+            settings += [(f"efSearch={v}", {"ef_search": v}) for v in ef_search_values]
+
+        resident = loaded_bytes.get(name, 0)
+        for label, params in settings:
+            configure_search(index, **params)
+            before = resident_bytes()
+            found, lat = _timed_search(index, queries, k)
+            # Memory-mapped codes become resident as searches touch them
+            resident += max(0, resident_bytes() - before)
+            hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+            rows.append({
+                "index": name, "setting": label, "recall": hits / truth.size,
+                "mean_ms": lat.mean() * 1e3,
+                "p50_ms": np.percentile(lat, 50) * 1e3,
+                "p95_ms": np.percentile(lat, 95) * 1e3,
+                "resident_mb": resident / 2**20,
+            })
+    return rows
+
+
+def recommend(rows: List[Dict[str, float]], target_recall: float = TARGET_RECALL) -> Dict[str, Dict[str, float]]:
+    """Per index, the setting with the lowest p95 latency among those reaching `target_recall`."""
+    best: Dict[str, Dict[str, float]] = {}
+    for row in rows:
+        if row["index"] == "baseline" or row["recall"] < target_recall:
+            continue
+        if row["index"] not in best or row["p95_ms"] < best[row["index"]]["p95_ms"]:
+            best[row["index"]] = row
+    return best
+
+
+def format_report(rows: List[Dict[str, float]], k: int) -> str:
+    lines = [f"{'index':<12} {'setting':<14} {'recall@' + str(k):>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} "
+             f"{'resident MB':>12}"]
+    for row in rows:
+        lines.append(
+            f"{row['index']:<12} {row['setting']:<14} {row['recall']:>9.3f} "
+            f"{row['mean_ms']:>9.3f} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} {row['resident_mb']:>12.1f}"
+        )
+    return "\n".join(lines)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build compressed/approximate FAISS indexes for the RAG store and compare them with the flat index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build an index variant from the vectors of a flat index")
+    build.add_argument("--source", required=True, help="Flat index holding the original vectors")
+    build.add_argument("--kind", choices=sorted(INDEX_KINDS), required=True)
+    build.add_argument("--nlist", type=int, default=None)
+    build.add_argument("--m", type=int, default=16, help="PQ sub-quantizers")
+    build.add_argument("--hnsw-m", type=int, default=32)
+    build.add_argument("-o", "--output", required=True)
+
+    bench = sub.add_parser("bench", help="Recall-vs-latency report against the flat baseline")
+    bench.add_argument("--baseline", required=True, help="Flat index (exact search)")
+    bench.add_argument("--candidate", action="append", default=[], help="name=path of an index to compare; repeatable")
+    bench.add_argument("--mmap", action="store_true", help="Memory-map the candidate indexes")
+    sweep = sub.add_parser("sweep", help="Hold out vectors of a flat index, build each variant from the rest and compare them")
+    sweep.add_argument("--source", required=True, help="Flat index holding the original vectors")
+    sweep.add_argument("--kinds", default="ivf,ivfpq,hnsw", help="Comma-separated index kinds to build")
+    sweep.add_argument("--holdout", type=int, default=500, help="Vectors taken out of the index and used as queries")
+    sweep.add_argument("--nlist", type=int, default=None)
+    sweep.add_argument("--m", type=int, default=16, help="PQ sub-quantizers")
+    sweep.add_argument("--hnsw-m", type=int, default=32)
+
+    for command in (bench, sweep):
+        command.add_argument("--questions", help="File of real questions (one per line, or JSONL); embedded with the RAG embedding model")
+        command.add_argument("--queries", type=int, default=200, help="Number of queries (bench without --questions)")
+        command.add_argument("-k", type=int, default=8)
+        command.add_argument("--nprobe", type=_int_list, default=[1, 4, 8, 16, 32, 64])
+        command.add_argument("--ef-search", type=_int_list, default=[16, 32, 64, 128, 256])
+        command.add_argument("--target-recall", type=float, default=TARGET_RECALL)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        source = faiss.read_index(args.source)
+        index = build_index(
+            reconstruct_vectors(source), args.kind, metric=source.metric_type,
+            nlist=args.nlist, m=args.m, hnsw_m=args.hnsw_m,
+        )
+        faiss.write_index(index, args.output)
+        print(f"[rag_index] Wrote {args.kind} index with {index.ntotal} vectors to {args.output}")
+        return
+
+    questions = embed_questions(load_questions(args.questions)) if args.questions else None
+    if args.command == "bench":
+        baseline = faiss.read_index(args.baseline)
+        candidates, loaded = {}, {}
+        for spec in args.candidate:
+            name, _, path = spec.partition("=")
+            before = resident_bytes()
+            candidates[name] = load_index(path, mmap=args.mmap)
+            loaded[name] = max(0, resident_bytes() - before)
+        queries = questions
+        if queries is None:
+            print("[rag_index] No --questions given; querying with perturbed stored vectors, which overstates recall "
+                  "(use `sweep` for held-out vectors).", file=sys.stderr)
+            queries = sample_queries(reconstruct_vectors(baseline), args.queries)
+    else:
+        source = faiss.read_index(args.source)
+        vectors, held_out = split_holdout(reconstruct_vectors(source), args.holdout)
+        queries = held_out if questions is None else questions
+        baseline = build_index(vectors, "flat", metric=source.metric_type)
+        candidates, loaded = {}, {}
+        for kind in args.kinds.split(","):
+            started = time.perf_counter()
+            candidates[kind] = build_index(vectors, kind, metric=source.metric_type,
+                                           nlist=args.nlist, m=args.m, hnsw_m=args.hnsw_m)
+            # Built in memory: all of it is resident (an RSS delta would also count training buffers)
+            loaded[kind] = faiss.serialize_index(candidates[kind]).nbytes
+            print(f"[rag_index] Built {kind} from {len(vectors)} vectors in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    rows = benchmark(baseline, candidates, queries, k=args.k, nprobe_values=args.nprobe,
+                     ef_search_values=args.ef_search, loaded_bytes=loaded)
+    print(format_report(rows, args.k))
+    for name, row in recommend(rows, args.target_recall).items():
+        print(f"recommended {name}: {row['setting']} (recall@{args.k} {row['recall']:.3f}, p95 {row['p95_ms']:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
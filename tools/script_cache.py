@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+from tools.catalog_builder import content_hash, stat_fingerprint
+
+# === Configuration ===
+SCRIPT_CACHE_PATH = os.environ.get("SCRIPT_CACHE_PATH", r"/home/kaiyuan/lu2025-17-15/Kaiyuan/sp_group/cache/script_cache.sqlite")
+# SCRIPT_CACHE=0 turns the store of successful scripts off
+SCRIPT_CACHE_ENABLED = os.environ.get("SCRIPT_CACHE", "1").lower() not in ("0", "false", "no")
+# Seconds a stored script stays valid
+SCRIPT_CACHE_TTL = float(os.environ.get("SCRIPT_CACHE_TTL", str(30 * 24 * 3600)))
+# Maximum number of stored scripts; least recently used are evicted first
+SCRIPT_CACHE_MAX_ENTRIES = int(os.environ.get("SCRIPT_CACHE_MAX_ENTRIES", "5000"))
+
+
+# === Key normalization ===
+def normalize_text(text: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation, so trivial rewording of spacing still matches."""
+    return re.sub(r"\s+", " ", (text or "").strip().lower()).rstrip(" .?!。？！")
+
+
+def input_fingerprints(filepaths: List[str]) -> List[List[str]]:
+    """[absolute path, content hash] per input; files that do not exist are keyed by path only."""
+    fingerprints = []
+    for path in sorted({os.path.abspath(p) for p in filepaths}):
+        try:
+            fingerprints.append([path, content_hash(path)])
+        except OSError:
+            fingerprints.append([path, ""])
+    return fingerprints
+
+
+def task_key(question: str, filepaths: List[str], context: str) -> str:
+    payload = json.dumps(
+        {
+            "question": normalize_text(question),
+            "inputs": input_fingerprints(filepaths),
+            "context": normalize_text(context),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def output_fingerprint(path: str) -> Optional[Dict[str, int]]:
+    try:
+        return stat_fingerprint(path)
+    except OSError:
+        return None
+
+
+class ScriptCache:
+    """
+    Store of generated scripts that passed the success check, in SQLite.
+
+    The key is a hash of the normalized question, the content hashes of the
+    input files and the normalized RAG context, so an edited input or a
+    different context never reuses a script. Next to the script the output
+    file and its fingerprint (mtime and size, including shapefile sidecars)
+    are kept, which tells whether the stored artifact is still the one the
+    script produced. Entries expire after `ttl` seconds; beyond `max_entries`
+    the least recently used are evicted.
+    """
+
+    def __init__(self, path: str, ttl: float = SCRIPT_CACHE_TTL, max_entries: int = SCRIPT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats: Dict[str, int] = {"artifact_hits": 0, "rerun_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scripts ("
+                "key TEXT PRIMARY KEY, question TEXT, code TEXT NOT NULL, output_file TEXT, "
+                "output_fingerprint TEXT, tool_used_file TEXT, stdout TEXT, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS scripts_last_used ON scripts (last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT code, output_file, output_fingerprint, tool_used_file, stdout, created "
+                "FROM scripts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[5] > self.ttl:
+                return None
+            self._conn.execute("UPDATE scripts SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return {
+            "code": row[0],
+            "output_file": row[1] or "",
+            "output_fingerprint": json.loads(row[2]) if row[2] else None,
+            "tool_used_file": row[3] or "",
+            "stdout": row[4] or "",
+        }
+
+    def put(self, key: str, question: str, code: str, output_file: str, tool_used_file: str, stdout: str) -> None:
+        now = time.time()
+        fingerprint = output_fingerprint(output_file) if output_file else None
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO scripts (key, question, code, output_file, output_fingerprint, "
+                "tool_used_file, stdout, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, question, code, output_file, json.dumps(fingerprint) if fingerprint else None,
+                 tool_used_file, stdout, now, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                conn.execute("DELETE FROM scripts WHERE created < ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM scripts WHERE key IN ("
+                    "SELECT key FROM scripts ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            conn.commit()
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM scripts WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def count(self, outcome: str) -> None:
+        with self._lock:
+            self.stats[outcome] += 1
+
+
+script_cache = ScriptCache(SCRIPT_CACHE_PATH)
+
+
+def artifact_unchanged(entry: Dict[str, Any]) -> bool:
+    """Whether the stored output file still exists exactly as the cached script left it."""
+    if not entry["output_file"] or entry["output_fingerprint"] is None:
+        return False
+    return output_fingerprint(entry["output_file"]) == entry["output_fingerprint"]
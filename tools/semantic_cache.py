@@ -0,0 +1,85 @@
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class SemanticCache:
+    """
+    Cache of retrieval results keyed by query embedding.
+
+    A lookup returns the stored value of a previous query with the same
+    parameters whose cosine similarity to the new query is at least
+    `threshold` (an identical query text hits without needing its vector).
+    Entries expire after `ttl` seconds, the least recently used are evicted
+    beyond `max_entries`, and everything is dropped when `version` changes
+    (e.g. the index file was rebuilt).
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1024, ttl: float = 3600.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._version: Any = None
+        # (params, text) -> (unit vector or None, value, created_at)
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple[Optional[np.ndarray], Any, float]]" = OrderedDict()
+
+    def check_version(self, version: Any) -> None:
+        """Drop every entry if the underlying data changed since the last call."""
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, (_, _, created) in self._entries.items() if now - created > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def get_exact(self, params: Hashable, text: str) -> Optional[Any]:
+        """Value stored for exactly this query text, without embedding it."""
+        with self._lock:
+            entry = self._entries.get((params, text))
+            if entry is None or time.monotonic() - entry[2] > self.ttl:
+                return None
+            self._entries.move_to_end((params, text))
+            self.hits += 1
+            return entry[1]
+
+    def get_similar(self, params: Hashable, vector: np.ndarray) -> Optional[Any]:
+        """Value of the most similar cached query, if it is similar enough."""
+        unit = _unit(vector)
+        with self._lock:
+            self._expire(time.monotonic())
+            keys = [key for key, entry in self._entries.items() if key[0] == params and entry[0] is not None]
+            if not keys:
+                self.misses += 1
+                return None
+            matrix = np.stack([self._entries[key][0] for key in keys])
+            scores = matrix @ unit
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(keys[best])
+            self.hits += 1
+            return self._entries[keys[best]][1]
+
+    def put(self, params: Hashable, text: str, vector: Optional[np.ndarray], value: Any) -> None:
+        """Store a value; without a vector the entry is only found by get_exact."""
+        unit = _unit(vector) if vector is not None else None
+        with self._lock:
+            self._entries[(params, text)] = (unit, value, time.monotonic())
+            self._entries.move_to_end((params, text))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,136 @@
+import os
+import re
+import json
+import threading
+from typing import List, Dict, Any, Optional, Set, Tuple
+from rtree import index as rtree_index
+
+BBox = List[float]
+
+# "bbox: -82.5, 33.8, -80.5, 34.4" or "bbox=[-82.5, 33.8, -80.5, 34.4]" in a question
+_NUMBER = r"(-?\d+(?:\.\d+)?)"
+BBOX_PATTERN = re.compile(
+    r"\bbbox\s*[:=]?\s*[\[(]?\s*" + r"\s*,\s*".join([_NUMBER] * 4) + r"\s*[\])]?",
+    re.IGNORECASE,
+)
+# Longest place name (in words) looked up in the gazetteer
+MAX_PLACE_WORDS = 4
+MIN_PLACE_LENGTH = 3
+
+
+def parse_bbox(text: str) -> Optional[BBox]:
+    """
+    Extract an explicit "bbox: minx, miny, maxx, maxy" region (EPSG:4326) from text.
+
+    Swapped latitudes are put in order; longitudes are kept as given, since
+    minx > maxx means the region crosses the antimeridian (see split_antimeridian).
+    """
+    match = BBOX_PATTERN.search(text or "")
+    if not match:
+        return None
+    minx, miny, maxx, maxy = (float(v) for v in match.groups())
+    return [minx, min(miny, maxy), maxx, max(miny, maxy)]
+
+
+def split_antimeridian(bbox: BBox) -> Optional[List[Tuple[float, float, float, float]]]:
+    """
+    The box as R-tree rectangles: a box with minx > maxx crosses the
+    antimeridian and becomes its eastern and western part.
+
+    Returns:
+        Optional[List[Tuple]]: Rectangles, or None if the box is unusable (miny > maxy, NaN)
+    """
+    minx, miny, maxx, maxy = (float(v) for v in bbox)
+    if not miny <= maxy or minx != minx or maxx != maxx:
+        return None
+    if minx > maxx:
+        return [(minx, miny, 180.0, maxy), (-180.0, miny, maxx, maxy)]
+    return [(minx, miny, maxx, maxy)]
+
+
+class SpatialIndex:
+    """
+    R-tree over the EPSG:4326 bounding boxes of catalog entries.
+
+    Boxes crossing the antimeridian are stored as two rectangles under the
+    same position. Entries without a usable "bbox" cannot be ruled out and
+    are always returned.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.size = len(entries)
+        self.unbounded: Set[int] = set()
+        self._tree = rtree_index.Index()
+        for pos, item in enumerate(entries):
+            bbox = item.get("bbox")
+            parts = split_antimeridian(bbox) if bbox and len(bbox) == 4 else None
+            if parts is None:
+                self.unbounded.add(pos)
+                continue
+            for part in parts:
+                self._tree.insert(pos, part)
+
+    def intersecting(self, regions: List[BBox]) -> Set[int]:
+        """Positions of entries whose extent intersects any of the regions."""
+        hits = set(self.unbounded)
+        for region in regions:
+            for part in split_antimeridian(region) or []:
+                hits.update(self._tree.intersection(part))
+        return hits
+
+
+class Gazetteer:
+    """
+    Place name -> bounding boxes lookup written by
+    `python -m tools.catalog_builder --gazetteer ...`.
+
+    Reloaded when the file changes; a missing file resolves nothing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._places: Dict[str, List[BBox]] = {}
+
+    def _load(self) -> Dict[str, List[BBox]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return {}
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._places = json.load(f)
+                    self._stamp = stamp
+        return self._places
+
+    def resolve(self, text: str) -> List[BBox]:
+        """
+        Bounding boxes of all place names mentioned in the text (longest match wins).
+
+        A match must start with a capitalized word so common words that are
+        also place names ("lake", "union") do not restrict the search.
+        """
+        places = self._load()
+        if not places:
+            return []
+
+        words = re.findall(r"[\w'.-]+", text or "")
+        regions: List[BBox] = []
+        i = 0
+        while i < len(words):
+            if not words[i][:1].isupper():
+                i += 1
+                continue
+            for n in range(min(MAX_PLACE_WORDS, len(words) - i), 0, -1):
+                name = " ".join(words[i:i + n]).lower()
+                if len(name) >= MIN_PLACE_LENGTH and name in places:
+                    regions.extend(places[name])
+                    i += n
+                    break
+            else:
+                i += 1
+        return regions